@@ -33,6 +33,10 @@ class Settings(BaseSettings):
     rag_chunk_overlap: int = 200
     rag_embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
     rag_top_k: int = 5
+    rag_embedding_batch_size: int = 96  # Размер пакета текстов за один вызов embedding модели
+    rag_embedding_cache_size: int = 10000  # Количество эмбеддингов в LRU кэше (0 - без кэша)
+    rag_embedding_dtype: str = "f32"  # f32 или int8 (скалярная квантизация векторов в Qdrant)
+    rag_insert_batch_size: int = 1000  # Максимум точек в одном запросе вставки в векторную БД
     
     # Qdrant Configuration
     qdrant_url: str = "http://localhost:6333"
@@ -47,6 +51,16 @@ class Settings(BaseSettings):
     vision_api_url: str = "https://mail.s0me.uk/vision"  # HTTPS через nginx
     vision_api_key: str = ""
     vision_api_timeout: int = 120  # 2 minutes for OCR processing
+    vision_api_max_concurrency: int = 4  # Одновременных OCR запросов при обработке страниц PDF
+    vision_api_max_retries: int = 3  # Повторов при 429 (rate limit) с экспоненциальной задержкой
+    vision_ocr_cache_path: str = "./.vision_cache/ocr.sqlite3"  # Кэш OCR страниц PDF по sha256 ("" - без кэша)
+    vision_ocr_cache_size: int = 10000  # Максимум страниц в кэше OCR
+    vision_pdf_image_format: str = "auto"  # Формат страниц PDF для Vision API: auto (JPEG для сканов, PNG для текста), jpeg, png
+    vision_pdf_image_quality: int = 85  # Качество JPEG страниц PDF
+    vision_pdf_text_dpi: int = 150  # DPI рендеринга страниц PDF с векторным текстом для OCR
+    vision_pdf_scan_dpi: int = 300  # Максимальный DPI для сканов (не выше собственного разрешения скана)
+    vision_pdf_native_text_min_chars: int = 40  # Страницы с текстовым слоем от N символов не отправляются в OCR (0 - OCR всех страниц)
+    pdf_render_max_workers: int = 0  # Потоков рендеринга страниц PDF в изображения (0 - по числу ядер)
     
     # Convert Server Configuration (через nginx с HTTPS)
     convert_api_url: str = "https://mail.s0me.uk/convert"  # HTTPS через nginx
@@ -56,6 +70,7 @@ class Settings(BaseSettings):
     # HTML Screenshot Service Configuration
     html_screenshot_url: str = "http://localhost:3015"  # Playwright screenshot service
     html_screenshot_timeout: int = 120  # 2 minutes for screenshot + OCR
+    html_screenshot_cache_dir: str = ""  # Дисковый кэш OCR текста без ограничения размера ("" - без кэша, например "~/.cache/html_screenshot")
     
     # Text Post-Processing with LLM
     use_llm_text_cleaning: bool = True  # Використовувати LLM для очищення тексту після OCR
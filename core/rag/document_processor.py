@@ -3,9 +3,12 @@
 """
 import os
 import asyncio
+import atexit
+import functools
 import io
 import re
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Tuple, ClassVar, Callable
 from pathlib import Path
 from loguru import logger
 from config import settings
@@ -79,6 +82,22 @@ except ImportError:
     BEAUTIFULSOUP_AVAILABLE = False
     BeautifulSoup = None
 
+# Детекция кодировки HTML без перебора кодировок
+try:
+    from charset_normalizer import from_bytes
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+    from_bytes = None
+
+# Быстрый HTML парсер на C (Lexbor), основной путь извлечения текста из HTML
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+    LexborHTMLParser = None
+
 # Fallback на стандартную библиотеку html.parser
 import html.parser
 
@@ -106,6 +125,9 @@ except ImportError as e:
     VISION_CLIENT_AVAILABLE = False
     VisionAPIClient = None
 
+# Кэш OCR результатов страниц (SQLite из стандартной библиотеки)
+from core.rag.ocr_cache import OCRResultCache
+
 # Импорт LLM для очистки текста
 try:
     from core.llm.factory import LLMProviderFactory
@@ -120,9 +142,141 @@ except ImportError as e:
     LLMProvider = None
 
 
+# Патерни технічної інформації PDF/OCR для _clean_ocr_text.
+# Кожна група зібрана в одну альтернацію: один прохід по рядку замість
+# окремого пошуку для кожного патерну. Патерни з початку рядка перевіряються
+# через match(), тому не скануються по всьому рядку.
+_OCR_TECHNICAL_LINE_START_PATTERNS = (
+    r'PDF\s+Version',
+    r'Creator:',
+    r'Producer:',
+    r'CreationDate:',
+    r'ModDate:',
+    r'Title:',
+    r'Author:',
+    r'Subject:',
+    r'Keywords:',
+    r'Trapped:',
+    r'/Type\s+/',
+    r'/Subtype\s+/',
+    r'/Filter\s+/',
+    r'/Length\s+',
+    r'/Width\s+',
+    r'/Height\s+',
+    r'/ColorSpace\s+',
+    r'/BitsPerComponent\s+',
+    r'xref',
+    r'trailer',
+    r'startxref',
+    r'%%EOF',
+    r'/Page\s+',
+    r'/Pages\s+',
+    r'/MediaBox\s+',
+    r'/CropBox\s+',
+    r'/Rotate\s+',
+    r'/Parent\s+',
+    r'/Resources\s+',
+    r'/Font\s+',
+    r'/XObject\s+',
+    r'/ProcSet\s+',
+    r'/Contents\s+',
+    # Артефакти OCR (рядки з тільки крапками/символами)
+    r'[\.\s]+$',
+    r'[\-\s]+$',
+    r'[_\s]+$',
+    r'[=\s]+$',
+)
+_OCR_TECHNICAL_ANYWHERE_PATTERNS = (
+    r'OCR\s+confidence',
+    r'Recognition\s+confidence',
+    r'Text\s+extraction',
+    r'Page\s+\d+\s+of\s+\d+',
+    # Тестові рядки OCR
+    r'This\s+is\s+text\s+in\s+English\s+for\s+OCR',
+    r'for\s+OCR\s+recognition',
+    r'OCR\s+recognition',
+    r'Vision\s+API',
+    r'Google\s+Vision\s+API',
+    # Технічні описи документів
+    r'PDF-файл[и]?\s+з\s+текстом',
+    r'PDF-файл[и]?\s+с\s+текстом',
+    r'PDF\s+файл[и]?\s+з\s+текстом',
+    r'PDF\s+файл[и]?\s+с\s+текстом',
+    r'для\s+распознавания\s+OCR',
+    r'для\s+розпізнавання\s+OCR',
+    r'документ[и]?\s+являются\s+PDF',
+    r'документ[и]?\s+є\s+PDF',
+    r'английском\s+языке\s+для\s+распознавания',
+    r'англійською\s+мовою\s+для\s+розпізнавання',
+)
+_OCR_TECHNICAL_LINE_START = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern in _OCR_TECHNICAL_LINE_START_PATTERNS), re.IGNORECASE
+)
+_OCR_TECHNICAL_ANYWHERE = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern in _OCR_TECHNICAL_ANYWHERE_PATTERNS), re.IGNORECASE
+)
+# Рядок лише з цифр та дужок/слешів
+_OCR_DIGITS_ONLY = re.compile(r'^[\d\s/\\\[\](){}<>]+$')
+# Спецсимволи (не літери, цифри, пробіли чи кирилиця)
+_OCR_SPECIAL_CHAR = re.compile(r'[^\w\s\u0400-\u04FF]')
+_OCR_MULTI_SPACE = re.compile(r' +')
+_OCR_MULTI_NEWLINE = re.compile(r'\n{3,}')
+
+
 class DocumentProcessor:
     """Класс для обработки различных типов документов с использованием LangChain"""
     
+    # Text splitter'ы общие для всех экземпляров: (chunk_size, chunk_overlap) -> splitter
+    _splitters: ClassVar[Dict[Tuple[int, int], Any]] = {}
+    
+    # Кэши OCR результатов по пути к базе (одно соединение SQLite на процесс)
+    _ocr_caches: ClassVar[Dict[str, OCRResultCache]] = {}
+    
+    @classmethod
+    def _get_ocr_cache(cls, path: str) -> Optional[OCRResultCache]:
+        """
+        Получение кэша OCR результатов (создается один раз на путь)
+        
+        Args:
+            path: Путь к файлу SQLite базы
+        
+        Returns:
+            OCRResultCache или None, если кэш не удалось открыть
+        """
+        cache = cls._ocr_caches.get(path)
+        if cache is None:
+            try:
+                cache = OCRResultCache(path, capacity=settings.vision_ocr_cache_size)
+                cls._ocr_caches[path] = cache
+            except Exception as e:
+                logger.warning(f"Failed to open OCR result cache {path}: {e}. OCR results will not be cached.")
+                return None
+        return cache
+    
+    @classmethod
+    def _get_splitter(cls, chunk_size: int, chunk_overlap: int):
+        """
+        Получение text splitter'а с заданными параметрами (создается один раз)
+        
+        Args:
+            chunk_size: Размер чанка
+            chunk_overlap: Перекрытие чанков
+        
+        Returns:
+            RecursiveCharacterTextSplitter
+        """
+        key = (chunk_size, chunk_overlap)
+        splitter = cls._splitters.get(key)
+        if splitter is None:
+            splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                length_function=len,
+                separators=["\n\n", "\n", " ", ""]
+            )
+            cls._splitters[key] = splitter
+        return splitter
+    
     def __init__(self, use_vision_api: bool = True, use_llm_cleaning: bool = None):
         """
         Инициализация процессора документов
@@ -133,12 +287,7 @@ class DocumentProcessor:
         """
         # Инициализация text splitter из LangChain
         if LANGCHAIN_AVAILABLE:
-            self.text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=settings.rag_chunk_size,
-                chunk_overlap=settings.rag_chunk_overlap,
-                length_function=len,
-                separators=["\n\n", "\n", " ", ""]
-            )
+            self.text_splitter = self._get_splitter(settings.rag_chunk_size, settings.rag_chunk_overlap)
         else:
             self.text_splitter = None
         
@@ -158,6 +307,11 @@ class DocumentProcessor:
         else:
             self.vision_client = None
         
+        # Кэш OCR страниц PDF по хэшу изображения (общий для процессоров с тем же путем)
+        self.ocr_cache = None
+        if self.use_vision_api and settings.vision_ocr_cache_path:
+            self.ocr_cache = DocumentProcessor._get_ocr_cache(settings.vision_ocr_cache_path)
+        
         # Инициализация LLM для очистки текста
         self.use_llm_cleaning = use_llm_cleaning if use_llm_cleaning is not None else settings.use_llm_text_cleaning
         self.llm_provider = None
@@ -189,87 +343,22 @@ class DocumentProcessor:
         lines = text.split('\n')
         cleaned_lines = []
         
-        # Патерни для технічної інформації
-        technical_patterns = [
-            r'^PDF\s+Version',
-            r'^Creator:',
-            r'^Producer:',
-            r'^CreationDate:',
-            r'^ModDate:',
-            r'^Title:',
-            r'^Author:',
-            r'^Subject:',
-            r'^Keywords:',
-            r'^Trapped:',
-            r'^/Type\s+/',
-            r'^/Subtype\s+/',
-            r'^/Filter\s+/',
-            r'^/Length\s+',
-            r'^/Width\s+',
-            r'^/Height\s+',
-            r'^/ColorSpace\s+',
-            r'^/BitsPerComponent\s+',
-            r'^xref',
-            r'^trailer',
-            r'^startxref',
-            r'^%%EOF',
-            r'^/Page\s+',
-            r'^/Pages\s+',
-            r'^/MediaBox\s+',
-            r'^/CropBox\s+',
-            r'^/Rotate\s+',
-            r'^/Parent\s+',
-            r'^/Resources\s+',
-            r'^/Font\s+',
-            r'^/XObject\s+',
-            r'^/ProcSet\s+',
-            r'^/Contents\s+',
-            r'OCR\s+confidence',
-            r'Recognition\s+confidence',
-            r'Text\s+extraction',
-            r'Page\s+\d+\s+of\s+\d+',
-            # Тестові рядки OCR
-            r'This\s+is\s+text\s+in\s+English\s+for\s+OCR',
-            r'for\s+OCR\s+recognition',
-            r'OCR\s+recognition',
-            r'Vision\s+API',
-            r'Google\s+Vision\s+API',
-            # Технічні описи документів
-            r'PDF-файл[и]?\s+з\s+текстом',
-            r'PDF-файл[и]?\s+с\s+текстом',
-            r'PDF\s+файл[и]?\s+з\s+текстом',
-            r'PDF\s+файл[и]?\s+с\s+текстом',
-            r'для\s+распознавания\s+OCR',
-            r'для\s+розпізнавання\s+OCR',
-            r'документ[и]?\s+являются\s+PDF',
-            r'документ[и]?\s+є\s+PDF',
-            r'английском\s+языке\s+для\s+распознавания',
-            r'англійською\s+мовою\s+для\s+розпізнавання',
-            # Артефакти OCR (рядки з тільки крапками/символами)
-            r'^[\.\s]+$',
-            r'^[\-\s]+$',
-            r'^[_\s]+$',
-            r'^[=\s]+$',
-        ]
-        
         for line in lines:
             line = line.strip()
             if not line:
                 continue
             
             # Перевіряємо, чи не є рядок технічною інформацією
-            is_technical = False
-            for pattern in technical_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    is_technical = True
-                    break
+            is_technical = bool(
+                _OCR_TECHNICAL_LINE_START.match(line) or _OCR_TECHNICAL_ANYWHERE.search(line)
+            )
             
             # Пропускаємо рядки, які виглядають як технічні команди PDF
             if line.startswith('/') and len(line) < 50:
                 is_technical = True
             
             # Пропускаємо рядки з тільки цифрами та спецсимволами
-            if re.match(r'^[\d\s/\\\[\](){}<>]+$', line) and len(line) < 30:
+            if _OCR_DIGITS_ONLY.match(line) and len(line) < 30:
                 is_technical = True
             
             # Пропускаємо дуже короткі рядки (менше 3 символів) - часто артефакти OCR
@@ -282,7 +371,7 @@ class DocumentProcessor:
             
             # Пропускаємо рядки з великою кількістю спецсимволів (більше 50%)
             if len(line) > 0:
-                special_chars = len(re.findall(r'[^\w\s\u0400-\u04FF]', line))
+                special_chars = len(_OCR_SPECIAL_CHAR.findall(line))
                 if special_chars / len(line) > 0.5:
                     is_technical = True
             
@@ -293,10 +382,10 @@ class DocumentProcessor:
         cleaned_text = '\n'.join(cleaned_lines)
         
         # Видаляємо множинні пробіли
-        cleaned_text = re.sub(r' +', ' ', cleaned_text)
+        cleaned_text = _OCR_MULTI_SPACE.sub(' ', cleaned_text)
         
         # Видаляємо множинні переноси рядків (більше 2 підряд)
-        cleaned_text = re.sub(r'\n{3,}', '\n\n', cleaned_text)
+        cleaned_text = _OCR_MULTI_NEWLINE.sub('\n\n', cleaned_text)
         
         return cleaned_text.strip()
     
@@ -411,12 +500,13 @@ class DocumentProcessor:
             logger.debug(traceback.format_exc())
             return None
     
-    def _pdf_to_images(self, file_path: str) -> List[bytes]:
+    def _pdf_to_images(self, file_path: str, max_pages: Optional[int] = None) -> List[bytes]:
         """
         Конвертация PDF в список изображений (байты)
         
         Args:
             file_path: Путь к PDF файлу
+            max_pages: Конвертировать только первые max_pages страниц (по умолчанию все)
             
         Returns:
             Список байтов изображений (PNG)
@@ -426,21 +516,19 @@ class DocumentProcessor:
             return []
         
         try:
-            images = []
-            doc = fitz.open(file_path)
+            # get_pixmap отпускает GIL, поэтому страницы рендерятся в потоках.
+            # fitz.Document не потокобезопасен: каждый поток открывает свою копию
+            # и рендерит непрерывный диапазон страниц, порядок сохраняет map()
+            ranges = self._pdf_page_ranges(file_path, max_pages)
             
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                # Конвертируем страницу в изображение с высоким разрешением
-                mat = fitz.Matrix(2.0, 2.0)  # Увеличиваем разрешение в 2 раза
-                pix = page.get_pixmap(matrix=mat)
-                
-                # Конвертируем в PNG байты
-                img_bytes = pix.tobytes("png")
-                images.append(img_bytes)
-                logger.debug(f"Converted page {page_num + 1} to image: {len(img_bytes)} bytes")
+            if len(ranges) > 1:
+                import concurrent.futures
+                with concurrent.futures.ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                    parts = list(executor.map(lambda r: self._render_pdf_pages(file_path, *r), ranges))
+            else:
+                parts = [self._render_pdf_pages(file_path, *r) for r in ranges]
+            images = [img_bytes for part in parts for img_bytes in part]
             
-            doc.close()
             logger.info(f"Converted PDF to {len(images)} images")
             return images
             
@@ -450,6 +538,132 @@ class DocumentProcessor:
             logger.debug(traceback.format_exc())
             return []
     
+    @staticmethod
+    def _pdf_page_ranges(file_path: str, max_pages: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Разбиение страниц PDF на непрерывные диапазоны для потоков рендеринга
+        
+        Args:
+            file_path: Путь к PDF файлу
+            max_pages: Учитывать только первые max_pages страниц (по умолчанию все)
+            
+        Returns:
+            Список (start, end) - по одному на поток (pdf_render_max_workers, 0 - по числу ядер)
+        """
+        with fitz.open(file_path) as doc:
+            page_count = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+        workers = max(1, min(settings.pdf_render_max_workers or os.cpu_count() or 1, page_count))
+        step = -(-page_count // workers) if page_count else 1
+        return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    
+    @staticmethod
+    def _page_render_matrix(page) -> Any:
+        """
+        Матрица масштабирования страницы для OCR
+        
+        Страница с векторным текстом рендерится в vision_pdf_text_dpi (150 DPI
+        достаточно для OCR). Для скана (изображение занимает не меньше половины
+        страницы) берется собственное разрешение изображения, но не выше
+        vision_pdf_scan_dpi: рендеринг крупнее исходного скана не добавляет деталей,
+        а размер изображения растет квадратично от DPI.
+        
+        Args:
+            page: Страница fitz
+            
+        Returns:
+            fitz.Matrix
+        """
+        dpi = settings.vision_pdf_text_dpi
+        page_area = abs(page.rect) or 1
+        for info in page.get_image_info():
+            bbox = fitz.Rect(info["bbox"])
+            if abs(bbox) >= page_area / 2 and bbox.width > 0:
+                native_dpi = info["width"] * 72 / bbox.width
+                dpi = max(dpi, min(settings.vision_pdf_scan_dpi, native_dpi))
+        zoom = dpi / 72
+        return fitz.Matrix(zoom, zoom)
+    
+    @staticmethod
+    def _is_usable_text_layer(text: str, min_chars: int) -> bool:
+        """
+        Проверка, что текстовый слой страницы можно использовать вместо OCR
+        
+        Шрифт без таблицы кодировки (например, кириллица, вставленная стандартным
+        шрифтом) дает в текстовом слое точки и знаки вопроса вместо букв - такой
+        слой отбрасывается, и страница распознается через OCR.
+        
+        Args:
+            text: Текст страницы из PDF
+            min_chars: Минимум букв и цифр
+            
+        Returns:
+            True, если в тексте достаточно букв/цифр и они составляют большую часть символов
+        """
+        visible = [ch for ch in text if not ch.isspace()]
+        alnum = sum(ch.isalnum() for ch in visible)
+        return alnum >= min_chars and alnum >= 0.6 * len(visible)
+    
+    @staticmethod
+    def _render_pdf_pages(
+        file_path: str,
+        start: int,
+        end: int,
+        on_page: Optional[Callable[[int, bytes], None]] = None,
+        image_format: str = "png",
+        image_quality: int = 85,
+        on_text: Optional[Callable[[int, str], None]] = None,
+        min_text_chars: int = 0
+    ) -> List[bytes]:
+        """
+        Рендеринг диапазона страниц PDF в изображения (собственный экземпляр документа)
+        
+        Args:
+            file_path: Путь к PDF файлу
+            start: Номер первой страницы (с 0)
+            end: Номер страницы после последней
+            on_page: Обработчик (номер страницы, изображение) - вызывается сразу после
+                рендеринга каждой страницы, изображения тогда не накапливаются
+            image_format: "png", "jpeg" или "auto" (JPEG для страниц с растровыми
+                изображениями - сканов, PNG для страниц с векторным текстом)
+            image_quality: Качество JPEG (0-100)
+            on_text: Обработчик (номер страницы, текст) для страниц с текстовым слоем -
+                такие страницы не рендерятся (требует min_text_chars > 0)
+            min_text_chars: Минимум символов текстового слоя, чтобы не рендерить страницу
+            
+        Returns:
+            Список байтов изображений, пустой при on_page
+        """
+        images = []
+        with fitz.open(file_path) as doc:
+            for page_num in range(start, end):
+                page = doc[page_num]
+                
+                # Страница с текстовым слоем (не скан): текст уже есть, рендеринг и OCR не нужны
+                if on_text is not None and min_text_chars > 0:
+                    native_text = page.get_text("text")
+                    if DocumentProcessor._is_usable_text_layer(native_text, min_text_chars):
+                        logger.debug(f"Page {page_num + 1} has text layer: {len(native_text)} characters")
+                        on_text(page_num, native_text)
+                        continue
+                
+                # Оттенки серого без альфа-канала: PNG примерно вдвое меньше, на OCR не влияет
+                pix = page.get_pixmap(
+                    matrix=DocumentProcessor._page_render_matrix(page), colorspace=fitz.csGRAY, alpha=False
+                )
+                
+                # Скан с шумом JPEG сжимает в разы лучше PNG, а чистый векторный текст -
+                # наоборот, поэтому в режиме auto формат выбирается по содержимому страницы
+                use_jpeg = image_format == "jpeg" or (image_format == "auto" and bool(page.get_images()))
+                
+                # Конвертируем в байты (в памяти, без временных файлов)
+                img_bytes = pix.tobytes("jpeg", jpg_quality=image_quality) if use_jpeg else pix.tobytes("png")
+                logger.debug(f"Converted page {page_num + 1} to {'JPEG' if use_jpeg else 'PNG'}: {len(img_bytes)} bytes")
+                if on_page is not None:
+                    on_page(page_num, img_bytes)
+                else:
+                    images.append(img_bytes)
+        return images
+    
     def _extract_text_via_vision_api(self, file_path: str) -> Optional[str]:
         """
         Извлечение текста через Vision API (синхронная обертка)
@@ -504,12 +718,25 @@ class DocumentProcessor:
             logger.debug(traceback.format_exc())
             return None
     
-    def _extract_text_from_pdf_via_vision(self, file_path: str) -> Optional[str]:
+    async def _extract_text_from_pdf_via_vision_async(
+        self,
+        file_path: str,
+        max_concurrency: Optional[int] = None
+    ) -> Optional[str]:
         """
-        Извлечение текста из PDF через Vision API (конвертация страниц в изображения)
+        Извлечение текста из PDF через Vision API (асинхронно)
+        
+        Конвейер: потоки рендерят страницы и сразу кладут их в очередь,
+        а max_concurrency обработчиков параллельно отправляют их в Vision API.
+        Рендеринг следующих страниц идет, пока предыдущие распознаются, поэтому
+        общее время ближе к max(рендеринг, OCR), чем к их сумме.
+        Страницы с текстовым слоем (vision_pdf_native_text_min_chars) берутся
+        из PDF без рендеринга и OCR. Текст собирается в порядке страниц.
         
         Args:
             file_path: Путь к PDF файлу
+            max_concurrency: Одновременных запросов к Vision API
+                (по умолчанию vision_api_max_concurrency, 1 - последовательно)
             
         Returns:
             Извлеченный текст или None
@@ -517,99 +744,149 @@ class DocumentProcessor:
         if not self.use_vision_api or not self.vision_client:
             return None
         
+        if not PYMUPDF_AVAILABLE:
+            logger.warning("PyMuPDF is not available. Cannot convert PDF to images.")
+            return None
+        
         try:
-            # Конвертируем PDF в изображения
-            images = self._pdf_to_images(file_path)
-            if not images:
+            ranges = self._pdf_page_ranges(file_path)
+            page_count = ranges[-1][1] if ranges else 0
+            if not page_count:
                 logger.warning("Failed to convert PDF to images")
                 return None
             
-            # Отправляем каждое изображение в Vision API и собираем текст
-            all_text = []
+            max_concurrency = max(1, max_concurrency or settings.vision_api_max_concurrency)
+            loop = asyncio.get_running_loop()
+            # Ограниченная очередь: рендеринг не уходит далеко вперед OCR и не держит все страницы в памяти
+            queue: asyncio.Queue = asyncio.Queue(maxsize=max_concurrency * 2)
+            page_texts: List[Optional[str]] = [None] * page_count
+            cached_pages = 0
+            
+            stop = threading.Event()
+            
+            def on_page(page_num: int, image_bytes: bytes):
+                # Вызывается из потока рендеринга: ждем места в очереди event loop'а
+                if stop.is_set():
+                    raise RuntimeError("Vision API pipeline stopped")
+                asyncio.run_coroutine_threadsafe(queue.put((page_num, image_bytes)), loop).result()
+            
+            native_pages = 0
+            # Базовая фильтрация построчная, поэтому каждая страница очищается сразу по
+            # получении текста - пока остальные страницы еще распознаются, а не после всех
+            cleaned_pages: List[Optional[str]] = [None] * page_count
             
-            for i, image_bytes in enumerate(images):
-                logger.info(f"[DocumentProcessor] Processing PDF page {i + 1}/{len(images)} via Vision API (size: {len(image_bytes)} bytes)")
+            def on_text(page_num: int, native_text: str):
+                # Вызывается из потока рендеринга; индексы страниц у потоков не пересекаются
+                nonlocal native_pages
+                page_texts[page_num] = native_text
+                cleaned_pages[page_num] = DocumentProcessor._clean_ocr_text(native_text)
+                native_pages += 1
+            
+            async def produce():
+                results = await asyncio.gather(
+                    *(asyncio.to_thread(
+                        self._render_pdf_pages, file_path, start, end, on_page,
+                        settings.vision_pdf_image_format, settings.vision_pdf_image_quality,
+                        on_text, settings.vision_pdf_native_text_min_chars
+                    ) for start, end in ranges),
+                    return_exceptions=True
+                )
+                for (start, end), result in zip(ranges, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Error converting PDF pages {start + 1}-{end} to images: {result}")
+            
+            async def process_page(page_num: int, image_bytes: bytes):
+                nonlocal cached_pages
+                # Страница уже распознавалась (тот же sha256 изображения) - берем из кэша
+                cache_key = OCRResultCache.key(image_bytes) if self.ocr_cache is not None else None
+                if cache_key is not None:
+                    page_texts[page_num] = self.ocr_cache.get(cache_key)
+                    if page_texts[page_num] is not None:
+                        cleaned_pages[page_num] = DocumentProcessor._clean_ocr_text(page_texts[page_num])
+                        cached_pages += 1
+                        return
                 
-                try:
-                    # Запускаем асинхронный метод
-                    # В Celery tasks нет event loop, поэтому всегда используем asyncio.run()
+                # По расширению клиент определяет MIME тип (JPEG начинается с FF D8)
+                extension = "jpg" if image_bytes[:2] == b"\xff\xd8" else "png"
+                
+                # 429 повторяется с задержкой внутри клиента
+                page_text = await self.vision_client.extract_text_from_image(
+                    image_bytes,
+                    filename=f"page_{page_num + 1}.{extension}"
+                )
+                page_texts[page_num] = page_text
+                if page_text is not None:
+                    cleaned_pages[page_num] = DocumentProcessor._clean_ocr_text(page_text)
+                # None - ошибка запроса, ее не кэшируем
+                if page_text is not None and cache_key is not None:
+                    self.ocr_cache.put(cache_key, page_text)
+            
+            async def consume():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    page_num, image_bytes = item
+                    # Обработчик не должен завершиться ни при ошибке Vision API, ни при ошибке
+                    # кэша (SQLite), иначе поток рендеринга зависнет на полной очереди
                     try:
-                        loop = asyncio.get_event_loop()
-                        if loop.is_running():
-                            # Если loop уже запущен (редкий случай), используем ThreadPoolExecutor
-                            logger.debug(f"[DocumentProcessor] Sending page {i + 1} image to Vision API (event loop running)")
-                            import concurrent.futures
-                            with concurrent.futures.ThreadPoolExecutor() as executor:
-                                future = executor.submit(
-                                    lambda: asyncio.run(
-                                        self.vision_client.extract_text_from_image(
-                                            image_bytes, 
-                                            filename=f"page_{i+1}.png"
-                                        )
-                                    )
-                                )
-                                page_text = future.result(timeout=settings.vision_api_timeout + 10)
-                        else:
-                            # Loop существует, но не запущен
-                            logger.debug(f"[DocumentProcessor] Sending page {i + 1} image to Vision API (using existing loop)")
-                            page_text = loop.run_until_complete(
-                                self.vision_client.extract_text_from_image(
-                                    image_bytes,
-                                    filename=f"page_{i+1}.png"
-                                )
-                            )
-                    except RuntimeError:
-                        # Нет event loop (обычный случай в Celery tasks)
-                        logger.debug(f"[DocumentProcessor] Sending page {i + 1} image to Vision API (no event loop, using asyncio.run)")
-                        page_text = asyncio.run(
-                            self.vision_client.extract_text_from_image(
-                                image_bytes,
-                                filename=f"page_{i+1}.png"
-                            )
-                        )
-                    
-                    # page_text может быть None (ошибка) или строкой (включая пустую строку)
-                    if page_text is not None:
-                        if page_text.strip():
-                            all_text.append(page_text)
-                            logger.debug(f"Extracted {len(page_text)} characters from page {i + 1}")
-                        else:
-                            # Пустая строка - страница без текста, это валидный результат
-                            logger.debug(f"Page {i + 1} contains no text (empty OCR result)")
+                        await process_page(page_num, image_bytes)
+                    except Exception as e:
+                        logger.error(f"Error extracting text from page {page_num + 1} via Vision API: {e}")
+            
+            logger.info(f"[DocumentProcessor] Processing {page_count} PDF pages via Vision API (concurrency: {max_concurrency}, render threads: {len(ranges)})")
+            # Одна сессия (keep-alive, HTTP/2) на все страницы документа
+            consumers = []
+            try:
+                async with self.vision_client.session():
+                    consumers = [asyncio.create_task(consume()) for _ in range(max_concurrency)]
+                    await produce()
+                    for _ in consumers:
+                        await queue.put(None)
+                    await asyncio.gather(*consumers)
+            finally:
+                # При отмене освобождаем потоки рендеринга, ожидающие места в очереди
+                stop.set()
+                for consumer in consumers:
+                    consumer.cancel()
+                while not queue.empty():
+                    queue.get_nowait()
+            
+            if native_pages:
+                logger.info(f"[DocumentProcessor] Text layer: {native_pages}/{page_count} pages did not need OCR")
+            if cached_pages:
+                logger.info(f"[DocumentProcessor] OCR cache: {cached_pages}/{page_count} pages served from cache")
+            
+            all_text = []
+            all_cleaned = []
+            for i, page_text in enumerate(page_texts):
+                # page_text может быть None (ошибка) или строкой (включая пустую строку)
+                if page_text is not None:
+                    if page_text.strip():
+                        all_text.append(page_text)
+                        if cleaned_pages[i]:
+                            all_cleaned.append(cleaned_pages[i])
+                        logger.debug(f"Extracted {len(page_text)} characters from page {i + 1}")
                     else:
-                        # None означает ошибку при обработке страницы
-                        logger.warning(f"Failed to extract text from page {i + 1} via Vision API")
-                        
-                except Exception as page_error:
-                    logger.warning(f"Error processing page {i + 1} via Vision API: {page_error}")
-                    continue
+                        # Пустая строка - страница без текста, это валидный результат
+                        logger.debug(f"Page {i + 1} contains no text (empty OCR result)")
+                else:
+                    # None означает ошибку при обработке страницы
+                    logger.warning(f"Failed to extract text from page {i + 1} via Vision API")
             
             if all_text:
-                combined_text = "\n\n".join(all_text)
-                logger.info(f"Successfully extracted text from PDF via Vision API: {len(combined_text)} characters from {len(images)} pages")
-                # Спочатку базова фільтрація
-                cleaned_text = DocumentProcessor._clean_ocr_text(combined_text)
-                if cleaned_text != combined_text:
-                    logger.info(f"Basic filtering: removed {len(combined_text) - len(cleaned_text)} characters of technical metadata")
+                combined_length = sum(len(page_text) for page_text in all_text) + 2 * (len(all_text) - 1)
+                logger.info(f"Successfully extracted text from PDF via Vision API: {combined_length} characters from {page_count} pages")
+                # Спочатку базова фільтрація (вже виконана по сторінках; порожні рядки
+                # фільтр видаляє, тому сторінки з'єднуються одним переносом рядка)
+                cleaned_text = "\n".join(all_cleaned)
+                if len(cleaned_text) != combined_length:
+                    logger.info(f"Basic filtering: removed {combined_length - len(cleaned_text)} characters of technical metadata")
                 
                 # Потім очищення через LLM, якщо увімкнено
                 if self.use_llm_cleaning and self.llm_provider:
                     try:
-                        # Використовуємо синхронну обгортку для асинхронного методу
-                        try:
-                            loop = asyncio.get_event_loop()
-                            if loop.is_running():
-                                # Якщо loop вже запущений, використовуємо ThreadPoolExecutor
-                                import concurrent.futures
-                                with concurrent.futures.ThreadPoolExecutor() as executor:
-                                    future = executor.submit(
-                                        lambda: asyncio.run(self._clean_text_with_llm(cleaned_text))
-                                    )
-                                    cleaned_text = future.result(timeout=120)
-                            else:
-                                cleaned_text = loop.run_until_complete(self._clean_text_with_llm(cleaned_text))
-                        except RuntimeError:
-                            cleaned_text = asyncio.run(self._clean_text_with_llm(cleaned_text))
+                        cleaned_text = await self._clean_text_with_llm(cleaned_text)
                     except Exception as e:
                         logger.warning(f"LLM cleaning failed: {e}, using basic filtered text")
                 
@@ -624,6 +901,41 @@ class DocumentProcessor:
             logger.debug(traceback.format_exc())
             return None
     
+    def _extract_text_from_pdf_via_vision(self, file_path: str, max_concurrency: Optional[int] = None) -> Optional[str]:
+        """
+        Извлечение текста из PDF через Vision API (синхронная обертка)
+        
+        Args:
+            file_path: Путь к PDF файлу
+            max_concurrency: Одновременных запросов к Vision API (по умолчанию из настроек)
+            
+        Returns:
+            Извлеченный текст или None
+        """
+        if not self.use_vision_api or not self.vision_client:
+            return None
+        
+        def extract():
+            return self._extract_text_from_pdf_via_vision_async(file_path, max_concurrency)
+        
+        try:
+            # В Celery tasks нет event loop, поэтому обычно используется asyncio.run()
+            try:
+                loop = asyncio.get_event_loop()
+                if loop.is_running():
+                    # Если loop уже запущен (редкий случай), используем ThreadPoolExecutor
+                    import concurrent.futures
+                    with concurrent.futures.ThreadPoolExecutor() as executor:
+                        return executor.submit(lambda: asyncio.run(extract())).result()
+                return loop.run_until_complete(extract())
+            except RuntimeError:
+                return asyncio.run(extract())
+        except Exception as e:
+            logger.error(f"Error extracting text from PDF via Vision API: {e}")
+            import traceback
+            logger.debug(traceback.format_exc())
+            return None
+    
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Извлечение текста из PDF (с использованием Vision API и fallback на LangChain/PyPDF2)"""
         logger.info(f"Extracting text from PDF: {file_path}")
@@ -801,13 +1113,21 @@ class DocumentProcessor:
             return ""
     
     def _detect_html_encoding(self, file_path: str) -> str:
-        """Определение кодировки HTML файла"""
+        """
+        Определение кодировки HTML файла
+        
+        Читаются только первые 64KB: meta charset находится в <head>, а для
+        детекции по содержимому (charset-normalizer) этого окна достаточно.
+        """
         encodings = ['utf-8', 'windows-1251', 'cp1251', 'iso-8859-1', 'latin-1']
+        raw_content = b""
+        truncated = False
         
         # Сначала пытаемся найти кодировку в meta тегах
         try:
             with open(file_path, 'rb') as f:
-                raw_content = f.read(8192)  # Читаем первые 8KB
+                raw_content = f.read(65536)  # Читаем первые 64KB
+                truncated = bool(f.read(1))  # Файл длиннее окна
                 
                 # Пробуем разные кодировки для чтения meta тегов
                 for test_enc in ['utf-8', 'windows-1251', 'cp1251', 'iso-8859-1']:
@@ -835,7 +1155,25 @@ class DocumentProcessor:
         except Exception as e:
             logger.debug(f"Error detecting encoding from meta tags: {e}")
         
-        # Если не нашли в meta, пробуем определить по содержимому
+        # Если не нашли в meta, определяем по содержимому
+        if CHARSET_NORMALIZER_AVAILABLE and raw_content:
+            try:
+                raw_content.decode('utf-8')
+                logger.debug(f"Detected encoding by content: utf-8")
+                return 'utf-8'
+            except UnicodeDecodeError as e:
+                # Окно могло обрезать многобайтовый символ в конце
+                if (truncated and e.reason == 'unexpected end of data'
+                        and e.start >= len(raw_content) - 3):
+                    logger.debug(f"Detected encoding by content: utf-8")
+                    return 'utf-8'
+            
+            best = from_bytes(raw_content).best()
+            if best is not None:
+                logger.debug(f"Detected encoding by content: {best.encoding}")
+                return best.encoding
+        
+        # Без charset-normalizer пробуем кодировки по очереди
         for encoding in encodings:
             try:
                 with open(file_path, 'r', encoding=encoding, errors='strict') as f:
@@ -849,6 +1187,29 @@ class DocumentProcessor:
         logger.debug(f"Using default encoding: utf-8")
         return 'utf-8'
     
+    @staticmethod
+    def _strip_html_selectolax(html_content: str) -> str:
+        """
+        Извлечение видимого текста из HTML через selectolax
+        
+        Args:
+            html_content: HTML документ
+        
+        Returns:
+            Текст без скриптов и стилей, по одному блоку на строку
+        """
+        tree = LexborHTMLParser(html_content)
+        tree.strip_tags(['script', 'style', 'noscript'])
+        root = tree.body or tree.root
+        if root is None:
+            return ""
+        
+        # Та же нормализация пробелов, что и в пути через BeautifulSoup
+        text = root.text(separator='\n')
+        lines = (line.strip() for line in text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        return '\n'.join(chunk for chunk in chunks if chunk)
+    
     def extract_text_from_html(self, file_path: str) -> str:
         """Извлечение текста из HTML (с использованием LangChain и fallback на BeautifulSoup/html.parser)"""
         logger.info(f"[DocumentProcessor] Processing HTML file: {file_path}")
@@ -857,6 +1218,17 @@ class DocumentProcessor:
         encoding = self._detect_html_encoding(file_path)
         logger.debug(f"Detected HTML encoding: {encoding} for {file_path}")
         
+        # Быстрый путь: selectolax (C парсер, обход DOM без рекурсии в Python)
+        if SELECTOLAX_AVAILABLE:
+            try:
+                with open(file_path, 'r', encoding=encoding, errors='replace') as file:
+                    text = DocumentProcessor._strip_html_selectolax(file.read())
+                if text.strip():
+                    logger.info(f"Successfully extracted text from HTML using selectolax (encoding: {encoding}): {len(text)} characters")
+                    return text
+            except Exception as e:
+                logger.warning(f"selectolax failed for {file_path}: {e}, trying fallback")
+        
         # Пробуем LangChain loader
         if LANGCHAIN_AVAILABLE and HTML_LOADER_AVAILABLE:
             try:
@@ -989,19 +1361,14 @@ class DocumentProcessor:
         if self.text_splitter and LANGCHAIN_AVAILABLE:
             # Обновляем параметры если переданы
             if chunk_size is not None or chunk_overlap is not None:
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=chunk_size or settings.rag_chunk_size,
-                    chunk_overlap=chunk_overlap or settings.rag_chunk_overlap,
-                    length_function=len,
-                    separators=["\n\n", "\n", " ", ""]
+                splitter = self._get_splitter(
+                    chunk_size or settings.rag_chunk_size,
+                    chunk_overlap or settings.rag_chunk_overlap
                 )
             else:
                 splitter = self.text_splitter
             
-            # Создаем временный документ для splitter
-            doc = LangChainDocument(page_content=text)
-            chunks = splitter.split_documents([doc])
-            return [chunk.page_content for chunk in chunks]
+            return splitter.split_text(text)
         
         # Fallback на старую реализацию
         chunk_size = chunk_size or settings.rag_chunk_size
@@ -1018,3 +1385,31 @@ class DocumentProcessor:
         
         return chunks
 
+
+@functools.lru_cache(maxsize=4)
+def get_document_processor(use_vision_api: bool = True) -> DocumentProcessor:
+    """
+    DocumentProcessor, общий для процесса (создается один раз на набор параметров)
+    
+    Конструктор создает Vision API клиент, проверяет ключ API и поднимает LLM
+    провайдер для очистки текста. Скрипты и задачи, обрабатывающие много файлов,
+    получают готовый экземпляр вместо повторной инициализации.
+    
+    Args:
+        use_vision_api: Использовать Google Vision API для извлечения текста
+        
+    Returns:
+        DocumentProcessor
+    """
+    return DocumentProcessor(use_vision_api=use_vision_api)
+
+
+@atexit.register
+def _close_ocr_caches():
+    """Закрытие соединений с базами кэша OCR при завершении процесса"""
+    for cache in DocumentProcessor._ocr_caches.values():
+        try:
+            cache.close()
+        except Exception as e:
+            logger.debug(f"Failed to close OCR result cache {cache.path}: {e}")
+    DocumentProcessor._ocr_caches.clear()
@@ -0,0 +1,114 @@
+"""
+LRU кэш эмбеддингов по содержимому текста
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+from loguru import logger
+
+
+class CachedEmbeddingProvider:
+    """
+    Обертка над провайдером эмбеддингов с LRU кэшем
+    
+    Повторные тексты (одинаковые чанки при переиндексации, повторяющиеся
+    поисковые запросы) не отправляются в модель повторно. Ключ кэша -
+    sha256(имя модели + текст), поэтому смена модели не отдает старые векторы.
+    """
+    
+    def __init__(self, inner, model_name: str, capacity: int = 10000):
+        """
+        Инициализация кэша
+        
+        Args:
+            inner: Провайдер эмбеддингов с методами embed(text) и embed_batch(texts)
+            model_name: Имя embedding модели (часть ключа кэша)
+            capacity: Максимальное количество эмбеддингов в кэше
+        """
+        self.inner = inner
+        self.model_name = model_name
+        self.capacity = capacity
+        self._cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _key(self, text: str) -> bytes:
+        """Ключ кэша для текста"""
+        return hashlib.sha256((self.model_name + "\0" + text).encode('utf-8')).digest()
+    
+    def _get(self, key: bytes) -> Optional[List[float]]:
+        """Получение эмбеддинга из кэша"""
+        with self._lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+    
+    def _put(self, key: bytes, embedding: List[float]):
+        """Сохранение эмбеддинга с вытеснением самых старых записей"""
+        with self._lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+    
+    def embed(self, text: str) -> List[float]:
+        """
+        Эмбеддинг одного текста (запроса)
+        
+        Args:
+            text: Текст для эмбеддинга
+        
+        Returns:
+            Эмбеддинг как список float
+        """
+        key = self._key(text)
+        embedding = self._get(key)
+        if embedding is not None:
+            self.hits += 1
+            return embedding
+        
+        self.misses += 1
+        embedding = self.inner.embed(text)
+        self._put(key, embedding)
+        return embedding
+    
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Эмбеддинги для списка текстов: в модель отправляются только промахи кэша
+        
+        Args:
+            texts: Список текстов для эмбеддинга
+        
+        Returns:
+            Список эмбеддингов в порядке texts
+        """
+        keys = [self._key(text) for text in texts]
+        embeddings: List[Optional[List[float]]] = [self._get(key) for key in keys]
+        
+        # Уникальные тексты без эмбеддинга -> индексы, где они встречаются
+        missing: Dict[bytes, List[int]] = {}
+        for i, (key, embedding) in enumerate(zip(keys, embeddings)):
+            if embedding is None:
+                missing.setdefault(key, []).append(i)
+        
+        self.hits += len(texts) - sum(len(indices) for indices in missing.values())
+        self.misses += len(missing)
+        
+        if missing:
+            miss_texts = [texts[indices[0]] for indices in missing.values()]
+            miss_embeddings = self.inner.embed_batch(miss_texts)
+            for (key, indices), embedding in zip(missing.items(), miss_embeddings):
+                self._put(key, embedding)
+                for i in indices:
+                    embeddings[i] = embedding
+            logger.debug(f"Embedding cache: {len(texts) - len(miss_texts)}/{len(texts)} texts served from cache")
+        
+        return embeddings
+    
+    def clear(self):
+        """Очистка кэша"""
+        with self._lock:
+            self._cache.clear()
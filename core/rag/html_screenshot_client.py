@@ -1,35 +1,121 @@
 """
 Клиент для HTML Screenshot Service
 """
+import os
+import json
+import hashlib
+import tempfile
 import httpx
 from typing import Optional, Dict, Any
 from pathlib import Path
 from loguru import logger
 from config import settings
 
+# HTTP/2 для мультиплексирования запросов к сервису (требует пакет h2)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 
 class HTMLScreenshotClient:
     """Клиент для создания скриншотов HTML и получения текста через Vision API"""
     
-    def __init__(self, base_url: Optional[str] = None):
+    def __init__(self, base_url: Optional[str] = None, cache_dir: Optional[str] = None):
         """
         Инициализация клиента
         
         Args:
             base_url: URL сервиса скриншотов (по умолчанию из настроек или localhost:3015)
+            cache_dir: Директория дискового кэша OCR текста (по умолчанию из настроек, "" - без кэша)
         """
         self.base_url = base_url or getattr(settings, 'html_screenshot_url', 'http://localhost:3015')
         self.base_url = self.base_url.rstrip('/')
         self.timeout = getattr(settings, 'html_screenshot_timeout', 120)
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        if cache_dir is None:
+            cache_dir = getattr(settings, 'html_screenshot_cache_dir', '')
+        self.cache_dir: Optional[Path] = Path(cache_dir).expanduser() if cache_dir else None
+    
+    def _cache_path(self, html_content: str, params: Dict[str, Any]) -> Optional[Path]:
+        """
+        Путь к файлу кэша для HTML и параметров рендеринга
+        
+        Ключ - sha256 от HTML и параметров (viewport, full_page, language_hints),
+        поэтому тот же HTML с другими параметрами кэшируется отдельно.
+        """
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.sha256(html_content.encode('utf-8', 'ignore'))
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        return self.cache_dir / f"{digest.hexdigest()}.txt"
+    
+    @staticmethod
+    def _read_cache(path: Path) -> Optional[str]:
+        """Чтение текста из кэша (None, если записи нет)"""
+        try:
+            return path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"[HTML Screenshot] Failed to read cache {path}: {e}")
+            return None
+    
+    @staticmethod
+    def _write_cache(path: Path, text: str):
+        """Атомарная запись текста в кэш (временный файл + os.replace)"""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"[HTML Screenshot] Failed to write cache {path}: {e}")
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        HTTP клиент с пулом keep-alive соединений (создается при первом запросе)
+        
+        Все запросы экземпляра переиспользуют соединения вместо нового
+        TCP/TLS handshake на каждый вызов. Закрывается через aclose().
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+                http2=HTTP2_AVAILABLE
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Закрытие пула соединений"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def __aenter__(self) -> "HTMLScreenshotClient":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
     
     async def extract_text_from_html(
         self,
         html_content: str,
         viewport_width: int = 1920,
         viewport_height: int = 1080,
-        wait_time: int = 1000,
+        wait_time: int = 0,
         full_page: bool = True,
-        language_hints: Optional[list] = None
+        language_hints: Optional[list] = None,
+        use_cache: bool = True
     ) -> Optional[str]:
         """
         Создание скриншота HTML и извлечение текста через Vision API
@@ -38,9 +124,10 @@ class HTMLScreenshotClient:
             html_content: HTML контент
             viewport_width: Ширина viewport
             viewport_height: Высота viewport
-            wait_time: Время ожидания после загрузки (мс)
+            wait_time: Дополнительное ожидание после загрузки страницы и шрифтов (мс)
             full_page: Делать скриншот всей страницы
             language_hints: Подсказки по языкам
+            use_cache: Использовать дисковый кэш OCR текста по хэшу HTML
             
         Returns:
             Извлеченный текст или None в случае ошибки
@@ -49,7 +136,6 @@ class HTMLScreenshotClient:
             url = f"{self.base_url}/screenshot"
             
             data = {
-                "html_content": html_content,
                 "viewport_width": viewport_width,
                 "viewport_height": viewport_height,
                 "wait_time": wait_time,
@@ -59,26 +145,37 @@ class HTMLScreenshotClient:
             if language_hints:
                 data["language_hints"] = language_hints
             
+            # Тот же HTML с теми же параметрами уже распознавался - повторный рендер и OCR не нужны
+            cache_path = self._cache_path(html_content, data) if use_cache else None
+            if cache_path is not None:
+                cached_text = self._read_cache(cache_path)
+                if cached_text is not None:
+                    logger.info(f"[HTML Screenshot] Cache hit: {len(cached_text)} chars ({cache_path.name})")
+                    return cached_text
+            
+            data["html_content"] = html_content
+            
             logger.info(f"[HTML Screenshot] Sending HTML to screenshot service: {len(html_content)} chars")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=data)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get("success"):
-                        text = result.get("text")
-                        screenshot_size = result.get("screenshot_size", 0)
-                        logger.info(f"[HTML Screenshot] Successfully extracted text: {len(text) if text else 0} chars (screenshot: {screenshot_size} bytes)")
-                        return text
-                    else:
-                        error = result.get("error", "Unknown error")
-                        logger.error(f"[HTML Screenshot] Service returned error: {error}")
-                        return None
+            response = await self._get_client().post(url, json=data)
+            
+            if response.status_code == 200:
+                result = response.json()
+                if result.get("success"):
+                    text = result.get("text")
+                    screenshot_size = result.get("screenshot_size", 0)
+                    logger.info(f"[HTML Screenshot] Successfully extracted text: {len(text) if text else 0} chars (screenshot: {screenshot_size} bytes)")
+                    if cache_path is not None and text is not None:
+                        self._write_cache(cache_path, text)
+                    return text
                 else:
-                    logger.error(f"[HTML Screenshot] Service returned status {response.status_code}: {response.text[:200]}")
+                    error = result.get("error", "Unknown error")
+                    logger.error(f"[HTML Screenshot] Service returned error: {error}")
                     return None
-                    
+            else:
+                logger.error(f"[HTML Screenshot] Service returned status {response.status_code}: {response.text[:200]}")
+                return None
+                
         except httpx.TimeoutException:
             logger.error(f"[HTML Screenshot] Timeout after {self.timeout} seconds")
             return None
@@ -93,9 +190,10 @@ class HTMLScreenshotClient:
         file_path: str,
         viewport_width: int = 1920,
         viewport_height: int = 1080,
-        wait_time: int = 1000,
+        wait_time: int = 0,
         full_page: bool = True,
-        language_hints: Optional[list] = None
+        language_hints: Optional[list] = None,
+        use_cache: bool = True
     ) -> Optional[str]:
         """
         Создание скриншота из HTML файла и извлечение текста
@@ -104,9 +202,10 @@ class HTMLScreenshotClient:
             file_path: Путь к HTML файлу
             viewport_width: Ширина viewport
             viewport_height: Высота viewport
-            wait_time: Время ожидания после загрузки (мс)
+            wait_time: Дополнительное ожидание после загрузки страницы и шрифтов (мс)
             full_page: Делать скриншот всей страницы
             language_hints: Подсказки по языкам
+            use_cache: Использовать дисковый кэш OCR текста по хэшу HTML
             
         Returns:
             Извлеченный текст или None в случае ошибки
@@ -138,7 +237,8 @@ class HTMLScreenshotClient:
                 viewport_height=viewport_height,
                 wait_time=wait_time,
                 full_page=full_page,
-                language_hints=language_hints
+                language_hints=language_hints,
+                use_cache=use_cache
             )
             
         except FileNotFoundError:
@@ -155,7 +255,7 @@ class HTMLScreenshotClient:
         url: str,
         viewport_width: int = 1920,
         viewport_height: int = 1080,
-        wait_time: int = 1000,
+        wait_time: int = 0,
         full_page: bool = True,
         language_hints: Optional[list] = None
     ) -> Optional[str]:
@@ -166,7 +266,7 @@ class HTMLScreenshotClient:
             url: URL для загрузки
             viewport_width: Ширина viewport
             viewport_height: Высота viewport
-            wait_time: Время ожидания после загрузки (мс)
+            wait_time: Дополнительное ожидание после загрузки страницы и шрифтов (мс)
             full_page: Делать скриншот всей страницы
             language_hints: Подсказки по языкам
             
@@ -189,24 +289,23 @@ class HTMLScreenshotClient:
             
             logger.info(f"[HTML Screenshot] Sending URL to screenshot service: {url}")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(screenshot_url, json=data)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get("success"):
-                        text = result.get("text")
-                        screenshot_size = result.get("screenshot_size", 0)
-                        logger.info(f"[HTML Screenshot] Successfully extracted text from URL: {len(text) if text else 0} chars (screenshot: {screenshot_size} bytes)")
-                        return text
-                    else:
-                        error = result.get("error", "Unknown error")
-                        logger.error(f"[HTML Screenshot] Service returned error: {error}")
-                        return None
+            response = await self._get_client().post(screenshot_url, json=data)
+            
+            if response.status_code == 200:
+                result = response.json()
+                if result.get("success"):
+                    text = result.get("text")
+                    screenshot_size = result.get("screenshot_size", 0)
+                    logger.info(f"[HTML Screenshot] Successfully extracted text from URL: {len(text) if text else 0} chars (screenshot: {screenshot_size} bytes)")
+                    return text
                 else:
-                    logger.error(f"[HTML Screenshot] Service returned status {response.status_code}: {response.text[:200]}")
+                    error = result.get("error", "Unknown error")
+                    logger.error(f"[HTML Screenshot] Service returned error: {error}")
                     return None
-                    
+            else:
+                logger.error(f"[HTML Screenshot] Service returned status {response.status_code}: {response.text[:200]}")
+                return None
+                
         except httpx.TimeoutException:
             logger.error(f"[HTML Screenshot] Timeout after {self.timeout} seconds")
             return None
@@ -0,0 +1,118 @@
+"""
+Дисковый LRU кэш результатов OCR по хэшу изображения
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, List
+from loguru import logger
+
+
+class OCRResultCache:
+    """
+    Кэш текста, распознанного Vision API, в SQLite
+    
+    Ключ - sha256 от байтов изображения страницы (и подсказок по языкам),
+    поэтому одинаковые страницы не отправляются в Vision API повторно,
+    в том числе после перезапуска процесса. Хэш считается за миллисекунды,
+    а OCR запрос занимает сотни миллисекунд и расходует квоту API.
+    При превышении capacity удаляются давно не использованные записи.
+    """
+    
+    def __init__(self, path: str, capacity: int = 10000):
+        """
+        Инициализация кэша
+        
+        Args:
+            path: Путь к файлу SQLite базы
+            capacity: Максимальное количество записей
+        """
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # Одно соединение на экземпляр, доступ из потоков сериализуется через _lock
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ocr_accessed_at ON ocr (accessed_at)")
+        self._conn.commit()
+        logger.info(f"OCR result cache opened: {path} (capacity: {capacity})")
+    
+    @staticmethod
+    def key(image_data: bytes, language_hints: Optional[List[str]] = None) -> str:
+        """
+        Ключ кэша для изображения
+        
+        Args:
+            image_data: Байты изображения
+            language_hints: Подсказки по языкам (влияют на результат OCR)
+        
+        Returns:
+            sha256 в hex
+        """
+        digest = hashlib.sha256(image_data)
+        digest.update(("\0" + ",".join(language_hints or [])).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Получение текста из кэша
+        
+        Args:
+            key: Ключ кэша
+        
+        Returns:
+            Текст или None, если записи нет
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM ocr WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE ocr SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+    
+    def put(self, key: str, text: str):
+        """
+        Сохранение текста с вытеснением давно не использованных записей
+        
+        Args:
+            key: Ключ кэша
+            text: Распознанный текст
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr (key, text, accessed_at) VALUES (?, ?, ?)",
+                (key, text, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM ocr WHERE key IN ("
+                "SELECT key FROM ocr ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.capacity,)
+            )
+            self._conn.commit()
+    
+    def clear(self):
+        """Очистка кэша"""
+        with self._lock:
+            self._conn.execute("DELETE FROM ocr")
+            self._conn.commit()
+    
+    def close(self):
+        """Закрытие соединения с базой"""
+        with self._lock:
+            self._conn.close()
@@ -2,14 +2,60 @@
 Сервис RAG для работы с документами с поддержкой кэширования
 """
 import os
+import asyncio
+import threading
+import weakref
 from typing import List, Dict, Any, Optional
 from .document_processor import DocumentProcessor
 from .document_classifier import DocumentClassifier
-from .vector_store import create_vector_store, DummyVectorStore
+from .vector_store import create_vector_store, DummyVectorStore, VectorStoreBase
+from .embedding_cache import CachedEmbeddingProvider
+from config import settings
 from core.services.cache_service import CacheService
 from core.resilience import resilient_rag
 from loguru import logger
 
+# Event loop для синхронных вызовов: один asyncio.Runner на поток
+_runner_local = threading.local()
+
+
+class _RunnerHolder:
+    """
+    asyncio.Runner потока, закрываемый вместе с потоком
+    
+    Держатель хранится только в threading.local: при завершении потока он
+    удаляется, и weakref.finalize закрывает Runner (event loop, его selector
+    и незавершенные async генераторы). Для живых потоков Runner закрывается
+    при выходе из интерпретатора.
+    """
+    __slots__ = ('runner', '__weakref__')
+    
+    def __init__(self):
+        # loop_factory: loop Runner'а не становится текущим loop потока
+        self.runner = asyncio.Runner(loop_factory=asyncio.new_event_loop)
+        weakref.finalize(self, self.runner.close)
+
+
+def _run_sync(coro):
+    """
+    Выполнение корутины из синхронного кода в asyncio.Runner текущего потока
+    
+    Runner создается один раз на поток и переиспользуется: нет создания
+    нового event loop на каждый вызов, а async клиенты (Redis) остаются
+    привязанными к одному и тому же loop.
+    
+    Args:
+        coro: Корутина
+        
+    Returns:
+        Результат корутины
+    """
+    holder = getattr(_runner_local, 'holder', None)
+    if holder is None:
+        holder = _RunnerHolder()
+        _runner_local.holder = holder
+    return holder.runner.run(coro)
+
 
 class RAGService:
     """Сервис для работы с RAG с кэшированием"""
@@ -25,6 +71,18 @@ class RAGService:
         self.processor = DocumentProcessor(use_vision_api=True)
         self.vector_store = create_vector_store()
         self.cache_service = cache_service
+        
+        # Повторные чанки и поисковые запросы не пересчитываются моделью
+        if (
+            isinstance(self.vector_store, VectorStoreBase)
+            and not isinstance(self.vector_store, DummyVectorStore)
+            and settings.rag_embedding_cache_size > 0
+        ):
+            self.vector_store.embedding_cache = CachedEmbeddingProvider(
+                self.vector_store,
+                model_name=settings.rag_embedding_model,
+                capacity=settings.rag_embedding_cache_size
+            )
     
     def add_document(self, file_path: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -74,13 +132,15 @@ class RAGService:
         chunks_count = len(chunks)
         
         # Подготовка метаданных
-        if metadata is None:
-            metadata = {}
         metadata['source'] = file_path
         metadata['document_type'] = doc_type
         metadata['document_type_confidence'] = doc_confidence
         
-        metadatas = [metadata.copy() for _ in chunks]
+        # Метаданные у всех чанков одинаковые: одна копия (чтобы хранилище не меняло
+        # словарь вызывающего) передается по ссылке, payload каждой точки хранилище
+        # собирает само
+        chunk_metadata = dict(metadata)
+        metadatas = [chunk_metadata] * chunks_count
         
         # Добавление в векторное хранилище
         self.vector_store.add_documents(chunks, metadatas)
@@ -126,7 +186,6 @@ class RAGService:
         logger.info(f"Document {file_path} added to RAG system: {chunks_count} chunks in {collections}")
         
         # Сохраняем метаданные в Redis
-        filename = metadata.get('filename') or os.path.basename(file_path)
         self._save_document_metadata(filename, file_path, metadata, chunks_count=chunks_count, 
                                     status='success', collections=collections)
         
@@ -161,8 +220,9 @@ class RAGService:
                 logger.debug(f"RAG search cache hit for query: {query[:50]}...")
                 return cached_result
         
-        # Поиск в векторном хранилище
-        results = self.vector_store.search(query, top_k)
+        # Поиск в векторном хранилище: эмбеддинг запроса и RPC к хранилищу блокирующие,
+        # поэтому выполняются в потоке - event loop свободен, параллельные поиски идут одновременно
+        results = await asyncio.to_thread(self.vector_store.search, query, top_k)
         
         # Сохранение в кэш
         if self.cache_service:
@@ -171,6 +231,47 @@ class RAGService:
         
         return results
     
+    def search_sync(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
+        """
+        Синхронная обертка над search() для скриптов и Celery задач
+        
+        Нельзя вызывать из запущенного event loop - там используйте await search().
+        
+        Args:
+            query: Поисковый запрос
+            top_k: Количество результатов
+            
+        Returns:
+            Список релевантных документов
+        """
+        return _run_sync(self.search(query, top_k))
+    
+    async def search_many(self, queries: List[str], top_k: int = None) -> List[List[Dict[str, Any]]]:
+        """
+        Параллельный поиск по нескольким запросам
+        
+        Args:
+            queries: Поисковые запросы
+            top_k: Количество результатов на запрос
+            
+        Returns:
+            Списки результатов в порядке запросов
+        """
+        return list(await asyncio.gather(*(self.search(query, top_k) for query in queries)))
+    
+    def search_many_sync(self, queries: List[str], top_k: int = None) -> List[List[Dict[str, Any]]]:
+        """
+        Синхронная обертка над search_many() (см. search_sync())
+        
+        Args:
+            queries: Поисковые запросы
+            top_k: Количество результатов на запрос
+            
+        Returns:
+            Списки результатов в порядке запросов
+        """
+        return _run_sync(self.search_many(queries, top_k))
+    
     @resilient_rag(name="rag_get_context")
     async def get_context(self, query: str, top_k: int = None) -> str:
         """
@@ -490,8 +591,8 @@ class RAGService:
                 logger.debug(f"Document '{filename}' is not a PDF, cannot generate preview")
                 return None
             
-            # Конвертируем первую страницу PDF в изображение
-            images = self.processor._pdf_to_images(file_path)
+            # Конвертируем только первую страницу PDF в изображение
+            images = self.processor._pdf_to_images(file_path, max_pages=1)
             if images and len(images) > 0:
                 return images[0]  # Возвращаем первую страницу
             
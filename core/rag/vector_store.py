@@ -51,6 +51,7 @@ except ImportError:
 try:
     from qdrant_client import QdrantClient
     from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+    from qdrant_client.models import ScalarQuantization, ScalarQuantizationConfig, ScalarType
     QDRANT_AVAILABLE = True
 except ImportError:
     QDRANT_AVAILABLE = False
@@ -62,6 +63,9 @@ except ImportError:
 class VectorStoreBase(ABC):
     """Базовый класс для векторных хранилищ с поддержкой LangChain embeddings"""
     
+    # Кэш эмбеддингов (CachedEmbeddingProvider), подключается через RAGService
+    embedding_cache = None
+    
     def __init__(self, embedding_model_name: str):
         """
         Инициализация embedding модели
@@ -145,6 +149,62 @@ class VectorStoreBase(ABC):
         else:
             raise RuntimeError("No valid embedding model available")
     
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Эмбеддинги для списка текстов пакетами по rag_embedding_batch_size
+        
+        Все чанки документа отправляются в модель пакетами, а не по одному;
+        порядок эмбеддингов совпадает с порядком текстов.
+        
+        Args:
+            texts: Список текстов для эмбеддинга
+            
+        Returns:
+            Список эмбеддингов в порядке texts
+        """
+        batch_size = max(1, settings.rag_embedding_batch_size)
+        if len(texts) <= batch_size:
+            return list(self._embed_documents(texts))
+        
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), batch_size):
+            embeddings.extend(self._embed_documents(texts[start:start + batch_size]))
+        logger.debug(f"Embedded {len(texts)} texts in {(len(texts) + batch_size - 1) // batch_size} batches")
+        return embeddings
+    
+    def embed(self, text: str) -> List[float]:
+        """
+        Эмбеддинг одного текста (запроса)
+        
+        Args:
+            text: Текст для эмбеддинга
+            
+        Returns:
+            Эмбеддинг как список float
+        """
+        return self._embed_query(text)
+    
+    def _embedder(self):
+        """Источник эмбеддингов для индексации и поиска: кэш, если подключен, иначе модель"""
+        return self.embedding_cache or self
+    
+    @staticmethod
+    def _insert_batches(count: int):
+        """
+        Диапазоны для вставки в БД пакетами по rag_insert_batch_size
+        
+        Все чанки документа вставляются одним запросом, а очень большие
+        документы делятся на пакеты, чтобы не упереться в лимит размера запроса.
+        
+        Args:
+            count: Количество вставляемых документов
+            
+        Returns:
+            Список пар (start, end)
+        """
+        batch_size = max(1, settings.rag_insert_batch_size)
+        return [(start, min(start + batch_size, count)) for start in range(0, count, batch_size)]
+    
     def _get_embedding_dimension(self) -> int:
         """
         Получение размерности эмбеддингов
@@ -197,6 +257,25 @@ class VectorStoreBase(ABC):
         """
         pass
     
+    @abstractmethod
+    def upsert_batch(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """
+        Массовая запись готовых векторов через bulk API хранилища
+        
+        Args:
+            ids: ID точек
+            vectors: Эмбеддинги
+            documents: Тексты чанков
+            metadatas: Метаданные чанков
+        """
+        pass
+    
     def list_documents(self) -> List[Dict[str, Any]]:
         """
         Получение списка всех уникальных документов с их метаданными
@@ -255,15 +334,58 @@ class QdrantVectorStore(VectorStoreBase):
                     vectors_config=VectorParams(
                         size=self.embedding_dim,
                         distance=Distance.COSINE
-                    )
+                    ),
+                    quantization_config=self._quantization_config()
                 )
-                logger.info(f"Created Qdrant collection: {self.collection_name}")
+                logger.info(f"Created Qdrant collection: {self.collection_name} (dtype: {settings.rag_embedding_dtype})")
             else:
                 logger.info(f"Using existing Qdrant collection: {self.collection_name}")
+                self._ensure_quantization()
         except Exception as e:
             logger.error(f"Error initializing Qdrant collection: {e}")
             raise
     
+    def _quantization_config(self):
+        """
+        Настройки квантизации коллекции по rag_embedding_dtype
+        
+        int8: Qdrant хранит в RAM векторы int8 (в 4 раза меньше float32)
+        и ищет по ним, оригинальные float32 векторы остаются на диске
+        для уточнения (rescore) лучших кандидатов.
+        
+        Returns:
+            ScalarQuantization для int8 или None для f32
+        """
+        dtype = settings.rag_embedding_dtype.lower()
+        if dtype == "int8":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=True
+                )
+            )
+        if dtype != "f32":
+            logger.warning(f"Unknown rag_embedding_dtype '{settings.rag_embedding_dtype}', using f32")
+        return None
+    
+    def _ensure_quantization(self):
+        """Включение квантизации для существующей коллекции, созданной без нее"""
+        quantization_config = self._quantization_config()
+        if quantization_config is None:
+            return
+        
+        try:
+            info = self.client.get_collection(self.collection_name)
+            if info.config.quantization_config is None:
+                self.client.update_collection(
+                    collection_name=self.collection_name,
+                    quantization_config=quantization_config
+                )
+                logger.info(f"Enabled int8 quantization for Qdrant collection: {self.collection_name}")
+        except Exception as e:
+            logger.warning(f"Failed to enable quantization for Qdrant collection: {e}")
+    
     def add_documents(
         self,
         documents: List[str],
@@ -274,8 +396,8 @@ class QdrantVectorStore(VectorStoreBase):
         if not documents:
             return
         
-        # Генерация эмбеддингов через LangChain API
-        embeddings = self._embed_documents(documents)
+        # Генерация эмбеддингов пакетами
+        embeddings = self._embedder().embed_batch(documents)
         
         # Подготовка метаданных
         if metadatas is None:
@@ -297,34 +419,51 @@ class QdrantVectorStore(VectorStoreBase):
         
         # Генерация ID
         import uuid
-        points = []
-        for i, (doc, embedding, metadata) in enumerate(zip(documents, embeddings, metadatas)):
-            point_id = str(uuid.uuid4())
-            points.append(
-                PointStruct(
-                    id=point_id,
-                    vector=embedding,
-                    payload={
-                        "text": doc,
-                        **metadata
-                    }
-                )
-            )
+        ids = [str(uuid.uuid4()) for _ in documents]
         
-        # Добавление в коллекцию
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=points
-        )
+        self.upsert_batch(ids, embeddings, documents, metadatas)
         
         logger.info(f"Added {len(documents)} documents to Qdrant with model version {model_version or '1.0.0'}")
     
+    def upsert_batch(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """
+        Массовая запись точек в Qdrant: один upsert на пакет rag_insert_batch_size
+        
+        Промежуточные пакеты отправляются без ожидания индексации (wait=False),
+        ожидается только последний: обновления коллекции применяются по порядку,
+        поэтому после него записаны все точки.
+        """
+        points = [
+            PointStruct(
+                id=point_id,
+                vector=vector,
+                payload={
+                    "text": doc,
+                    **metadata
+                }
+            )
+            for point_id, vector, doc, metadata in zip(ids, vectors, documents, metadatas)
+        ]
+        
+        for start, end in self._insert_batches(len(points)):
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=points[start:end],
+                wait=end == len(points)
+            )
+    
     def search(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
         """Поиск релевантных документов в Qdrant"""
         top_k = top_k or settings.rag_top_k
         
-        # Генерация эмбеддинга для запроса через LangChain API
-        query_embedding = self._embed_query(query)
+        # Генерация эмбеддинга для запроса
+        query_embedding = self._embedder().embed(query)
         
         # Поиск в коллекции (используем query_points для новых версий qdrant-client)
         try:
@@ -687,6 +826,9 @@ class ChromaVectorStore(VectorStoreBase):
             name="legal_documents",
             metadata={"description": "Юридические документы, справки, договоры"}
         )
+        
+        if settings.rag_embedding_dtype.lower() != "f32":
+            logger.warning(f"ChromaDB does not support rag_embedding_dtype '{settings.rag_embedding_dtype}', storing float32 vectors")
     
     def add_documents(
         self,
@@ -698,8 +840,8 @@ class ChromaVectorStore(VectorStoreBase):
         if not documents:
             return
         
-        # Генерация эмбеддингов через LangChain API
-        embeddings = self._embed_documents(documents)
+        # Генерация эмбеддингов пакетами
+        embeddings = self._embedder().embed_batch(documents)
         
         # Подготовка метаданных
         if metadatas is None:
@@ -721,24 +863,39 @@ class ChromaVectorStore(VectorStoreBase):
                 metadata['migration_history'] = "[]"  # Пустой список как JSON строка
         
         # Генерация ID
-        ids = [f"doc_{i}_{hash(doc[:50])}" for i, doc in enumerate(documents)]
+        import uuid
+        ids = [str(uuid.uuid4()) for _ in documents]
         
-        # Добавление в коллекцию
-        self.collection.add(
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        self.upsert_batch(ids, embeddings, documents, metadatas)
         
         logger.info(f"Added {len(documents)} documents to ChromaDB with model version {model_version or '1.0.0'}")
     
+    def upsert_batch(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """
+        Массовая запись в ChromaDB: один upsert на пакет rag_insert_batch_size
+        
+        Точки с существующими id перезаписываются, как и в Qdrant.
+        """
+        for start, end in self._insert_batches(len(ids)):
+            self.collection.upsert(
+                embeddings=vectors[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
+    
     def search(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
         """Поиск релевантных документов в ChromaDB"""
         top_k = top_k or settings.rag_top_k
         
-        # Генерация эмбеддинга для запроса через LangChain API
-        query_embedding = self._embed_query(query)
+        # Генерация эмбеддинга для запроса
+        query_embedding = self._embedder().embed(query)
         
         # Поиск в коллекции
         results = self.collection.query(
@@ -962,6 +1119,16 @@ class DummyVectorStore(VectorStoreBase):
         """Заглушка - документы не сохраняются"""
         logger.warning(f"DummyVectorStore: {len(documents)} documents not saved (vector store unavailable)")
     
+    def upsert_batch(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Заглушка - точки не сохраняются"""
+        logger.warning(f"DummyVectorStore: {len(ids)} points not saved (vector store unavailable)")
+    
     def search(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
         """Заглушка - возвращает пустой список"""
         logger.warning(f"DummyVectorStore: search for '{query[:50]}...' returned empty results")
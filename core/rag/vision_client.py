@@ -2,21 +2,37 @@
 Клиент для Google Vision API на mail.s0me.uk
 """
 import io
+import asyncio
+import random
 import httpx
-from typing import Optional, Dict, Any
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, AsyncIterator
 from pathlib import Path
 from loguru import logger
 from config import settings
 
+# HTTP/2 для мультиплексирования запросов к Vision API (требует пакет h2)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 
 class VisionAPIClient:
     """Клиент для отправки документов в Google Vision API"""
     
+    # Общий пул соединений для всех экземпляров клиента (открывается долгоживущими сервисами)
+    _shared_client: Optional[httpx.AsyncClient] = None
+    _shared_client_loop: Optional[asyncio.AbstractEventLoop] = None
+    
     def __init__(self):
         """Инициализация клиента"""
         self.api_url = settings.vision_api_url.rstrip('/')
         self.api_key = settings.vision_api_key
         self.timeout = settings.vision_api_timeout
+        # Сессии по event loop: loop -> [httpx.AsyncClient, число пользователей]
+        self._sessions: Dict[asyncio.AbstractEventLoop, list] = {}
         
         if not self.api_key:
             logger.warning("Vision API key is not set. OCR via Vision API will not be available.")
@@ -25,6 +41,162 @@ class VisionAPIClient:
         """Проверка доступности API"""
         return bool(self.api_key)
     
+    @classmethod
+    def open_shared_client(cls, timeout: Optional[float] = None) -> httpx.AsyncClient:
+        """
+        Открытие общего пула соединений к Vision API для текущего event loop
+        
+        Все экземпляры клиента, работающие в этом event loop, переиспользуют
+        keep-alive соединения вместо нового TLS handshake на каждый запрос.
+        
+        Args:
+            timeout: Таймаут запросов (по умолчанию из настроек)
+            
+        Returns:
+            Общий httpx.AsyncClient
+        """
+        if cls._shared_client is None or cls._shared_client.is_closed:
+            cls._shared_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=64, max_connections=128),
+                timeout=timeout or settings.vision_api_timeout
+            )
+            cls._shared_client_loop = asyncio.get_running_loop()
+            logger.info(f"[Vision API] Shared connection pool opened (http2={HTTP2_AVAILABLE})")
+        return cls._shared_client
+    
+    @classmethod
+    async def close_shared_client(cls):
+        """Закрытие общего пула соединений"""
+        if cls._shared_client is not None:
+            await cls._shared_client.aclose()
+            cls._shared_client = None
+            cls._shared_client_loop = None
+            logger.info("[Vision API] Shared connection pool closed")
+    
+    async def _open_session(self) -> httpx.AsyncClient:
+        """Открытие (или повторное использование) сессии для текущего event loop"""
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is None or entry[0].is_closed:
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=32),
+                timeout=self.timeout
+            )
+            entry = self._sessions[loop] = [client, 0]
+            logger.debug(f"[Vision API] Session opened (http2={HTTP2_AVAILABLE})")
+        entry[1] += 1
+        return entry[0]
+    
+    async def _close_session(self):
+        """Освобождение сессии текущего event loop (закрывается последним пользователем)"""
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(loop)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._sessions[loop]
+            await entry[0].aclose()
+            logger.debug("[Vision API] Session closed")
+    
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator["VisionAPIClient"]:
+        """
+        Сессия с keep-alive соединениями на время серии запросов
+        
+        Внутри сессии все запросы этого экземпляра (например, страницы одного PDF)
+        идут через один httpx.AsyncClient с HTTP/2: TLS handshake выполняется
+        один раз, а не на каждую страницу. Вложенные и параллельные сессии в одном
+        event loop используют один клиент, он закрывается при выходе из последней.
+        """
+        await self._open_session()
+        try:
+            yield self
+        finally:
+            await self._close_session()
+    
+    async def __aenter__(self) -> "VisionAPIClient":
+        await self._open_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._close_session()
+    
+    async def warm_up(self) -> bool:
+        """
+        Прогрев соединения с Vision API (DNS, TCP, TLS и согласование HTTP/2)
+        
+        Дешевый HEAD запрос через общий пул, чтобы первый OCR запрос
+        не платил за установку соединения. Статус ответа не важен.
+        
+        Returns:
+            True, если соединение установлено
+        """
+        try:
+            async with self._client() as client:
+                await client.head(self.api_url, headers={"X-API-Key": self.api_key})
+            logger.info("[Vision API] Connection warmed up")
+            return True
+        except Exception as e:
+            logger.warning(f"[Vision API] Warm-up failed: {e}")
+            return False
+    
+    async def _post_with_retry(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        headers: Dict[str, str],
+        files: Dict[str, Any],
+        data: Dict[str, str]
+    ) -> httpx.Response:
+        """
+        POST запрос к Vision API с повтором при 429 (rate limit)
+        
+        Задержка растет экспоненциально (1, 2, 4... сек, не более 30) со
+        случайной добавкой, чтобы параллельные запросы страниц не повторялись
+        одновременно; заголовок Retry-After имеет приоритет.
+        
+        Returns:
+            Ответ сервера (последний ответ 429, если повторы исчерпаны)
+        """
+        max_retries = max(0, settings.vision_api_max_retries)
+        delay = 1.0
+        for attempt in range(max_retries + 1):
+            response = await client.post(url, headers=headers, files=files, data=data)
+            if response.status_code != 429 or attempt == max_retries:
+                return response
+            
+            retry_after = response.headers.get("Retry-After", "")
+            wait = float(retry_after) if retry_after.isdigit() else delay + random.uniform(0, delay / 2)
+            logger.warning(f"[Vision API] Rate limit exceeded (429), retrying in {wait:.1f}s (attempt {attempt + 1}/{max_retries})")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, 30.0)
+        return response
+    
+    @asynccontextmanager
+    async def _client(self) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        HTTP клиент для запроса: общий пул, если он открыт в текущем event loop,
+        затем открытая сессия экземпляра, иначе временный клиент
+        (например, при одиночном вызове через asyncio.run())
+        """
+        loop = asyncio.get_running_loop()
+        shared = VisionAPIClient._shared_client
+        session = self._sessions.get(loop)
+        if (
+            shared is not None
+            and not shared.is_closed
+            and VisionAPIClient._shared_client_loop is loop
+        ):
+            yield shared
+        elif session is not None and not session[0].is_closed:
+            yield session[0]
+        else:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                yield client
+    
     async def extract_text_from_image(
         self, 
         image_data: bytes, 
@@ -83,14 +255,9 @@ class VisionAPIClient:
             logger.debug(f"[Vision API] Headers: X-API-Key={'*' * 20}... (hidden)")
             logger.debug(f"[Vision API] Data params: {data}")
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with self._client() as client:
                 logger.info(f"[Vision API] Sending POST request to Vision API server...")
-                response = await client.post(
-                    url,
-                    headers=headers,
-                    files=files,
-                    data=data
-                )
+                response = await self._post_with_retry(client, url, headers, files, data)
                 logger.info(f"[Vision API] Received response: status={response.status_code}, size={len(response.content)} bytes")
                 
                 # Пытаемся распарсить JSON ответ (даже для ошибок)
@@ -157,6 +324,43 @@ class VisionAPIClient:
             logger.debug(traceback.format_exc())
             return None
     
+    async def extract_text_from_images(
+        self,
+        images: List[bytes],
+        filenames: Optional[List[str]] = None,
+        language_hints: Optional[list] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[Optional[str]]:
+        """
+        Извлечение текста из нескольких изображений через Vision API
+        
+        Vision API принимает одно изображение на запрос, поэтому запросы
+        отправляются параллельно (не более max_concurrency одновременно)
+        через общий пул соединений.
+        
+        Args:
+            images: Список байтов изображений
+            filenames: Имена файлов (опционально, по одному на изображение)
+            language_hints: Подсказки по языкам
+            max_concurrency: Максимум одновременных запросов (по умолчанию vision_api_max_concurrency)
+            
+        Returns:
+            Список результатов в порядке изображений (None для ошибок)
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or settings.vision_api_max_concurrency))
+        
+        async def extract_one(index: int, image_data: bytes) -> Optional[str]:
+            async with semaphore:
+                return await self.extract_text_from_image(
+                    image_data,
+                    filename=filenames[index] if filenames else None,
+                    language_hints=language_hints
+                )
+        
+        return list(await asyncio.gather(
+            *(extract_one(i, image_data) for i, image_data in enumerate(images))
+        ))
+    
     async def extract_text_from_file(
         self, 
         file_path: str,
@@ -2,8 +2,9 @@
 Celery задачи для фоновой обработки
 """
 import os
+import mmap
 import tempfile
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 from loguru import logger
 from core.celery_app import celery_app
 from core.rag.rag_service import RAGService
@@ -36,7 +37,7 @@ def process_document_task(
     self,
     file_path: str,
     metadata: Optional[Dict[str, Any]] = None,
-    file_content: Optional[bytes] = None,
+    file_content: Optional[Union[bytes, memoryview, mmap.mmap]] = None,
     filename: Optional[str] = None
 ):
     """
@@ -46,7 +47,9 @@ def process_document_task(
         self: Celery task instance (для retry)
         file_path: Путь к файлу (если файл уже сохранен)
         metadata: Метаданные документа
-        file_content: Содержимое файла в байтах (если файл еще не сохранен)
+        file_content: Содержимое файла (bytes или буфер без копирования - memoryview, mmap),
+            если файл еще не сохранен. mmap/memoryview допустимы только при прямом вызове
+            задачи, через брокер Celery передаются bytes
         filename: Имя файла (для временного сохранения)
         
     Returns:
@@ -57,6 +60,7 @@ def process_document_task(
         rag_service = get_rag_service()
         
         # Если передан контент, сохраняем во временный файл
+        # (write принимает любой буфер, копия содержимого в bytes не создается)
         if file_content and filename:
             temp_file = tempfile.NamedTemporaryFile(
                 delete=False,
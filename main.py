@@ -75,6 +75,10 @@ class SuggestedAction(BaseModel):
     type: str = "action"
 
 
+class TaskStatusBatchRequest(BaseModel):
+    task_ids: List[str]
+
+
 class QueryResponse(BaseModel):
     answer: str
     sources: List[str]
@@ -289,6 +293,47 @@ async def add_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _task_status(task_id: str) -> dict:
+    """
+    Статус задачи Celery в формате ответа API
+    
+    Args:
+        task_id: ID задачи Celery
+        
+    Returns:
+        Статус задачи и результат (если готов)
+    """
+    from core.celery_app import celery_app
+    
+    task = celery_app.AsyncResult(task_id)
+    
+    if task.state == "PENDING":
+        return {
+            "task_id": task_id,
+            "status": "pending",
+            "message": "Task is waiting to be processed"
+        }
+    elif task.state == "PROGRESS":
+        return {
+            "task_id": task_id,
+            "status": "processing",
+            "message": "Task is being processed",
+            "progress": task.info.get("progress", 0) if isinstance(task.info, dict) else None
+        }
+    elif task.state == "SUCCESS":
+        return {
+            "task_id": task_id,
+            "status": "success",
+            "result": task.result
+        }
+    else:  # FAILURE или другие состояния
+        return {
+            "task_id": task_id,
+            "status": task.state.lower(),
+            "error": str(task.info) if task.info else "Unknown error"
+        }
+
+
 @app.get("/rag/task/{task_id}")
 async def get_task_status(task_id: str):
     """
@@ -301,42 +346,33 @@ async def get_task_status(task_id: str):
         Статус задачи и результат (если готов)
     """
     try:
-        from core.celery_app import celery_app
-        
-        task = celery_app.AsyncResult(task_id)
-        
-        if task.state == "PENDING":
-            response = {
-                "task_id": task_id,
-                "status": "pending",
-                "message": "Task is waiting to be processed"
-            }
-        elif task.state == "PROGRESS":
-            response = {
-                "task_id": task_id,
-                "status": "processing",
-                "message": "Task is being processed",
-                "progress": task.info.get("progress", 0) if isinstance(task.info, dict) else None
-            }
-        elif task.state == "SUCCESS":
-            response = {
-                "task_id": task_id,
-                "status": "success",
-                "result": task.result
-            }
-        else:  # FAILURE или другие состояния
-            response = {
-                "task_id": task_id,
-                "status": task.state.lower(),
-                "error": str(task.info) if task.info else "Unknown error"
-            }
-        
-        return response
+        return _task_status(task_id)
     except Exception as e:
         logger.error(f"Error getting task status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/rag/tasks/batch")
+async def get_tasks_status_batch(request: TaskStatusBatchRequest):
+    """
+    Получение статусов нескольких задач одним запросом
+    
+    Клиенту, загрузившему несколько документов, не нужно опрашивать
+    /rag/task/{task_id} отдельным запросом для каждой задачи.
+    
+    Args:
+        request: Список ID задач Celery
+        
+    Returns:
+        Словарь tasks: task_id -> статус задачи (как в /rag/task/{task_id})
+    """
+    try:
+        return {"tasks": {task_id: _task_status(task_id) for task_id in request.task_ids}}
+    except Exception as e:
+        logger.error(f"Error getting tasks status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/rag/add-documents-batch")
 async def add_documents_batch(files: List[UploadFile] = File(...)):
     """
@@ -2,12 +2,17 @@
 Сервис для создания скриншотов HTML и отправки в Vision API для OCR
 """
 import os
+import re
 import sys
+import codecs
 import asyncio
-import tempfile
+import base64
+import socket
+import hashlib
 import importlib.util
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Literal, Tuple
 from io import BytesIO
 
 # Убеждаемся, что python-multipart установлен
@@ -19,13 +24,37 @@ except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "python-multipart"])
     import multipart
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Response
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from loguru import logger
-from playwright.async_api import async_playwright, Browser, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 import httpx
 
+# Детекция кодировки загруженного HTML за один проход
+try:
+    from charset_normalizer import from_bytes
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+    from_bytes = None
+
+# BLAKE3 для хэширования скриншотов (fallback на blake2b из стандартной библиотеки)
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+    blake3 = None
+
+# Redis для общего между воркерами OCR кэша (опционально)
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    aioredis = None
+
 # Добавляем путь к корню проекта для импорта модулей
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
@@ -64,6 +93,44 @@ app = FastAPI(title="HTML Screenshot Service", version="1.0.0")
 # Глобальные переменные для браузера
 _browser: Optional[Browser] = None
 _playwright = None
+# Долгоживущий контекст для рендеринга HTML контента (страницы создаются и закрываются в нем)
+_html_context: Optional[BrowserContext] = None
+
+# LRU кэш результатов OCR: хэш скриншота -> извлеченный текст
+OCR_CACHE_MAX = int(os.getenv("OCR_CACHE_MAX", "4096"))
+_ocr_cache: "OrderedDict[Tuple[bytes, Tuple[str, ...]], str]" = OrderedDict()
+# Выполняющиеся вызовы Vision API (объединение одновременных одинаковых запросов)
+_ocr_inflight: Dict[Tuple[bytes, Tuple[str, ...]], asyncio.Future] = {}
+
+# Общий OCR кэш в Redis для всех воркеров (ключи ocr:{hash}, ocr:lock:{hash}, ocr:notify:{hash}:{token})
+OCR_REDIS_ENABLED = os.getenv("OCR_REDIS_CACHE", "true").lower() in ("1", "true", "yes")
+OCR_REDIS_TTL = int(os.getenv("OCR_REDIS_TTL", "86400"))
+OCR_REDIS_LOCK_TTL = 30  # Время жизни блокировки вызова Vision API (секунды)
+_redis = None
+_worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+# LRU кэш готовых ответов по нормализованному HTML (ограничен суммарным размером текста)
+HTML_CACHE_MAX_BYTES = int(os.getenv("HTML_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+_html_cache: "OrderedDict[bytes, ScreenshotResponse]" = OrderedDict()
+_html_cache_bytes = 0
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Максимальное ожидание загрузки шрифтов перед скриншотом (секунды)
+FONTS_READY_TIMEOUT = 2.0
+
+# Ограничение параллельных рендерингов в пакетном endpoint
+BATCH_CONCURRENCY = int(os.getenv("SCREENSHOT_BATCH_CONCURRENCY", "4"))
+_render_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+# Размер блока при чтении загруженных файлов
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Ограничение Chromium на длину data: URL; более крупный HTML загружается через set_content
+DATA_URL_MAX_LENGTH = 2 * 1024 * 1024
+
+# Начиная с этого размера хэширование выполняется в пуле потоков, а не в event loop
+OFFLOAD_MIN_BYTES = 256 * 1024
 
 
 class HTMLScreenshotRequest(BaseModel):
@@ -72,8 +139,11 @@ class HTMLScreenshotRequest(BaseModel):
     html_url: Optional[str] = None
     viewport_width: int = 1920
     viewport_height: int = 1080
-    wait_time: int = 1000  # Время ожидания после загрузки страницы (мс)
+    wait_time: int = 0  # Дополнительное ожидание после загрузки страницы и шрифтов (мс)
     full_page: bool = True  # Делать скриншот всей страницы или только видимой области
+    image_format: Literal['png', 'jpeg'] = 'jpeg'  # JPEG в разы меньше PNG, для OCR lossless не нужен
+    image_quality: int = 85  # Качество JPEG (игнорируется для PNG)
+    max_page_height: int = 8192  # Максимальная высота скриншота всей страницы (px)
     language_hints: Optional[list] = None
 
 
@@ -85,9 +155,24 @@ class ScreenshotResponse(BaseModel):
     error: Optional[str] = None
 
 
+class BatchScreenshotRequest(BaseModel):
+    """Модель пакетного запроса на создание скриншотов"""
+    items: List[HTMLScreenshotRequest]
+
+
+class BatchScreenshotResponse(BaseModel):
+    """Модель ответа пакетного запроса (порядок совпадает с items)"""
+    results: List[ScreenshotResponse]
+
+
+def _screenshot_filename(image_format: str) -> str:
+    """Имя файла скриншота для Vision API (по расширению определяется MIME тип)"""
+    return "screenshot.jpg" if image_format == 'jpeg' else "screenshot.png"
+
+
 async def init_browser():
     """Инициализация браузера Playwright"""
-    global _browser, _playwright
+    global _browser, _playwright, _html_context
     
     if _browser is None:
         logger.info("Initializing Playwright browser...")
@@ -102,6 +187,7 @@ async def init_browser():
                 '--disable-gpu',
             ]
         )
+        _html_context = await _browser.new_context()
         logger.info("Browser initialized successfully")
     
     return _browser
@@ -109,24 +195,98 @@ async def init_browser():
 
 async def close_browser():
     """Закрытие браузера Playwright"""
-    global _browser, _playwright
+    global _browser, _playwright, _html_context
     
     if _browser:
         logger.info("Closing browser...")
         await _browser.close()
         _browser = None
+        _html_context = None
     
     if _playwright:
         await _playwright.stop()
         _playwright = None
 
 
+async def _wait_until_rendered(page: Page, wait_time: int = 0):
+    """
+    Ожидание готовности страницы к скриншоту
+    
+    Вместо фиксированной паузы ждем событие load и загрузку шрифтов
+    (не дольше FONTS_READY_TIMEOUT). wait_time > 0 добавляет явную паузу
+    для страниц, которым нужно больше времени (анимации, отложенный JS).
+    """
+    await page.wait_for_load_state('load')
+    try:
+        await asyncio.wait_for(
+            page.evaluate("document.fonts ? document.fonts.ready.then(() => true) : true"),
+            timeout=FONTS_READY_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.debug(f"Fonts were not ready after {FONTS_READY_TIMEOUT}s, taking screenshot anyway")
+    
+    if wait_time > 0:
+        await page.wait_for_timeout(wait_time)
+
+
+async def _take_screenshot(
+    page: Page,
+    viewport_width: int,
+    full_page: bool,
+    image_format: str,
+    image_quality: int,
+    max_page_height: int
+) -> bytes:
+    """
+    Скриншот страницы с ограничением высоты
+    
+    Страницы с бесконечной прокруткой дают скриншоты в десятки тысяч пикселей:
+    растет время кодирования, размер payload и задержка OCR. При full_page
+    высота обрезается до max_page_height.
+    """
+    clip = None
+    if full_page:
+        page_height = await page.evaluate("document.documentElement.scrollHeight")
+        if page_height > max_page_height:
+            logger.info(f"Page height {page_height}px exceeds max_page_height, clamping to {max_page_height}px")
+            clip = {'x': 0, 'y': 0, 'width': viewport_width, 'height': max_page_height}
+    
+    return await page.screenshot(
+        type=image_format,
+        quality=image_quality if image_format == 'jpeg' else None,
+        full_page=full_page,
+        clip=clip,
+        timeout=30000
+    )
+
+
+async def _load_html(page: Page, html_content: str):
+    """
+    Загрузка HTML в страницу без записи на диск
+    
+    HTML передается как data: URL (навигация через goto, как для обычной страницы).
+    Chromium ограничивает длину data: URL (~2MB), поэтому большие документы
+    загружаются через set_content.
+    """
+    prefix = "data:text/html;base64,"
+    raw = html_content.encode('utf-8')
+    # Длина base64 считается заранее, чтобы не кодировать документы, которые не поместятся
+    if len(prefix) + 4 * -(-len(raw) // 3) <= DATA_URL_MAX_LENGTH:
+        data_url = prefix + base64.b64encode(raw).decode('ascii')
+        await page.goto(data_url, wait_until='domcontentloaded', timeout=30000)
+    else:
+        await page.set_content(html_content, wait_until='domcontentloaded', timeout=30000)
+
+
 async def create_screenshot_from_html(
     html_content: str,
     viewport_width: int = 1920,
     viewport_height: int = 1080,
-    wait_time: int = 1000,
-    full_page: bool = True
+    wait_time: int = 0,
+    full_page: bool = True,
+    image_format: str = 'jpeg',
+    image_quality: int = 85,
+    max_page_height: int = 8192
 ) -> bytes:
     """
     Создание скриншота из HTML контента
@@ -135,61 +295,52 @@ async def create_screenshot_from_html(
         html_content: HTML контент для рендеринга
         viewport_width: Ширина viewport
         viewport_height: Высота viewport
-        wait_time: Время ожидания после загрузки (мс)
+        wait_time: Дополнительное ожидание после загрузки страницы и шрифтов (мс)
         full_page: Делать скриншот всей страницы
+        image_format: Формат изображения ('jpeg' или 'png')
+        image_quality: Качество JPEG (0-100)
+        max_page_height: Максимальная высота скриншота всей страницы (px)
         
     Returns:
-        Байты изображения PNG
+        Байты изображения (JPEG или PNG)
     """
-    browser = await init_browser()
+    await init_browser()
     
-    # Создаем временный HTML файл
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as tmp_file:
-        tmp_file.write(html_content)
-        tmp_file_path = tmp_file.name
+    # Создаем страницу в общем контексте: новый контекст на каждый запрос не нужен,
+    # HTML контент загружается из памяти и не зависит от cookies и storage
+    page = await _html_context.new_page()
     
     try:
-        # Создаем новую страницу
-        page = await browser.new_page(
-            viewport={'width': viewport_width, 'height': viewport_height}
+        await page.set_viewport_size({'width': viewport_width, 'height': viewport_height})
+        
+        # Загружаем HTML из памяти, без временного файла на диске
+        await _load_html(page, html_content)
+        
+        # Ждем загрузки страницы и шрифтов
+        await _wait_until_rendered(page, wait_time)
+        
+        # Делаем скриншот
+        screenshot_bytes = await _take_screenshot(
+            page, viewport_width, full_page, image_format, image_quality, max_page_height
         )
         
-        try:
-            # Загружаем HTML файл
-            file_url = f"file://{tmp_file_path}"
-            await page.goto(file_url, wait_until='networkidle', timeout=30000)
-            
-            # Ждем указанное время для полной загрузки
-            if wait_time > 0:
-                await page.wait_for_timeout(wait_time)
-            
-            # Делаем скриншот
-            screenshot_bytes = await page.screenshot(
-                type='png',
-                full_page=full_page,
-                timeout=30000
-            )
-            
-            logger.info(f"Screenshot created: {len(screenshot_bytes)} bytes")
-            return screenshot_bytes
-            
-        finally:
-            await page.close()
-            
+        logger.info(f"Screenshot created: {len(screenshot_bytes)} bytes")
+        return screenshot_bytes
+        
     finally:
-        # Удаляем временный файл
-        try:
-            os.unlink(tmp_file_path)
-        except Exception as e:
-            logger.warning(f"Failed to delete temp file {tmp_file_path}: {e}")
+        await page.close()
+        await _html_context.clear_cookies()
 
 
 async def create_screenshot_from_url(
     url: str,
     viewport_width: int = 1920,
     viewport_height: int = 1080,
-    wait_time: int = 1000,
-    full_page: bool = True
+    wait_time: int = 0,
+    full_page: bool = True,
+    image_format: str = 'jpeg',
+    image_quality: int = 85,
+    max_page_height: int = 8192
 ) -> bytes:
     """
     Создание скриншота из URL
@@ -198,37 +349,396 @@ async def create_screenshot_from_url(
         url: URL для загрузки
         viewport_width: Ширина viewport
         viewport_height: Высота viewport
-        wait_time: Время ожидания после загрузки (мс)
+        wait_time: Дополнительное ожидание после загрузки страницы и шрифтов (мс)
         full_page: Делать скриншот всей страницы
+        image_format: Формат изображения ('jpeg' или 'png')
+        image_quality: Качество JPEG (0-100)
+        max_page_height: Максимальная высота скриншота всей страницы (px)
         
     Returns:
-        Байты изображения PNG
+        Байты изображения (JPEG или PNG)
     """
     browser = await init_browser()
-    page = await browser.new_page(
+    
+    # Отдельный контекст на запрос: cookies и storage разных URL не должны пересекаться
+    context = await browser.new_context(
         viewport={'width': viewport_width, 'height': viewport_height}
     )
+    page = await context.new_page()
     
     try:
         # Загружаем URL
         await page.goto(url, wait_until='networkidle', timeout=30000)
         
-        # Ждем указанное время для полной загрузки
-        if wait_time > 0:
-            await page.wait_for_timeout(wait_time)
+        # Ждем загрузки страницы и шрифтов
+        await _wait_until_rendered(page, wait_time)
         
         # Делаем скриншот
-        screenshot_bytes = await page.screenshot(
-            type='png',
-            full_page=full_page,
-            timeout=30000
+        screenshot_bytes = await _take_screenshot(
+            page, viewport_width, full_page, image_format, image_quality, max_page_height
         )
         
         logger.info(f"Screenshot created from URL: {len(screenshot_bytes)} bytes")
         return screenshot_bytes
         
     finally:
-        await page.close()
+        await context.close()
+
+
+def _content_digest(data: bytes) -> bytes:
+    """Хэш содержимого (BLAKE3, если установлен, иначе blake2b)"""
+    if BLAKE3_AVAILABLE:
+        return blake3.blake3(data).digest()
+    return hashlib.blake2b(data, digest_size=32).digest()
+
+
+def _ocr_cache_key(screenshot_bytes: bytes, language_hints: Optional[list]) -> Tuple[bytes, Tuple[str, ...]]:
+    """Ключ OCR кэша: хэш содержимого скриншота + подсказки по языкам"""
+    return _content_digest(screenshot_bytes), tuple(language_hints or ())
+
+
+def _html_cache_key(
+    html_content: str,
+    viewport_width: int,
+    viewport_height: int,
+    full_page: bool,
+    image_format: str,
+    image_quality: int,
+    max_page_height: int,
+    language_hints: Optional[list]
+) -> bytes:
+    """Ключ кэша ответов: нормализованный HTML (схлопнутые пробелы) + параметры рендеринга"""
+    normalized = _WHITESPACE_RE.sub(' ', html_content).strip()
+    params = (
+        f"{viewport_width}x{viewport_height}|{full_page}|{image_format}|{image_quality}|"
+        f"{max_page_height}|{','.join(language_hints or ())}"
+    )
+    return _content_digest(normalized.encode('utf-8') + b'\0' + params.encode('utf-8'))
+
+
+async def _offload_if_large(size: int, func, *args):
+    """
+    Вызов CPU-bound функции: для больших данных через asyncio.to_thread,
+    чтобы хэширование многомегабайтных скриншотов и HTML не блокировало
+    event loop; для маленьких - напрямую (переключение потока дороже)
+    """
+    if size >= OFFLOAD_MIN_BYTES:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+def _html_cache_get(key: bytes) -> Optional[ScreenshotResponse]:
+    """Получение ответа из кэша HTML"""
+    cached = _html_cache.get(key)
+    if cached is not None:
+        _html_cache.move_to_end(key)
+    return cached
+
+
+def _html_cache_put(key: bytes, result: ScreenshotResponse):
+    """Сохранение ответа в кэш HTML с вытеснением самых старых записей"""
+    global _html_cache_bytes
+    
+    # Кэшируем только успешные ответы с распознанным текстом
+    if not result.success or result.text is None:
+        return
+    
+    size = len(result.text.encode('utf-8'))
+    if size > HTML_CACHE_MAX_BYTES:
+        return
+    
+    previous = _html_cache.pop(key, None)
+    if previous is not None:
+        _html_cache_bytes -= len(previous.text.encode('utf-8'))
+    
+    _html_cache[key] = result
+    _html_cache_bytes += size
+    
+    while _html_cache_bytes > HTML_CACHE_MAX_BYTES and _html_cache:
+        _, evicted = _html_cache.popitem(last=False)
+        _html_cache_bytes -= len(evicted.text.encode('utf-8'))
+
+
+def _decode_html(html_content: bytes) -> str:
+    """
+    Декодирование загруженного HTML
+    
+    UTF-8 декодируется напрямую; для остальных кодировок одна детекция
+    через charset-normalizer вместо перебора кодировок по всему файлу.
+    """
+    try:
+        return html_content.decode('utf-8')
+    except UnicodeDecodeError:
+        return _decode_non_utf8_html(html_content)
+
+
+def _decode_non_utf8_html(html_content: bytes) -> str:
+    """Декодирование HTML, который не является валидным UTF-8"""
+    if CHARSET_NORMALIZER_AVAILABLE:
+        best = from_bytes(html_content).best()
+        if best is not None:
+            logger.info(f"Detected encoding: {best.encoding}")
+            return str(best)
+    else:
+        for enc in ['windows-1251', 'iso-8859-1', 'cp1252']:
+            try:
+                html_text = html_content.decode(enc)
+                logger.info(f"Detected encoding: {enc}")
+                return html_text
+            except UnicodeDecodeError:
+                continue
+    
+    raise HTTPException(
+        status_code=400,
+        detail="Failed to decode HTML file. Unsupported encoding."
+    )
+
+
+async def _read_html_upload(file: UploadFile) -> str:
+    """
+    Чтение загруженного HTML блоками с инкрементальным декодированием UTF-8
+    
+    В памяти не держатся одновременно полные байты и декодированный текст.
+    Если файл не в UTF-8, он перечитывается целиком для детекции кодировки.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='strict')
+    parts = []
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            parts.append(decoder.decode(chunk))
+        parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts)
+    except UnicodeDecodeError:
+        parts.clear()
+        await file.seek(0)
+        return _decode_non_utf8_html(await file.read())
+
+
+def _cache_bypassed(http_request: Request) -> bool:
+    """Клиент запросил пропуск кэша (Cache-Control: no-cache)"""
+    return 'no-cache' in http_request.headers.get('cache-control', '').lower()
+
+
+async def extract_text_from_screenshot(
+    screenshot_bytes: bytes,
+    image_format: str = 'jpeg',
+    language_hints: Optional[list] = None
+) -> Optional[str]:
+    """
+    Извлечение текста из скриншота через Vision API с кэшированием по содержимому
+    
+    Одинаковые скриншоты (повторные запросы, ретраи клиентов) не отправляются
+    в Vision API повторно - результат берется из LRU кэша, а при подключенном
+    Redis - из общего кэша всех воркеров. Одновременные запросы с одинаковым
+    скриншотом объединяются в один вызов Vision API.
+    
+    Args:
+        screenshot_bytes: Байты изображения
+        image_format: Формат изображения ('jpeg' или 'png')
+        language_hints: Подсказки по языкам
+        
+    Returns:
+        Извлеченный текст или None, если Vision API недоступен или вернул ошибку
+    """
+    if not (VisionAPIClient and settings and settings.vision_api_key):
+        logger.warning("Vision API client is not available")
+        return None
+    
+    cache_key = await _offload_if_large(
+        len(screenshot_bytes), _ocr_cache_key, screenshot_bytes, language_hints
+    )
+    cached_text = _ocr_cache.get(cache_key)
+    if cached_text is not None:
+        _ocr_cache.move_to_end(cache_key)
+        logger.info(f"OCR cache hit: {len(cached_text)} characters")
+        return cached_text
+    
+    # Такой же скриншот уже распознается - ждем тот же результат
+    inflight = _ocr_inflight.get(cache_key)
+    if inflight is not None:
+        logger.info("OCR request coalesced with in-flight Vision API call")
+        return await asyncio.shield(inflight)
+    
+    task = asyncio.ensure_future(_recognize(cache_key, screenshot_bytes, image_format, language_hints))
+    _ocr_inflight[cache_key] = task
+    try:
+        text = await asyncio.shield(task)
+    finally:
+        if task.done():
+            _ocr_inflight.pop(cache_key, None)
+        else:
+            task.add_done_callback(lambda _: _ocr_inflight.pop(cache_key, None))
+    
+    # None означает ошибку Vision API - такие результаты не кэшируем
+    if text is not None:
+        _ocr_cache[cache_key] = text
+        if len(_ocr_cache) > OCR_CACHE_MAX:
+            _ocr_cache.popitem(last=False)
+    
+    return text
+
+
+def _ocr_redis_id(cache_key: Tuple[bytes, Tuple[str, ...]]) -> str:
+    """Идентификатор скриншота в Redis: hex хэша + подсказки по языкам"""
+    digest, hints = cache_key
+    return f"{digest.hex()}:{','.join(hints)}" if hints else digest.hex()
+
+
+async def _recognize(
+    cache_key: Tuple[bytes, Tuple[str, ...]],
+    screenshot_bytes: bytes,
+    image_format: str,
+    language_hints: Optional[list]
+) -> Optional[str]:
+    """
+    Распознавание скриншота с общим кэшем Redis
+    
+    Результат ищется в ocr:{hash}. При промахе воркер берет блокировку
+    SET ocr:lock:{hash} {token} NX EX: владелец блокировки вызывает Vision API,
+    сохраняет результат и будит ожидающих через LPUSH ocr:notify:{hash}:{token};
+    остальные воркеры читают token из блокировки, ждут на BLPOP и читают
+    готовый результат. Token уникален для каждой блокировки, поэтому
+    уведомление прошлого владельца не будит ожидающих следующего. Без Redis
+    (или при его ошибках) Vision API вызывается напрямую.
+    """
+    if _redis is None:
+        return await _call_vision_api(screenshot_bytes, image_format, language_hints)
+    
+    ocr_id = _ocr_redis_id(cache_key)
+    result_key = f"ocr:{ocr_id}"
+    lock_key = f"ocr:lock:{ocr_id}"
+    lock_token = f"{_worker_id}:{os.urandom(8).hex()}"
+    
+    try:
+        cached = await _redis.get(result_key)
+        if cached is not None:
+            logger.info("OCR shared cache hit (Redis)")
+            return cached.decode('utf-8')
+        
+        locked = await _redis.set(lock_key, lock_token, nx=True, ex=OCR_REDIS_LOCK_TTL)
+        if not locked:
+            # Тот же скриншот распознает другой воркер - ждем его результат
+            logger.info("OCR request coalesced with Vision API call in another worker")
+            owner = await _redis.get(lock_key)
+            if owner is not None:
+                notify_key = f"ocr:notify:{ocr_id}:{owner.decode('utf-8')}"
+                if await _redis.blpop(notify_key, timeout=OCR_REDIS_LOCK_TTL) is not None:
+                    # Передаем уведомление следующему ожидающему
+                    await _redis.lpush(notify_key, 1)
+            cached = await _redis.get(result_key)
+            if cached is not None:
+                return cached.decode('utf-8')
+            logger.warning("No OCR result from another worker, calling Vision API directly")
+            return await _call_vision_api(screenshot_bytes, image_format, language_hints)
+    except Exception as e:
+        logger.warning(f"Redis OCR cache error: {e}")
+        return await _call_vision_api(screenshot_bytes, image_format, language_hints)
+    
+    text = None
+    try:
+        text = await _call_vision_api(screenshot_bytes, image_format, language_hints)
+    finally:
+        try:
+            async with _redis.pipeline(transaction=False) as pipe:
+                # None означает ошибку Vision API - такие результаты не кэшируем
+                if text is not None:
+                    pipe.set(result_key, text, ex=OCR_REDIS_TTL)
+                pipe.delete(lock_key)
+                notify_key = f"ocr:notify:{ocr_id}:{lock_token}"
+                pipe.lpush(notify_key, 1)
+                pipe.expire(notify_key, OCR_REDIS_LOCK_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to store OCR result in Redis: {e}")
+    
+    return text
+
+
+async def _open_redis():
+    """Подключение к Redis для общего OCR кэша (при недоступности кэш остается локальным)"""
+    global _redis
+    
+    if not (OCR_REDIS_ENABLED and REDIS_AVAILABLE and settings):
+        return
+    
+    client = aioredis.from_url(settings.redis_url, socket_connect_timeout=2)
+    try:
+        await client.ping()
+    except Exception as e:
+        logger.warning(f"Redis is not available, shared OCR cache disabled: {e}")
+        await client.aclose()
+        return
+    
+    _redis = client
+    logger.info(f"Shared OCR cache enabled (Redis at {settings.redis_url})")
+
+
+async def _close_redis():
+    """Закрытие соединения с Redis"""
+    global _redis
+    
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+async def _call_vision_api(
+    screenshot_bytes: bytes,
+    image_format: str,
+    language_hints: Optional[list]
+) -> Optional[str]:
+    """Один вызов Vision API для скриншота (ошибки логируются, возвращается None)"""
+    logger.info("Sending screenshot to Vision API for OCR...")
+    vision_client = getattr(app.state, "vision_client", None) or VisionAPIClient()
+    
+    if not vision_client.is_available():
+        logger.warning("Vision API is not available (no API key)")
+        return None
+    
+    try:
+        text = await vision_client.extract_text_from_image(
+            image_data=screenshot_bytes,
+            filename=_screenshot_filename(image_format),
+            language_hints=language_hints
+        )
+        logger.info(f"Text extracted via Vision API: {len(text) if text else 0} characters")
+    except Exception as e:
+        # Не возвращаем ошибку, просто не извлекаем текст
+        logger.error(f"Error extracting text via Vision API: {e}")
+        return None
+    
+    return text
+
+
+async def _warm_up():
+    """
+    Прогрев сервиса, чтобы первые запросы не платили за холодный старт
+    
+    Пустой скриншот about:blank (первый рендеринг и JPEG кодирование в Chromium),
+    построение схемы Pydantic моделей и установка соединения с Vision API.
+    Ошибки прогрева не мешают запуску сервиса.
+    """
+    try:
+        page = await _html_context.new_page()
+        try:
+            await page.goto('about:blank')
+            await page.screenshot(type='jpeg', quality=50)
+        finally:
+            await page.close()
+    except Exception as e:
+        logger.warning(f"Browser warm-up failed: {e}")
+    
+    HTMLScreenshotRequest.model_json_schema()
+    BatchScreenshotRequest.model_json_schema()
+    
+    vision_client = getattr(app.state, "vision_client", None)
+    if vision_client is not None:
+        await vision_client.warm_up()
+    
+    logger.info("Warm-up completed")
 
 
 @app.on_event("startup")
@@ -236,6 +746,15 @@ async def startup_event():
     """Инициализация при запуске"""
     logger.info("Starting HTML Screenshot Service...")
     await init_browser()
+    
+    # Один клиент Vision API и общий пул keep-alive соединений на весь процесс
+    if VisionAPIClient and settings and settings.vision_api_key:
+        VisionAPIClient.open_shared_client()
+        app.state.vision_client = VisionAPIClient()
+        await _open_redis()
+    
+    await _warm_up()
+    
     logger.info("Service started successfully")
 
 
@@ -244,6 +763,9 @@ async def shutdown_event():
     """Очистка при остановке"""
     logger.info("Shutting down HTML Screenshot Service...")
     await close_browser()
+    if VisionAPIClient:
+        await VisionAPIClient.close_shared_client()
+    await _close_redis()
     logger.info("Service stopped")
 
 
@@ -258,176 +780,251 @@ async def health():
     }
 
 
+async def _process_screenshot_request(
+    request: HTMLScreenshotRequest,
+    use_cache: bool = True
+) -> Tuple[ScreenshotResponse, bool]:
+    """
+    Полный конвейер для одного запроса: кэш HTML -> скриншот -> OCR
+    
+    Args:
+        request: Запрос с HTML контентом или URL
+        use_cache: Искать готовый ответ в кэше HTML
+        
+    Returns:
+        Кортеж (результат, был ли ответ взят из кэша)
+    """
+    # Проверяем, что есть либо HTML контент, либо URL
+    if not request.html_content and not request.html_url:
+        raise HTTPException(
+            status_code=400,
+            detail="Either html_content or html_url must be provided"
+        )
+    
+    cache_key = None
+    if request.html_content:
+        cache_key = await _offload_if_large(
+            len(request.html_content),
+            _html_cache_key,
+            request.html_content,
+            request.viewport_width,
+            request.viewport_height,
+            request.full_page,
+            request.image_format,
+            request.image_quality,
+            request.max_page_height,
+            request.language_hints
+        )
+        if use_cache:
+            cached = _html_cache_get(cache_key)
+            if cached is not None:
+                logger.info("HTML cache hit, skipping rendering")
+                return cached, True
+    
+    # Создаем скриншот
+    if request.html_content:
+        logger.info("Creating screenshot from HTML content...")
+        screenshot_bytes = await create_screenshot_from_html(
+            html_content=request.html_content,
+            viewport_width=request.viewport_width,
+            viewport_height=request.viewport_height,
+            wait_time=request.wait_time,
+            full_page=request.full_page,
+            image_format=request.image_format,
+            image_quality=request.image_quality,
+            max_page_height=request.max_page_height
+        )
+    else:
+        logger.info(f"Creating screenshot from URL: {request.html_url}")
+        screenshot_bytes = await create_screenshot_from_url(
+            url=request.html_url,
+            viewport_width=request.viewport_width,
+            viewport_height=request.viewport_height,
+            wait_time=request.wait_time,
+            full_page=request.full_page,
+            image_format=request.image_format,
+            image_quality=request.image_quality,
+            max_page_height=request.max_page_height
+        )
+    
+    # Отправляем в Vision API для OCR
+    text = await extract_text_from_screenshot(
+        screenshot_bytes,
+        image_format=request.image_format,
+        language_hints=request.language_hints
+    )
+    
+    result = ScreenshotResponse(
+        success=True,
+        screenshot_size=len(screenshot_bytes),
+        text=text
+    )
+    if cache_key is not None:
+        _html_cache_put(cache_key, result)
+    
+    return result, False
+
+
 @app.post("/screenshot", response_model=ScreenshotResponse)
 async def create_screenshot(
-    request: HTMLScreenshotRequest
+    request: HTMLScreenshotRequest,
+    http_request: Request,
+    response: Response
 ):
     """
     Создание скриншота из HTML и отправка в Vision API для OCR
     
+    Повторные запросы с тем же HTML отдаются из кэша без рендеринга
+    (заголовок X-Cache: HIT|MISS, обход через Cache-Control: no-cache).
+    
     Args:
         request: Запрос с HTML контентом или URL
+        http_request: HTTP запрос (для заголовков кэширования)
+        response: HTTP ответ (для заголовка X-Cache)
         
     Returns:
         Результат с извлеченным текстом
     """
+    response.headers["X-Cache"] = "MISS"
     try:
-        # Проверяем, что есть либо HTML контент, либо URL
-        if not request.html_content and not request.html_url:
-            raise HTTPException(
-                status_code=400,
-                detail="Either html_content or html_url must be provided"
-            )
-        
-        # Создаем скриншот
-        if request.html_content:
-            logger.info("Creating screenshot from HTML content...")
-            screenshot_bytes = await create_screenshot_from_html(
-                html_content=request.html_content,
-                viewport_width=request.viewport_width,
-                viewport_height=request.viewport_height,
-                wait_time=request.wait_time,
-                full_page=request.full_page
-            )
-        else:
-            logger.info(f"Creating screenshot from URL: {request.html_url}")
-            screenshot_bytes = await create_screenshot_from_url(
-                url=request.html_url,
-                viewport_width=request.viewport_width,
-                viewport_height=request.viewport_height,
-                wait_time=request.wait_time,
-                full_page=request.full_page
-            )
-        
-        # Отправляем в Vision API для OCR
-        text = None
-        if VisionAPIClient and settings and settings.vision_api_key:
-            logger.info("Sending screenshot to Vision API for OCR...")
-            vision_client = VisionAPIClient()
-            
-            if vision_client.is_available():
-                try:
-                    text = await vision_client.extract_text_from_image(
-                        image_data=screenshot_bytes,
-                        filename="screenshot.png",
-                        language_hints=request.language_hints
-                    )
-                    logger.info(f"Text extracted via Vision API: {len(text) if text else 0} characters")
-                except Exception as e:
-                    logger.error(f"Error extracting text via Vision API: {e}")
-                    # Не возвращаем ошибку, просто не извлекаем текст
-            else:
-                logger.warning("Vision API is not available (no API key)")
-        else:
-            logger.warning("Vision API client is not available")
-        
-        return ScreenshotResponse(
-            success=True,
-            screenshot_size=len(screenshot_bytes),
-            text=text
+        result, cache_hit = await _process_screenshot_request(
+            request,
+            use_cache=not _cache_bypassed(http_request)
         )
+        if cache_hit:
+            response.headers["X-Cache"] = "HIT"
+        return result
         
     except Exception as e:
         logger.error(f"Error creating screenshot: {e}")
-        import traceback
-        logger.debug(traceback.format_exc())
+        logger.opt(exception=True).debug("Error creating screenshot")
         return ScreenshotResponse(
             success=False,
             error=str(e)
         )
 
 
+@app.post("/screenshot/batch", response_model=BatchScreenshotResponse)
+async def create_screenshots_batch(
+    request: BatchScreenshotRequest,
+    http_request: Request
+):
+    """
+    Пакетная обработка: скриншоты и OCR для нескольких HTML за один запрос
+    
+    Элементы обрабатываются параллельно, число одновременных рендерингов
+    ограничено BATCH_CONCURRENCY. Одинаковый HTML внутри пакета
+    рендерится и распознается один раз.
+    
+    Args:
+        request: Список запросов на скриншот
+        http_request: HTTP запрос (для заголовков кэширования)
+        
+    Returns:
+        Результаты в порядке элементов запроса
+    """
+    use_cache = not _cache_bypassed(http_request)
+    inflight: Dict[Any, asyncio.Task] = {}
+    
+    async def process_one(item: HTMLScreenshotRequest) -> ScreenshotResponse:
+        async with _render_semaphore:
+            result, _ = await _process_screenshot_request(item, use_cache=use_cache)
+            return result
+    
+    tasks = []
+    for item in request.items:
+        # Дубликаты HTML внутри пакета ожидают одну и ту же задачу
+        dedup_key = item.model_dump_json(exclude={'wait_time'}) if item.html_content else None
+        task = inflight.get(dedup_key) if dedup_key else None
+        if task is None:
+            task = asyncio.ensure_future(process_one(item))
+            if dedup_key:
+                inflight[dedup_key] = task
+        tasks.append(task)
+    
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    results = []
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            error = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            logger.error(f"Error creating screenshot in batch: {error}")
+            results.append(ScreenshotResponse(success=False, error=error))
+        else:
+            results.append(outcome)
+    
+    logger.info(f"Batch processed: {len(results)} items, {len(inflight)} unique HTML documents")
+    return BatchScreenshotResponse(results=results)
+
+
 @app.post("/screenshot/upload", response_model=ScreenshotResponse)
 async def create_screenshot_from_file(
+    http_request: Request,
+    response: Response,
     file: UploadFile = File(...),
     viewport_width: int = Form(1920),
     viewport_height: int = Form(1080),
-    wait_time: int = Form(1000),
+    wait_time: int = Form(0),
     full_page: bool = Form(True),
+    image_format: Literal['png', 'jpeg'] = Form('jpeg'),
+    image_quality: int = Form(85),
+    max_page_height: int = Form(8192),
     language_hints: Optional[str] = Form(None)
 ):
     """
     Создание скриншота из загруженного HTML файла
     
     Args:
+        http_request: HTTP запрос (для заголовков кэширования)
+        response: HTTP ответ (для заголовка X-Cache)
         file: HTML файл
         viewport_width: Ширина viewport
         viewport_height: Высота viewport
-        wait_time: Время ожидания после загрузки (мс)
+        wait_time: Дополнительное ожидание после загрузки страницы и шрифтов (мс)
         full_page: Делать скриншот всей страницы
+        image_format: Формат изображения ('jpeg' или 'png')
+        image_quality: Качество JPEG (0-100)
+        max_page_height: Максимальная высота скриншота всей страницы (px)
         language_hints: Подсказки по языкам (через запятую)
         
     Returns:
         Результат с извлеченным текстом
     """
     try:
-        # Читаем HTML контент из файла
-        html_content = await file.read()
-        
-        # Определяем кодировку
-        encoding = 'utf-8'
-        try:
-            html_text = html_content.decode(encoding)
-        except UnicodeDecodeError:
-            # Пробуем другие кодировки
-            for enc in ['windows-1251', 'iso-8859-1', 'cp1252']:
-                try:
-                    html_text = html_content.decode(enc)
-                    encoding = enc
-                    logger.info(f"Detected encoding: {encoding}")
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Failed to decode HTML file. Unsupported encoding."
-                )
+        # Читаем HTML контент из файла и определяем кодировку
+        html_text = await _read_html_upload(file)
         
         # Парсим language hints
         hints = None
         if language_hints:
             hints = [h.strip() for h in language_hints.split(',')]
         
-        # Создаем скриншот
-        logger.info(f"Creating screenshot from uploaded file: {file.filename}")
-        screenshot_bytes = await create_screenshot_from_html(
+        logger.info(f"Processing uploaded file: {file.filename}")
+        request = HTMLScreenshotRequest(
             html_content=html_text,
             viewport_width=viewport_width,
             viewport_height=viewport_height,
             wait_time=wait_time,
-            full_page=full_page
+            full_page=full_page,
+            image_format=image_format,
+            image_quality=image_quality,
+            max_page_height=max_page_height,
+            language_hints=hints
         )
         
-        # Отправляем в Vision API для OCR
-        text = None
-        if VisionAPIClient and settings and settings.vision_api_key:
-            logger.info("Sending screenshot to Vision API for OCR...")
-            vision_client = VisionAPIClient()
-            
-            if vision_client.is_available():
-                try:
-                    text = await vision_client.extract_text_from_image(
-                        image_data=screenshot_bytes,
-                        filename="screenshot.png",
-                        language_hints=hints
-                    )
-                    logger.info(f"Text extracted via Vision API: {len(text) if text else 0} characters")
-                except Exception as e:
-                    logger.error(f"Error extracting text via Vision API: {e}")
-        else:
-            logger.warning("Vision API client is not available")
-        
-        return ScreenshotResponse(
-            success=True,
-            screenshot_size=len(screenshot_bytes),
-            text=text
+        # Тот же конвейер, что и у /screenshot: кэш HTML -> скриншот -> OCR
+        response.headers["X-Cache"] = "MISS"
+        result, cache_hit = await _process_screenshot_request(
+            request,
+            use_cache=not _cache_bypassed(http_request)
         )
+        if cache_hit:
+            response.headers["X-Cache"] = "HIT"
+        return result
         
     except Exception as e:
         logger.error(f"Error processing uploaded file: {e}")
-        import traceback
-        logger.debug(traceback.format_exc())
+        logger.opt(exception=True).debug("Error processing uploaded file")
         return ScreenshotResponse(
             success=False,
             error=str(e)
@@ -439,6 +1036,10 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", "3015"))
     host = os.getenv("HOST", "0.0.0.0")
     
-    logger.info(f"Starting HTML Screenshot Service on {host}:{port}")
-    uvicorn.run(app, host=host, port=port, log_level="info")
+    # uvloop и httptools (входят в uvicorn[standard]) снижают накладные расходы event loop
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    
+    logger.info(f"Starting HTML Screenshot Service on {host}:{port} (loop={loop}, http={http})")
+    uvicorn.run(app, host=host, port=port, loop=loop, http=http, log_level="info")
 
@@ -1,29 +1,33 @@
 #!/usr/bin/env python3
 """
 Тест полной цепочки: Flutter upload → Backend → Celery → Vision API
+
+Использование:
+    python test_flutter_pdf_chain.py                 # Прямой вызов задачи для одного PDF
+    python test_flutter_pdf_chain.py --parallel 8    # 8 PDF параллельно через Celery group
 """
 import sys
-import os
 import tempfile
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
 from loguru import logger
-from core.tasks import process_document_task
-from core.rag.rag_service import RAGService
-from core.rag.document_processor import DocumentProcessor
 
-# Настройка логирования
-logger.remove()
-logger.add(sys.stdout, level="INFO", format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>")
+
+def _setup_logging():
+    """Настройка логирования (только при запуске скрипта, не при импорте)"""
+    logger.remove()
+    logger.add(sys.stdout, level="INFO", format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>")
+
 
 def test_flutter_pdf_chain():
     """Тест полной цепочки обработки PDF"""
+    # Celery, RAG и embedding модели загружаются только при запуске теста
+    from core.tasks import process_document_task
+    from core.rag.document_processor import DocumentProcessor
     
-    print("\n" + "="*80)
-    print("ТЕСТ ПОЛНОЙ ЦЕПОЧКИ: FLUTTER → BACKEND → CELERY → VISION API")
-    print("="*80 + "\n")
+    print("\n".join(["", "="*80, "ТЕСТ ПОЛНОЙ ЦЕПОЧКИ: FLUTTER → BACKEND → CELERY → VISION API", "="*80, ""]))
     
     # Шаг 1: Создание тестового PDF (симуляция файла от Flutter)
     print("1. Создание тестового PDF (симуляция файла от Flutter):")
@@ -41,29 +45,22 @@ This is text in English for OCR recognition.
 работы Vision API при обработке PDF документов."""
         page.insert_text((50, 50), text, fontsize=12)
         
-        pdf_path = "test_flutter_chain.pdf"
-        doc.save(pdf_path)
+        # PDF создается сразу в памяти, без записи на диск
+        file_content = doc.tobytes()
         doc.close()
         
-        file_size = os.path.getsize(pdf_path)
-        print(f"   ✅ Создан PDF: {pdf_path}")
-        print(f"   Размер: {file_size} bytes")
+        filename = "test_flutter_chain.pdf"
+        print(f"   ✅ Создан PDF: {filename}")
+        print(f"   Размер: {len(file_content)} bytes")
     except Exception as e:
         print(f"   ❌ Ошибка создания PDF: {e}")
         return False
     print()
     
-    # Шаг 2: Симуляция загрузки от Flutter (чтение файла в байты)
-    print("2. Симуляция загрузки от Flutter (чтение файла):")
-    try:
-        with open(pdf_path, 'rb') as f:
-            file_content = f.read()
-        filename = os.path.basename(pdf_path)
-        print(f"   ✅ Файл прочитан: {filename}")
-        print(f"   Размер контента: {len(file_content)} bytes")
-    except Exception as e:
-        print(f"   ❌ Ошибка чтения файла: {e}")
-        return False
+    # Шаг 2: Симуляция загрузки от Flutter (байты файла как в multipart upload)
+    print("2. Симуляция загрузки от Flutter:")
+    print(f"   ✅ Получен файл: {filename}")
+    print(f"   Размер контента: {len(file_content)} bytes")
     print()
     
     # Шаг 3: Симуляция backend endpoint (создание Celery task)
@@ -90,13 +87,15 @@ This is text in English for OCR recognition.
             metadata=metadata
         )
         
-        print(f"   ✅ Обработка завершена!")
-        print(f"   Статус: {result.get('status')}")
-        print(f"   Файл: {result.get('filename')}")
-        print(f"   Чанков: {result.get('chunks_count', 0)}")
-        print(f"   Коллекции: {result.get('collections', [])}")
-        print(f"   Сообщение: {result.get('message')}")
-        print()
+        print("\n".join([
+            f"   ✅ Обработка завершена!",
+            f"   Статус: {result.get('status')}",
+            f"   Файл: {result.get('filename')}",
+            f"   Чанков: {result.get('chunks_count', 0)}",
+            f"   Коллекции: {result.get('collections', [])}",
+            f"   Сообщение: {result.get('message')}",
+            ""
+        ]))
         
         # Проверка, что Vision API был использован
         print("5. Проверка использования Vision API:")
@@ -108,33 +107,30 @@ This is text in English for OCR recognition.
             
             # Проверяем, что PDF был обработан через Vision API
             # (это видно из логов, которые показывают отправку в Vision API)
-            print("   ℹ️  Проверьте логи выше - должны быть записи:")
-            print("      - [DocumentProcessor] Attempting to extract text from PDF using Vision API")
-            print("      - [Vision API] Preparing to send image to...")
-            print("      - [Vision API] Sending POST request to Vision API server...")
-            print("      - [Vision API] Received response: status=200")
+            print("\n".join([
+                "   ℹ️  Проверьте логи выше - должны быть записи:",
+                "      - [DocumentProcessor] Attempting to extract text from PDF using Vision API",
+                "      - [Vision API] Preparing to send image to...",
+                "      - [Vision API] Sending POST request to Vision API server...",
+                "      - [Vision API] Received response: status=200"
+            ]))
         else:
             print("   ⚠️  Vision API не включен")
         
         print()
-        
-        # Очистка
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
-            print(f"   Удален тестовый файл: {pdf_path}")
-        
-        print()
-        print("="*80)
-        print("✅ ТЕСТ ЦЕПОЧКИ ПРОЙДЕН УСПЕШНО")
-        print("="*80)
-        print()
-        print("Проверьте логи выше для подтверждения:")
-        print("  ✓ PDF создан и прочитан")
-        print("  ✓ Celery task вызван")
-        print("  ✓ DocumentProcessor использовал Vision API")
-        print("  ✓ Файл отправлен в Vision API сервер")
-        print("  ✓ Текст извлечен и разбит на чанки")
-        print("  ✓ Документ добавлен в векторное хранилище")
+        print("\n".join([
+            "="*80,
+            "✅ ТЕСТ ЦЕПОЧКИ ПРОЙДЕН УСПЕШНО",
+            "="*80,
+            "",
+            "Проверьте логи выше для подтверждения:",
+            "  ✓ PDF создан и прочитан",
+            "  ✓ Celery task вызван",
+            "  ✓ DocumentProcessor использовал Vision API",
+            "  ✓ Файл отправлен в Vision API сервер",
+            "  ✓ Текст извлечен и разбит на чанки",
+            "  ✓ Документ добавлен в векторное хранилище"
+        ]))
         
         return True
         
@@ -143,15 +139,87 @@ This is text in English for OCR recognition.
         import traceback
         traceback.print_exc()
         
-        # Очистка при ошибке
-        if os.path.exists(pdf_path):
-            os.remove(pdf_path)
+        return False
+
+def test_flutter_pdf_chain_parallel(n: int = 8):
+    """
+    Параллельная обработка N PDF через Celery group
+    
+    В отличие от test_flutter_pdf_chain задачи не вызываются напрямую,
+    а отправляются в брокер (settings.celery_broker_url) и обрабатываются
+    запущенными воркерами параллельно. Требует работающий брокер и воркеры.
+    """
+    import fitz
+    from celery import group
+    from core.tasks import process_document_task
+    
+    print("\n".join(["", "="*80, f"ТЕСТ ПАРАЛЛЕЛЬНОЙ ОБРАБОТКИ {n} PDF ЧЕРЕЗ CELERY GROUP", "="*80, ""]))
+    
+    # Шаг 1: Создание N тестовых PDF в памяти
+    print(f"1. Создание {n} тестовых PDF:")
+    documents = []
+    for i in range(n):
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text(
+            (50, 50),
+            f"Тестовый PDF документ #{i + 1} для параллельной обработки\n"
+            f"This is test document #{i + 1} for parallel OCR.\n"
+            f"Це тестовий документ #{i + 1} для паралельної обробки.",
+            fontsize=12
+        )
+        documents.append((f"test_flutter_chain_{i + 1}.pdf", doc.tobytes()))
+        doc.close()
+    print(f"   ✅ Создано {len(documents)} PDF, общий размер: {sum(len(c) for _, c in documents)} bytes")
+    print()
+    
+    # Шаг 2: Отправка всех документов одной группой задач
+    print("2. Отправка задач в Celery (group):")
+    try:
+        job = group(
+            process_document_task.s(
+                file_path=None,
+                file_content=content,
+                filename=filename,
+                metadata={"filename": filename, "uploaded_at": "now", "source": "flutter_app"}
+            )
+            for filename, content in documents
+        )
+        group_result = job.apply_async()
+        print(f"   ✅ Группа задач отправлена: {group_result.id}")
+        print()
         
+        # Шаг 3: Ожидание результатов всех задач
+        print("3. Ожидание результатов:")
+        results = group_result.get(timeout=300, propagate=False)
+    except Exception as e:
+        print(f"   ❌ Ошибка выполнения группы задач: {e}")
+        print("   Убедитесь, что брокер и Celery воркеры запущены")
         return False
+    
+    success_count = 0
+    lines = []
+    for (filename, _), result in zip(documents, results):
+        if isinstance(result, dict) and result.get('status') == 'success':
+            success_count += 1
+            lines.append(f"   ✅ {filename}: {result.get('chunks_count', 0)} чанков")
+        else:
+            lines.append(f"   ❌ {filename}: {result}")
+    
+    lines += ["", "="*80, f"Успешно обработано: {success_count}/{n}", "="*80]
+    print("\n".join(lines))
+    return success_count == n
+
 
 if __name__ == "__main__":
+    _setup_logging()
     try:
-        result = test_flutter_pdf_chain()
+        # python test_flutter_pdf_chain.py --parallel [N] - параллельная обработка через Celery
+        if len(sys.argv) > 1 and sys.argv[1] == "--parallel":
+            n = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+            result = test_flutter_pdf_chain_parallel(n)
+        else:
+            result = test_flutter_pdf_chain()
         sys.exit(0 if result else 1)
     except KeyboardInterrupt:
         print("\n\nТест прерван пользователем")
@@ -22,32 +22,42 @@
     5. Сохранение в векторную базу данных
     6. Поиск в базе данных
 """
+from __future__ import annotations
+
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Добавляем корневую директорию в путь
 sys.path.insert(0, str(Path(__file__).parent))
 
-from loguru import logger
-from core.rag.document_processor import DocumentProcessor
-from core.rag.rag_service import RAGService
 import asyncio
+from loguru import logger
+
+
+def _get_processor(use_vision_api: bool = False) -> DocumentProcessor:
+    """DocumentProcessor создается один раз на процесс (общий для всех тестов и файлов)"""
+    from core.rag.document_processor import get_document_processor
+    return get_document_processor(use_vision_api=use_vision_api)
 
-# Настройка логирования
-logger.remove()
-logger.add(
-    sys.stdout, 
-    level="INFO", 
-    format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>"
-)
+
+def _setup_logging():
+    """Настройка логирования (только при запуске скрипта, не при импорте)"""
+    logger.remove()
+    logger.add(
+        sys.stdout, 
+        level="INFO", 
+        format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>"
+    )
 
 def test_html_extraction(html_path: str = None):
     """Тест извлечения текста из HTML"""
+    # Тяжелые модули (LangChain, PyMuPDF, embedding модели) загружаются только при запуске теста
+    from core.rag.document_processor import DocumentProcessor
+    from core.rag.rag_service import RAGService
     
-    print("\n" + "="*80)
-    print("ТЕСТ ИЗВЛЕЧЕНИЯ ТЕКСТА ИЗ HTML ДОКУМЕНТОВ")
-    print("="*80 + "\n")
+    print("\n".join(["", "="*80, "ТЕСТ ИЗВЛЕЧЕНИЯ ТЕКСТА ИЗ HTML ДОКУМЕНТОВ", "="*80, ""]))
     
     # Если путь не указан, ищем HTML файлы в текущей директории
     if not html_path:
@@ -69,7 +79,7 @@ def test_html_extraction(html_path: str = None):
     # Создаем DocumentProcessor
     print("1. Создание DocumentProcessor:")
     try:
-        processor = DocumentProcessor(use_vision_api=False)  # HTML не требует Vision API
+        processor = _get_processor(use_vision_api=False)  # HTML не требует Vision API
         print(f"   ✅ DocumentProcessor создан")
     except Exception as e:
         print(f"   ❌ Ошибка создания DocumentProcessor: {e}")
@@ -83,12 +93,14 @@ def test_html_extraction(html_path: str = None):
     try:
         text = processor.extract_text_from_html(html_path)
         if text and text.strip():
-            print(f"   ✅ Текст успешно извлечен из HTML")
-            print(f"   Длина текста: {len(text)} символов")
-            print(f"\n   Первые 500 символов:")
-            print(f"   {'-'*76}")
-            print(f"   {text[:500]}...")
-            print(f"   {'-'*76}")
+            print("\n".join([
+                f"   ✅ Текст успешно извлечен из HTML",
+                f"   Длина текста: {len(text)} символов",
+                f"\n   Первые 500 символов:",
+                f"   {'-'*76}",
+                f"   {text[:500]}...",
+                f"   {'-'*76}"
+            ]))
             
             # Проверяем, что текст содержит полезную информацию (не только теги)
             if len(text.strip()) > 100:
@@ -110,10 +122,12 @@ def test_html_extraction(html_path: str = None):
     try:
         text_langchain = DocumentProcessor._load_with_langchain(html_path)
         if text_langchain:
-            print(f"   ✅ Текст извлечен через LangChain")
-            print(f"   Длина текста: {len(text_langchain)} символов")
-            print(f"   Первые 200 символов:")
-            print(f"   {text_langchain[:200]}...")
+            print("\n".join([
+                f"   ✅ Текст извлечен через LangChain",
+                f"   Длина текста: {len(text_langchain)} символов",
+                f"   Первые 200 символов:",
+                f"   {text_langchain[:200]}..."
+            ]))
         else:
             print("   ⚠️  LangChain не смог извлечь текст (используется fallback)")
     except Exception as e:
@@ -138,7 +152,8 @@ def test_html_extraction(html_path: str = None):
             
             # Проверяем наличие полезного контента
             keywords = ['суд', 'рішення', 'справа', 'документ', 'дата', 'номер']
-            found_keywords = [kw for kw in keywords if kw.lower() in text_processed.lower()]
+            text_lower = text_processed.lower()  # Один раз, а не для каждого ключевого слова
+            found_keywords = [kw for kw in keywords if kw in text_lower]
             if found_keywords:
                 print(f"   ✅ Найдены ключевые слова: {', '.join(found_keywords)}")
             else:
@@ -215,27 +230,18 @@ def test_html_extraction(html_path: str = None):
                             else:
                                 print(f"   ⚠️  Поиск '{query}': результатов не найдено")
                     
-                    # Запускаем асинхронный тест
+                    # Запускаем асинхронный тест: все запросы выполняются в одном event loop
+                    # (скрипт запускается из командной строки, запущенного loop нет)
                     try:
-                        # Пробуем получить существующий loop
-                        try:
-                            loop = asyncio.get_running_loop()
-                            # Если loop уже запущен, используем ThreadPoolExecutor
-                            import concurrent.futures
-                            with concurrent.futures.ThreadPoolExecutor() as executor:
-                                future = executor.submit(lambda: asyncio.run(test_search()))
-                                future.result(timeout=30)
-                        except RuntimeError:
-                            # Нет запущенного loop, создаем новый
-                            asyncio.run(test_search())
+                        asyncio.run(asyncio.wait_for(test_search(), timeout=30))
                     except Exception as e:
                         print(f"   ⚠️  Ошибка запуска асинхронного теста: {e}")
-                    
+                
                 except Exception as e:
                     print(f"   ⚠️  Ошибка поиска: {e}")
                     import traceback
                     traceback.print_exc()
-                
+            
             else:
                 print(f"   ❌ Ошибка добавления документа: {result.get('message', 'Unknown error')}")
         except Exception as e:
@@ -244,18 +250,40 @@ def test_html_extraction(html_path: str = None):
             traceback.print_exc()
         print()
     
-    print("="*80)
-    print("✅ ТЕСТ ЗАВЕРШЕН")
-    print("="*80)
+    print("\n".join(["="*80, "✅ ТЕСТ ЗАВЕРШЕН", "="*80]))
     return True
 
 
+def _process_one(path: str) -> dict:
+    """Извлечение текста и разбиение на чанки для одного HTML файла (выполняется в воркере)"""
+    filename = Path(path).name
+    try:
+        processor = _get_processor(use_vision_api=False)
+        text = processor.extract_text_from_html(path)
+        if text and text.strip():
+            chunks = processor.chunk_text(text)
+            return {
+                'filename': filename,
+                'text_length': len(text),
+                'chunks_count': len(chunks),
+                'status': 'success'
+            }
+        return {
+            'filename': filename,
+            'status': 'empty'
+        }
+    except Exception as e:
+        return {
+            'filename': filename,
+            'status': 'error',
+            'error': str(e)
+        }
+
+
 def test_multiple_html_files():
     """Тест обработки нескольких HTML файлов"""
     
-    print("\n" + "="*80)
-    print("ТЕСТ ОБРАБОТКИ НЕСКОЛЬКИХ HTML ФАЙЛОВ")
-    print("="*80 + "\n")
+    print("\n".join(["", "="*80, "ТЕСТ ОБРАБОТКИ НЕСКОЛЬКИХ HTML ФАЙЛОВ", "="*80, ""]))
     
     # Ищем все HTML файлы в текущей директории
     html_files = list(Path('.').glob('*.html'))
@@ -266,64 +294,53 @@ def test_multiple_html_files():
     
     print(f"Найдено {len(html_files)} HTML файлов\n")
     
-    processor = DocumentProcessor(use_vision_api=False)
-    
-    results = []
-    for i, html_file in enumerate(html_files, 1):
-        print(f"{i}. Обработка файла: {html_file.name}")
-        try:
-            text = processor.extract_text_from_html(str(html_file))
-            if text and text.strip():
-                chunks = processor.chunk_text(text)
-                results.append({
-                    'filename': html_file.name,
-                    'text_length': len(text),
-                    'chunks_count': len(chunks),
-                    'status': 'success'
-                })
-                print(f"   ✅ Успешно: {len(text)} символов, {len(chunks)} чанков")
+    # Парсинг HTML и разбиение на чанки - CPU-bound, файлы обрабатываются параллельно в процессах.
+    # Вывод собирается в список строк и печатается одной записью в stdout
+    lines = []
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = []
+        for i, result in enumerate(executor.map(_process_one, [str(p) for p in html_files]), 1):
+            results.append(result)
+            lines.append(f"{i}. Обработка файла: {result['filename']}")
+            if result['status'] == 'success':
+                lines.append(f"   ✅ Успешно: {result['text_length']} символов, {result['chunks_count']} чанков")
+            elif result['status'] == 'empty':
+                lines.append(f"   ⚠️  Текст пустой")
             else:
-                results.append({
-                    'filename': html_file.name,
-                    'status': 'empty'
-                })
-                print(f"   ⚠️  Текст пустой")
-        except Exception as e:
-            results.append({
-                'filename': html_file.name,
-                'status': 'error',
-                'error': str(e)
-            })
-            print(f"   ❌ Ошибка: {e}")
-        print()
+                lines.append(f"   ❌ Ошибка: {result['error']}")
+            lines.append("")
     
     # Сводка
-    print("="*80)
-    print("СВОДКА РЕЗУЛЬТАТОВ:")
-    print("="*80)
+    lines += [
+        "="*80,
+        "СВОДКА РЕЗУЛЬТАТОВ:",
+        "="*80
+    ]
     success_count = sum(1 for r in results if r['status'] == 'success')
-    print(f"Успешно обработано: {success_count}/{len(results)}")
+    lines.append(f"Успешно обработано: {success_count}/{len(results)}")
     
     if success_count > 0:
         total_text = sum(r.get('text_length', 0) for r in results if r['status'] == 'success')
         total_chunks = sum(r.get('chunks_count', 0) for r in results if r['status'] == 'success')
-        print(f"Общая длина текста: {total_text} символов")
-        print(f"Общее количество чанков: {total_chunks}")
+        lines.append(f"Общая длина текста: {total_text} символов")
+        lines.append(f"Общее количество чанков: {total_chunks}")
     
-    print("\nДетали:")
+    lines.append("\nДетали:")
     for r in results:
         if r['status'] == 'success':
-            print(f"  ✅ {r['filename']}: {r['text_length']} символов, {r['chunks_count']} чанков")
+            lines.append(f"  ✅ {r['filename']}: {r['text_length']} символов, {r['chunks_count']} чанков")
         elif r['status'] == 'empty':
-            print(f"  ⚠️  {r['filename']}: текст пустой")
+            lines.append(f"  ⚠️  {r['filename']}: текст пустой")
         else:
-            print(f"  ❌ {r['filename']}: {r.get('error', 'Unknown error')}")
+            lines.append(f"  ❌ {r['filename']}: {r.get('error', 'Unknown error')}")
     
-    print("="*80)
+    lines.append("="*80)
+    print("\n".join(lines))
     return success_count == len(results)
 
 
 if __name__ == "__main__":
+    _setup_logging()
     if len(sys.argv) > 1:
         # Тест одного файла
         html_path = sys.argv[1]
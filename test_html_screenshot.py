@@ -1,15 +1,22 @@
 """
 Тест HTML Screenshot Service
 """
+from __future__ import annotations
+
 import asyncio
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 from loguru import logger
-from core.rag.html_screenshot_client import HTMLScreenshotClient
 
-# Настройка логирования
-logger.remove()
-logger.add(sys.stderr, level="INFO", format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>")
+if TYPE_CHECKING:
+    from core.rag.html_screenshot_client import HTMLScreenshotClient
+
+
+def _setup_logging():
+    """Настройка логирования (только при запуске скрипта, не при импорте)"""
+    logger.remove()
+    logger.add(sys.stderr, level="INFO", format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>")
 
 
 async def test_html_screenshot():
@@ -20,13 +27,24 @@ async def test_html_screenshot():
     print("=" * 80)
     print()
     
-    # Создание клиента
+    from core.rag.html_screenshot_client import HTMLScreenshotClient
+    
+    # Создание клиента (один пул соединений на все тесты)
     client = HTMLScreenshotClient()
     print(f"📋 Клиент инициализирован")
     print(f"   Base URL: {client.base_url}")
     print(f"   Timeout: {client.timeout}s")
     print()
     
+    try:
+        return await _run_tests(client)
+    finally:
+        await client.aclose()
+
+
+async def _run_tests(client: HTMLScreenshotClient) -> bool:
+    """Тесты скриншотов через общий клиент"""
+    
     # Тест 1: Простой HTML
     print("🧪 Тест 1: Простой HTML контент")
     print("-" * 80)
@@ -81,43 +99,46 @@ async def test_html_screenshot():
     
     print()
     
-    # Тест 2: HTML файл
-    print("🧪 Тест 2: HTML файл")
+    # Тест 2: HTML файлы (все найденные файлы параллельно)
+    print("🧪 Тест 2: HTML файлы")
     print("-" * 80)
     
     html_files = list(Path('.').glob('*.html'))
     if html_files:
-        html_file = html_files[0]
-        print(f"📄 Тестовый файл: {html_file}")
-        print(f"   Размер: {html_file.stat().st_size} байт")
+        print(f"📄 Найдено HTML файлов: {len(html_files)}")
         print()
         
-        try:
-            text = await client.extract_text_from_html_file(
-                file_path=str(html_file),
-                viewport_width=1920,
-                viewport_height=1080,
-                language_hints=['uk', 'ru', 'en']
-            )
-            
-            if text:
-                print(f"✅ Текст успешно извлечен из файла!")
-                print(f"   Длина текста: {len(text)} символов")
-                print()
-                print("📝 Первые 500 символов:")
-                print("-" * 80)
-                print(text[:500])
-                if len(text) > 500:
-                    print("...")
-                print("-" * 80)
+        # Ограничение одновременных запросов, чтобы не перегрузить сервис
+        semaphore = asyncio.Semaphore(8)
+        
+        async def process_file(html_file: Path):
+            async with semaphore:
+                return await client.extract_text_from_html_file(
+                    file_path=str(html_file),
+                    viewport_width=1920,
+                    viewport_height=1080,
+                    language_hints=['uk', 'ru', 'en']
+                )
+        
+        texts = await asyncio.gather(
+            *(process_file(html_file) for html_file in html_files),
+            return_exceptions=True
+        )
+        
+        failures = 0
+        for html_file, text in zip(html_files, texts):
+            if isinstance(text, Exception):
+                failures += 1
+                print(f"❌ {html_file.name}: ошибка {text}")
+            elif text:
+                print(f"✅ {html_file.name}: {len(text)} символов ({html_file.stat().st_size} байт HTML)")
             else:
-                print("❌ Не удалось извлечь текст из файла")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Ошибка: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+                failures += 1
+                print(f"❌ {html_file.name}: не удалось извлечь текст")
+        
+        print()
+        print(f"Успешно: {len(html_files) - failures}/{len(html_files)}")
+        if failures:
             return False
     else:
         print("⚠️  HTML файлы не найдены, пропускаем тест")
@@ -131,6 +152,7 @@ async def test_html_screenshot():
 
 
 if __name__ == "__main__":
+    _setup_logging()
     try:
         result = asyncio.run(test_html_screenshot())
         sys.exit(0 if result else 1)
@@ -3,10 +3,38 @@
 Тест интеграции Ollama с проектом через CustomProvider
 """
 import asyncio
+import json
+from typing import Optional
+import httpx
 from core.llm.custom_provider import CustomProvider
 from core.llm.base import LLMMessage
 from config import settings
 
+OLLAMA_URL = "http://localhost:11434"
+
+# Общий клиент с keep-alive соединениями к локальному Ollama
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def _get_client() -> httpx.AsyncClient:
+    """Получить общий HTTP клиент Ollama (создается при первом вызове)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=OLLAMA_URL,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=4)
+        )
+    return _client
+
+
+async def _close_client():
+    """Закрыть общий HTTP клиент Ollama"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
 
 async def test_ollama_via_custom_provider():
     """Тест использования Ollama через CustomProvider"""
@@ -19,7 +47,7 @@ async def test_ollama_via_custom_provider():
     # Для совместимости можно использовать /v1/chat/completions если Ollama поддерживает
     
     # Проверяем через CustomProvider с базовым URL Ollama
-    ollama_url = "http://localhost:11434/v1"  # Попробуем с /v1
+    ollama_url = f"{OLLAMA_URL}/v1"  # Попробуем с /v1
     
     print(f"\n🔍 Тестирую Ollama через CustomProvider...")
     print(f"   URL: {ollama_url}")
@@ -55,34 +83,42 @@ async def test_ollama_via_custom_provider():
 
 async def test_ollama_direct_api():
     """Прямой тест Ollama API"""
-    import httpx
-    import json
-    
     print(f"\n🔍 Тестирую прямой Ollama API...")
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Ollama использует /api/generate, не /chat/completions
-            response = await client.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": "gpt-oss:120b-cloud",
-                    "prompt": "Say 'Hello from Ollama!' in one sentence.",
-                    "stream": False
-                }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ Прямой API работает!")
-                print(f"   Ответ: {data.get('response', '')}")
-                print(f"   Токенов: {data.get('eval_count', 0)}")
-                return True
-            else:
+        client = await _get_client()
+        # Ollama использует /api/generate, не /chat/completions.
+        # Потоковый режим: токены приходят по мере генерации (NDJSON, по объекту на строку)
+        async with client.stream(
+            "POST",
+            "/api/generate",
+            json={
+                "model": "gpt-oss:120b-cloud",
+                "prompt": "Say 'Hello from Ollama!' in one sentence.",
+                "stream": True
+            }
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
                 print(f"❌ Ошибка: {response.status_code}")
                 print(f"   {response.text[:200]}")
                 return False
-                
+            
+            parts = []
+            eval_count = 0
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                parts.append(data.get("response", ""))
+                if data.get("done"):
+                    eval_count = data.get("eval_count", 0)
+        
+        print(f"✅ Прямой API работает!")
+        print(f"   Ответ: {''.join(parts)}")
+        print(f"   Токенов: {eval_count}")
+        return True
+            
     except Exception as e:
         print(f"❌ Ошибка: {e}")
         return False
@@ -90,12 +126,15 @@ async def test_ollama_direct_api():
 
 async def main():
     """Основная функция"""
-    # Сначала тест прямого API
-    direct_ok = await test_ollama_direct_api()
-    
-    # Затем тест через CustomProvider
-    if direct_ok:
-        await test_ollama_via_custom_provider()
+    try:
+        # Сначала тест прямого API
+        direct_ok = await test_ollama_direct_api()
+        
+        # Затем тест через CustomProvider
+        if direct_ok:
+            await test_ollama_via_custom_provider()
+    finally:
+        await _close_client()
     
     print("\n" + "=" * 60)
     print("💡 Рекомендации:")
@@ -4,15 +4,15 @@
 """
 import sys
 import os
+import time
 from pathlib import Path
 
 # Додаємо кореневу директорію в шлях
 sys.path.insert(0, str(Path(__file__).parent))
 
 from loguru import logger
-from core.rag.document_processor import DocumentProcessor
+from core.rag.document_processor import DocumentProcessor, get_document_processor
 from core.rag.rag_service import RAGService
-import asyncio
 
 # Налаштування логування
 logger.remove()
@@ -22,22 +22,33 @@ logger.add(
     format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>"
 )
 
-def test_pdf_extraction(pdf_path: str = None):
-    """Тест розпізнавання PDF в текст"""
+def test_pdf_extraction(pdf_path: str = None, compare_serial: bool = False):
+    """
+    Тест розпізнавання PDF в текст
     
-    print("\n" + "="*80)
-    print("ТЕСТ РОЗПІЗНАВАННЯ PDF В ТЕКСТ")
-    print("="*80 + "\n")
+    Args:
+        pdf_path: Шлях до PDF (за замовчуванням перший PDF у поточній директорії)
+        compare_serial: Додатково виміряти послідовну обробку сторінок для порівняння
+    """
+    
+    print("\n".join([
+        "\n" + "="*80,
+        "ТЕСТ РОЗПІЗНАВАННЯ PDF В ТЕКСТ",
+        "="*80 + "\n"
+    ]))
     
     # Якщо шлях не вказано, шукаємо PDF файли в поточній директорії
     if not pdf_path:
-        pdf_files = list(Path('.').glob('*.pdf'))
-        if pdf_files:
-            pdf_path = str(pdf_files[0])
+        # next() зупиняється на першому файлі, не перебираючи всю директорію
+        first_pdf = next(Path('.').glob('*.pdf'), None)
+        if first_pdf:
+            pdf_path = str(first_pdf)
             print(f"Знайдено PDF файл: {pdf_path}")
         else:
-            print("❌ Не знайдено PDF файлів у поточній директорії")
-            print("Використання: python test_pdf_extraction.py <шлях_до_pdf>")
+            print("\n".join([
+                "❌ Не знайдено PDF файлів у поточній директорії",
+                "Використання: python test_pdf_extraction.py <шлях_до_pdf>"
+            ]))
             return False
     else:
         if not os.path.exists(pdf_path):
@@ -49,15 +60,16 @@ def test_pdf_extraction(pdf_path: str = None):
     # Створюємо DocumentProcessor
     print("1. Створення DocumentProcessor:")
     try:
-        processor = DocumentProcessor(use_vision_api=True)
-        print(f"   ✅ DocumentProcessor створено")
-        print(f"   Vision API увімкнено: {processor.use_vision_api}")
+        processor = get_document_processor(use_vision_api=True)
+        print("\n".join([
+            f"   ✅ DocumentProcessor створено",
+            f"   Vision API увімкнено: {processor.use_vision_api}"
+        ]))
         if processor.vision_client:
             print(f"   Vision API доступний: {processor.vision_client.is_available()}")
     except Exception as e:
         print(f"   ❌ Помилка створення DocumentProcessor: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Failed to create DocumentProcessor")
         return False
     print()
     
@@ -78,20 +90,28 @@ def test_pdf_extraction(pdf_path: str = None):
     # Тест витягування тексту через Vision API
     print("3. Витягування тексту через Vision API:")
     try:
+        start = time.perf_counter()
         text_vision = processor._extract_text_from_pdf_via_vision(pdf_path)
+        elapsed = time.perf_counter() - start
         if text_vision is not None:
-            print(f"   ✅ Текст витягнуто через Vision API")
-            print(f"   Довжина тексту: {len(text_vision)} символів")
-            print(f"\n   Перші 500 символів (ДО фільтрації):")
-            print(f"   {'-'*76}")
-            print(f"   {text_vision[:500]}...")
-            print(f"   {'-'*76}")
+            print(f"   ✅ Текст витягнуто через Vision API за {elapsed:.2f}с (паралельно по сторінках)")
+            if compare_serial:
+                start = time.perf_counter()
+                processor._extract_text_from_pdf_via_vision(pdf_path, max_concurrency=1)
+                serial_elapsed = time.perf_counter() - start
+                print(f"   Послідовно: {serial_elapsed:.2f}с (прискорення x{serial_elapsed / max(elapsed, 1e-6):.1f})")
+            print("\n".join([
+                f"   Довжина тексту: {len(text_vision)} символів",
+                f"\n   Перші 500 символів (ДО фільтрації):",
+                f"   {'-'*76}",
+                f"   {text_vision[:500]}...",
+                f"   {'-'*76}"
+            ]))
         else:
             print("   ❌ Не вдалося витягнути текст через Vision API")
     except Exception as e:
         print(f"   ❌ Помилка витягування через Vision API: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Vision API extraction failed")
     print()
     
     # Тест повної обробки (з фільтрацією)
@@ -99,12 +119,14 @@ def test_pdf_extraction(pdf_path: str = None):
     try:
         text_processed = processor.extract_text_from_pdf(pdf_path)
         if text_processed:
-            print(f"   ✅ PDF оброблено успішно")
-            print(f"   Довжина тексту: {len(text_processed)} символів")
-            print(f"\n   Перші 500 символів (ПІСЛЯ фільтрації):")
-            print(f"   {'-'*76}")
-            print(f"   {text_processed[:500]}...")
-            print(f"   {'-'*76}")
+            print("\n".join([
+                f"   ✅ PDF оброблено успішно",
+                f"   Довжина тексту: {len(text_processed)} символів",
+                f"\n   Перші 500 символів (ПІСЛЯ фільтрації):",
+                f"   {'-'*76}",
+                f"   {text_processed[:500]}...",
+                f"   {'-'*76}"
+            ]))
             
             # Порівняння довжини
             if text_vision and len(text_vision) != len(text_processed):
@@ -114,8 +136,7 @@ def test_pdf_extraction(pdf_path: str = None):
             print("   ⚠️  Текст порожній або не вдалося обробити")
     except Exception as e:
         print(f"   ❌ Помилка обробки: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Document processing failed")
     print()
     
     # Тест фільтрації окремо
@@ -123,9 +144,11 @@ def test_pdf_extraction(pdf_path: str = None):
         print("5. Тест фільтрації технічної інформації:")
         try:
             cleaned = DocumentProcessor._clean_ocr_text(text_vision)
-            print(f"   ✅ Фільтрація виконана")
-            print(f"   Довжина до: {len(text_vision)} символів")
-            print(f"   Довжина після: {len(cleaned)} символів")
+            print("\n".join([
+                f"   ✅ Фільтрація виконана",
+                f"   Довжина до: {len(text_vision)} символів",
+                f"   Довжина після: {len(cleaned)} символів"
+            ]))
             if len(text_vision) != len(cleaned):
                 removed = len(text_vision) - len(cleaned)
                 print(f"   Видалено: {removed} символів ({removed/len(text_vision)*100:.1f}%)")
@@ -140,9 +163,11 @@ def test_pdf_extraction(pdf_path: str = None):
             chunks = processor.chunk_text(text_processed)
             print(f"   ✅ Текст розбито на {len(chunks)} чанків")
             if chunks:
-                print(f"   Розмір першого чанку: {len(chunks[0])} символів")
-                print(f"   Перші 200 символів першого чанку:")
-                print(f"   {chunks[0][:200]}...")
+                print("\n".join([
+                    f"   Розмір першого чанку: {len(chunks[0])} символів",
+                    f"   Перші 200 символів першого чанку:",
+                    f"   {chunks[0][:200]}..."
+                ]))
         except Exception as e:
             print(f"   ❌ Помилка розбиття на чанки: {e}")
         print()
@@ -155,83 +180,79 @@ def test_pdf_extraction(pdf_path: str = None):
             rag_service = RAGService()
             print(f"   ✅ RAGService створено")
             
+            # Ім'я файлу обчислюється один раз для метаданих і пошуку чанків
+            filename = os.path.basename(pdf_path)
+            
             # Додаємо документ
             print(f"   Додавання документа в базу даних...")
             result = rag_service.add_document(
                 pdf_path,
                 metadata={
-                    'filename': os.path.basename(pdf_path),
+                    'filename': filename,
                     'test': True
                 }
             )
             
             if result.get('status') == 'success':
-                print(f"   ✅ Документ успішно додано в базу даних")
-                print(f"   Кількість чанків: {result.get('chunks_count', 0)}")
-                print(f"   Колекції: {', '.join(result.get('collections', []))}")
+                print("\n".join([
+                    f"   ✅ Документ успішно додано в базу даних",
+                    f"   Кількість чанків: {result.get('chunks_count', 0)}",
+                    f"   Колекції: {', '.join(result.get('collections', []))}"
+                ]))
                 
                 # Тест пошуку в базі даних
                 print(f"\n   Тест пошуку в базі даних:")
                 try:
-                    # Використовуємо асинхронний пошук
-                    async def test_search():
-                        # Шукаємо за ключовими словами з документа
-                        search_queries = [
-                            "Дія Сіті",
-                            "резидент",
-                            "Міністерство цифрової трансформації"
-                        ]
-                        
-                        for query in search_queries:
-                            results = await rag_service.search(query, top_k=3)
-                            if results:
-                                print(f"   ✅ Пошук '{query}': знайдено {len(results)} результатів")
-                                # Показуємо перший результат
-                                first_result = results[0]
-                                print(f"      Релевантність: {first_result.get('score', 'N/A'):.4f}")
-                                print(f"      Текст: {first_result.get('text', '')[:150]}...")
-                                print(f"      Файл: {first_result.get('filename', 'N/A')}")
-                            else:
-                                print(f"   ⚠️  Пошук '{query}': результатів не знайдено")
+                    # Шукаємо за ключовими словами з документа; запити незалежні, тому
+                    # search_many_sync виконує їх паралельно в одному event loop (asyncio.Runner)
+                    search_queries = [
+                        "Дія Сіті",
+                        "резидент",
+                        "Міністерство цифрової трансформації"
+                    ]
                     
-                    # Запускаємо асинхронний тест
-                    try:
-                        loop = asyncio.get_event_loop()
-                        if loop.is_running():
-                            # Якщо loop вже запущений, використовуємо ThreadPoolExecutor
-                            import concurrent.futures
-                            with concurrent.futures.ThreadPoolExecutor() as executor:
-                                future = executor.submit(lambda: asyncio.run(test_search()))
-                                future.result(timeout=30)
+                    results_list = rag_service.search_many_sync(search_queries, top_k=3)
+                    for query, results in zip(search_queries, results_list):
+                        if results:
+                            print(f"   ✅ Пошук '{query}': знайдено {len(results)} результатів")
+                            # Показуємо перший результат
+                            first_result = results[0]
+                            print("\n".join([
+                                f"      Релевантність: {first_result.get('score', 'N/A'):.4f}",
+                                f"      Текст: {first_result.get('text', '')[:150]}...",
+                                f"      Файл: {first_result.get('filename', 'N/A')}"
+                            ]))
                         else:
-                            loop.run_until_complete(test_search())
-                    except RuntimeError:
-                        asyncio.run(test_search())
+                            print(f"   ⚠️  Пошук '{query}': результатів не знайдено")
                     
                 except Exception as e:
                     print(f"   ⚠️  Помилка пошуку: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception("Search failed")
                 
                 # Тест отримання чанків документа
                 print(f"\n   Тест отримання чанків документа:")
                 try:
-                    filename = os.path.basename(pdf_path)
                     # Використовуємо синхронний метод з vector_store
                     chunks_from_db = rag_service.vector_store.get_document_chunks(filename)
                     if chunks_from_db:
-                        print(f"   ✅ Отримано {len(chunks_from_db)} чанків з бази даних")
-                        print(f"   Перший чанк з бази:")
+                        print("\n".join([
+                            f"   ✅ Отримано {len(chunks_from_db)} чанків з бази даних",
+                            f"   Перший чанк з бази:"
+                        ]))
                         first_chunk = chunks_from_db[0]
                         chunk_text = first_chunk.get('text', '')
                         chunk_metadata = first_chunk.get('metadata', {})
-                        print(f"   Текст: {chunk_text[:200]}...")
-                        print(f"   Метадані: filename={chunk_metadata.get('filename', 'N/A')}, chunk_id={first_chunk.get('chunk_id', 'N/A')}")
+                        print("\n".join([
+                            f"   Текст: {chunk_text[:200]}...",
+                            f"   Метадані: filename={chunk_metadata.get('filename', 'N/A')}, chunk_id={first_chunk.get('chunk_id', 'N/A')}"
+                        ]))
                         
                         # Перевірка, що текст зберігся правильно
                         total_text_length = sum(len(ch.get('text', '')) for ch in chunks_from_db)
-                        print(f"   Загальна довжина тексту в базі: {total_text_length} символів")
-                        print(f"   Оригінальна довжина: {len(text_processed)} символів")
+                        print("\n".join([
+                            f"   Загальна довжина тексту в базі: {total_text_length} символів",
+                            f"   Оригінальна довжина: {len(text_processed)} символів"
+                        ]))
                         if abs(total_text_length - len(text_processed)) < len(text_processed) * 0.1:
                             print(f"   ✅ Текст зберігся коректно (різниця < 10%)")
                         else:
@@ -240,15 +261,13 @@ def test_pdf_extraction(pdf_path: str = None):
                         print(f"   ⚠️  Чанки не знайдено в базі даних")
                 except Exception as e:
                     print(f"   ⚠️  Помилка отримання чанків: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception("Failed to get document chunks")
                 
             else:
                 print(f"   ❌ Помилка додавання документа: {result.get('message', 'Unknown error')}")
         except Exception as e:
             print(f"   ❌ Помилка збереження в базу: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Failed to add document to the database")
         print()
     
     # Тест через LangChain (fallback)
@@ -256,22 +275,28 @@ def test_pdf_extraction(pdf_path: str = None):
     try:
         text_langchain = DocumentProcessor._load_with_langchain(pdf_path)
         if text_langchain:
-            print(f"   ✅ Текст витягнуто через LangChain")
-            print(f"   Довжина тексту: {len(text_langchain)} символів")
-            print(f"   Перші 200 символів:")
-            print(f"   {text_langchain[:200]}...")
+            print("\n".join([
+                f"   ✅ Текст витягнуто через LangChain",
+                f"   Довжина тексту: {len(text_langchain)} символів",
+                f"   Перші 200 символів:",
+                f"   {text_langchain[:200]}..."
+            ]))
         else:
             print("   ⚠️  LangChain не зміг витягнути текст")
     except Exception as e:
         print(f"   ❌ Помилка LangChain: {e}")
     print()
     
-    print("="*80)
-    print("✅ ТЕСТ ЗАВЕРШЕНО")
-    print("="*80)
+    print("\n".join([
+        "="*80,
+        "✅ ТЕСТ ЗАВЕРШЕНО",
+        "="*80
+    ]))
     return True
 
 if __name__ == "__main__":
-    pdf_path = sys.argv[1] if len(sys.argv) > 1 else None
-    test_pdf_extraction(pdf_path)
+    # python test_pdf_extraction.py [шлях_до_pdf] [--compare-serial]
+    args = [arg for arg in sys.argv[1:] if arg != "--compare-serial"]
+    pdf_path = args[0] if args else None
+    test_pdf_extraction(pdf_path, compare_serial="--compare-serial" in sys.argv)
 
@@ -4,24 +4,49 @@
 """
 import sys
 import os
+from collections import deque
 from pathlib import Path
 
 # Добавляем корневую директорию в путь
 sys.path.insert(0, str(Path(__file__).parent))
 
 from loguru import logger
-from core.rag.document_processor import DocumentProcessor
+from core.rag.document_processor import get_document_processor
 
 # Настройка логирования
 logger.remove()
 logger.add(sys.stdout, level="DEBUG", format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>")
 
+def _find_first_pdf(root: str = '.'):
+    """
+    Первый PDF файл в дереве каталогов (обход в ширину, без перехода по симлинкам)
+    
+    В отличие от list(Path(root).rglob('*.pdf')), обход останавливается на первом
+    найденном файле, а не обходит все дерево проекта.
+    """
+    queue = deque([root])
+    while queue:
+        subdirs = []
+        try:
+            with os.scandir(queue.popleft()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                        return entry.path
+        except OSError:
+            continue
+        queue.extend(sorted(subdirs))
+    return None
+
 def test_pdf_to_image():
     """Тест конвертации PDF в изображения"""
     
-    print("\n" + "="*80)
-    print("ТЕСТ КОНВЕРТАЦИИ PDF В ИЗОБРАЖЕНИЯ")
-    print("="*80 + "\n")
+    print("\n".join([
+        "\n" + "="*80,
+        "ТЕСТ КОНВЕРТАЦИИ PDF В ИЗОБРАЖЕНИЯ",
+        "="*80 + "\n"
+    ]))
     
     # Проверка наличия PyMuPDF
     print("1. Проверка наличия PyMuPDF (fitz):")
@@ -29,15 +54,17 @@ def test_pdf_to_image():
         import fitz
         print(f"   ✅ PyMuPDF установлен, версия: {fitz.version}")
     except ImportError:
-        print("   ❌ PyMuPDF не установлен!")
-        print("   Установите: pip install PyMuPDF")
+        print("\n".join([
+            "   ❌ PyMuPDF не установлен!",
+            "   Установите: pip install PyMuPDF"
+        ]))
         return False
     print()
     
     # Создание DocumentProcessor
     print("2. Создание DocumentProcessor:")
     try:
-        processor = DocumentProcessor(use_vision_api=True)
+        processor = get_document_processor(use_vision_api=True)
         print("   ✅ DocumentProcessor создан")
         if not processor.use_vision_api:
             print("   ⚠️  Vision API не включен (но это не критично для теста конвертации)")
@@ -51,8 +78,10 @@ def test_pdf_to_image():
     if not hasattr(processor, '_pdf_to_images'):
         print("   ❌ Метод _pdf_to_images не найден!")
         return False
-    print("   ✅ Метод _pdf_to_images найден")
-    print()
+    print("\n".join([
+        "   ✅ Метод _pdf_to_images найден",
+        ""
+    ]))
     
     # Тест с реальным PDF файлом
     print("4. Тест конвертации PDF:")
@@ -60,16 +89,17 @@ def test_pdf_to_image():
     if len(sys.argv) > 1:
         pdf_path = sys.argv[1]
     else:
-        # Ищем PDF файлы в проекте
-        pdf_files = list(Path('.').rglob('*.pdf'))
-        if pdf_files:
-            pdf_path = str(pdf_files[0])
+        # Ищем PDF файл в проекте
+        pdf_path = _find_first_pdf('.')
+        if pdf_path:
             print(f"   Найден PDF файл: {pdf_path}")
         else:
-            print("   ⚠️  PDF файлы не найдены")
-            print("   Используйте: python test_pdf_to_image.py <путь_к_pdf>")
-            print()
-            print("   Тест создания простого PDF для проверки...")
+            print("\n".join([
+                "   ⚠️  PDF файлы не найдены",
+                "   Используйте: python test_pdf_to_image.py <путь_к_pdf>",
+                "",
+                "   Тест создания простого PDF для проверки..."
+            ]))
             
             # Создаем простой тестовый PDF
             try:
@@ -97,9 +127,11 @@ def test_pdf_to_image():
         print(f"   ❌ Файл не найден: {pdf_path}")
         return False
     
-    print(f"   Тестируем файл: {pdf_path}")
-    print(f"   Размер файла: {os.path.getsize(pdf_path)} bytes")
-    print()
+    print("\n".join([
+        f"   Тестируем файл: {pdf_path}",
+        f"   Размер файла: {os.path.getsize(pdf_path)} bytes",
+        ""
+    ]))
     
     # Конвертация PDF в изображения
     print("5. Конвертация PDF в изображения:")
@@ -110,8 +142,10 @@ def test_pdf_to_image():
             print("   ❌ Конвертация не удалась - список изображений пуст")
             return False
         
-        print(f"   ✅ Конвертация успешна!")
-        print(f"   Количество страниц: {len(images)}")
+        print("\n".join([
+            f"   ✅ Конвертация успешна!",
+            f"   Количество страниц: {len(images)}"
+        ]))
         
         total_size = sum(len(img) for img in images)
         print(f"   Общий размер изображений: {total_size} bytes")
@@ -120,8 +154,10 @@ def test_pdf_to_image():
             print(f"   Страница {i}: {len(img_bytes)} bytes")
         
         # Проверяем, что изображения валидные PNG
-        print()
-        print("6. Проверка формата изображений:")
+        print("\n".join([
+            "",
+            "6. Проверка формата изображений:"
+        ]))
         try:
             from PIL import Image
             import io
@@ -135,10 +171,12 @@ def test_pdf_to_image():
         except ImportError:
             print("   ⚠️  PIL не установлен, пропускаем проверку формата")
         
-        print()
-        print("="*80)
-        print("✅ ТЕСТ ПРОЙДЕН УСПЕШНО")
-        print("="*80)
+        print("\n".join([
+            "",
+            "="*80,
+            "✅ ТЕСТ ПРОЙДЕН УСПЕШНО",
+            "="*80
+        ]))
         
         # Очистка тестового файла
         if pdf_path == "test_pdf_to_image.pdf" and os.path.exists(pdf_path):
@@ -149,8 +187,7 @@ def test_pdf_to_image():
         
     except Exception as e:
         print(f"   ❌ Ошибка при конвертации: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("PDF to image conversion failed")
         return False
 
 if __name__ == "__main__":
@@ -162,7 +199,6 @@ if __name__ == "__main__":
         sys.exit(1)
     except Exception as e:
         print(f"\n\n❌ Критическая ошибка: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Critical error")
         sys.exit(1)
 
@@ -9,7 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from loguru import logger
-from core.rag.document_processor import DocumentProcessor
+from core.rag.document_processor import get_document_processor
 
 logger.remove()
 logger.add(sys.stdout, level="INFO", format="<green>{time:HH:mm:ss}</green> | <level>{level: <8}</level> | <level>{message}</level>")
@@ -17,9 +17,11 @@ logger.add(sys.stdout, level="INFO", format="<green>{time:HH:mm:ss}</green> | <l
 def test_pdf_to_vision():
     """Полный тест: PDF → изображения → Vision API"""
     
-    print("\n" + "="*80)
-    print("ПОЛНЫЙ ТЕСТ: PDF → ИЗОБРАЖЕНИЯ → VISION API")
-    print("="*80 + "\n")
+    print("\n".join([
+        "\n" + "="*80,
+        "ПОЛНЫЙ ТЕСТ: PDF → ИЗОБРАЖЕНИЯ → VISION API",
+        "="*80 + "\n"
+    ]))
     
     # Создаем тестовый PDF с текстом
     print("1. Создание тестового PDF с текстом:")
@@ -42,25 +44,29 @@ def test_pdf_to_vision():
     # Тест обработки через DocumentProcessor
     print("2. Обработка PDF через DocumentProcessor с Vision API:")
     try:
-        processor = DocumentProcessor(use_vision_api=True)
+        processor = get_document_processor(use_vision_api=True)
         
         if not processor.use_vision_api:
             print("   ❌ Vision API не включен")
             return False
         
-        print(f"   ✅ Vision API включен")
-        print(f"   Обработка файла: {pdf_path}")
-        print()
+        print("\n".join([
+            f"   ✅ Vision API включен",
+            f"   Обработка файла: {pdf_path}",
+            ""
+        ]))
         
         # Обработка документа
         text = processor.process_document(pdf_path)
         
         if text is not None:
             if text.strip():
-                print(f"   ✅ Текст успешно извлечен через Vision API!")
-                print(f"   Длина текста: {len(text)} символов")
-                print(f"   Первые 200 символов:")
-                print(f"   {text[:200]}...")
+                print("\n".join([
+                    f"   ✅ Текст успешно извлечен через Vision API!",
+                    f"   Длина текста: {len(text)} символов",
+                    f"   Первые 200 символов:",
+                    f"   {text[:200]}..."
+                ]))
             else:
                 print("   ⚠️  Извлечена пустая строка")
         else:
@@ -72,16 +78,17 @@ def test_pdf_to_vision():
             os.remove(pdf_path)
             print(f"\n   Удален тестовый файл: {pdf_path}")
         
-        print()
-        print("="*80)
-        print("✅ ПОЛНЫЙ ТЕСТ ПРОЙДЕН УСПЕШНО")
-        print("="*80)
+        print("\n".join([
+            "",
+            "="*80,
+            "✅ ПОЛНЫЙ ТЕСТ ПРОЙДЕН УСПЕШНО",
+            "="*80
+        ]))
         return True
         
     except Exception as e:
         print(f"   ❌ Ошибка: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("PDF → Vision API test failed")
         return False
 
 if __name__ == "__main__":
@@ -93,7 +100,6 @@ if __name__ == "__main__":
         sys.exit(1)
     except Exception as e:
         print(f"\n\n❌ Ошибка: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Critical error")
         sys.exit(1)
 
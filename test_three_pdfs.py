@@ -2,11 +2,22 @@
 """
 Тест одновременной отправки трёх PDF файлов
 """
+import os
+import io
 import time
-import requests
+import asyncio
+import httpx
+import aiofiles
 import sys
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# HTTP/2 в httpx требует пакет h2 (pip install httpx[http2]); без него клиенты
+# работают по HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 API_BASE_URL = "http://localhost:8000"
 
@@ -17,17 +28,61 @@ PDF_FILES = [
     "2-2-839280c0-9650-11ed-9012-c14e6aee1b6d.PDF"
 ]
 
+
+def _collect_pdf_meta(pdf_files):
+    """
+    Метаданные файлов для загрузки
+    
+    Returns:
+        Кортеж (Path, размер в байтах, имя) найденных файлов и кортеж отсутствующих
+    """
+    meta = []
+    missing = []
+    for pdf_file in pdf_files:
+        path = Path(pdf_file)
+        try:
+            meta.append((path, path.stat().st_size, path.name))
+        except OSError:
+            missing.append(pdf_file)
+    return tuple(meta), tuple(missing)
+
+
+# Path, размер и имя каждого файла вычисляются один раз при импорте; отсутствующие
+# файлы тоже определяются при импорте, тесты только сообщают о них
+_PDF_META, _MISSING_PDF_FILES = _collect_pdf_meta(PDF_FILES)
+
+# Максимум одновременных запросов. Больше потоков ускоряет загрузку на каналах с
+# высокой задержкой, но слишком много параллельных потоков перегружает канал,
+# поэтому по умолчанию не больше 8
+UPLOAD_CONCURRENCY = max(1, int(os.environ.get("UPLOAD_CONCURRENCY", "8")))
+
+# Размер куска при потоковом чтении файла для отправки
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Максимальный объем одного пакетного запроса: при большем суммарном размере
+# файлы отправляются несколькими пакетами
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# Режим теста: batch (по умолчанию) - только пакетная загрузка, concurrent - только
+# загрузка каждого файла отдельным запросом, all - оба теста
+TEST_MODE = os.environ.get("TEST_MODE", "batch")
+
+# Сколько ждать завершения обработки задачи после загрузки файла
+STATUS_WAIT = 3.0
+TERMINAL_STATUSES = ('success', 'failure', 'error')
+
+
 def check_server():
     """Проверка доступности сервера"""
     try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=10)
+        response = httpx.get(f"{API_BASE_URL}/health", timeout=10)
         if response.status_code == 200:
             print("✅ API сервер доступен")
             return True
         else:
             print(f"❌ API сервер вернул ошибку: {response.status_code}")
             return False
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         print(f"❌ Не удается подключиться к API серверу на {API_BASE_URL}")
         print("   Убедитесь, что сервер запущен: uvicorn main:app --reload")
         return False
@@ -36,22 +91,198 @@ def check_server():
         return False
 
 
-def upload_single_file(file_path, file_index):
-    """Загрузка одного файла"""
-    file_path_obj = Path(file_path)
-    if not file_path_obj.exists():
-        return {
-            'success': False,
-            'file_index': file_index,
-            'filename': file_path,
-            'error': 'File not found'
-        }
+def check_pdf_files():
+    """
+    Проверка наличия файлов (по результату импорта) и вывод их списка
+    
+    Returns:
+        True, если все файлы найдены
+    """
+    if _MISSING_PDF_FILES:
+        print(f"❌ Файлы не найдены: {', '.join(_MISSING_PDF_FILES)}")
+        return False
+    
+    print(f"📁 Файлы для загрузки:")
+    print("\n".join(
+        f"   {i}. {name} ({size / 1024:.1f} KB)"
+        for i, (_, size, name) in enumerate(_PDF_META, 1)
+    ))
+    return True
+
+
+def split_batches(pdf_meta, max_bytes: int = BATCH_MAX_BYTES):
+    """
+    Разбиение файлов на пакеты суммарным размером не больше max_bytes
+    
+    Порядок файлов сохраняется; файл больше max_bytes отправляется отдельным пакетом.
+    
+    Args:
+        pdf_meta: Кортежи (Path, размер, имя)
+        max_bytes: Максимальный суммарный размер файлов в пакете
     
+    Returns:
+        Список пакетов (списков путей к файлам)
+    """
+    batches = []
+    current, current_size = [], 0
+    for path, size, _ in pdf_meta:
+        if current and current_size + size > max_bytes:
+            batches.append(current)
+            current, current_size = [], 0
+        current.append(path)
+        current_size += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def stream_multipart_files(field, paths, boundary):
+    """
+    Тело запроса multipart/form-data с файлами, читаемыми кусками
+    
+    Файлы читаются через aiofiles по UPLOAD_CHUNK_SIZE, поэтому в памяти
+    находится один кусок, а не все файлы, и чтение с диска не блокирует event loop.
+    
+    Args:
+        field: Имя поля формы для всех файлов
+        paths: Пути к файлам (Path)
+        boundary: Разделитель частей multipart
+    """
+    for path in paths:
+        yield (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{path.name}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'
+        ).encode('utf-8')
+        async with aiofiles.open(path, 'rb') as f:
+            while chunk := await f.read(UPLOAD_CHUNK_SIZE):
+                yield chunk
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('utf-8')
+
+
+async def fetch_task_statuses_async(client: httpx.AsyncClient, task_ids):
+    """
+    Статусы задач одним запросом к /rag/tasks/batch через общий httpx.AsyncClient
+    
+    Если сервер еще не поддерживает пакетный endpoint (404/405), статусы
+    запрашиваются через /rag/task/{task_id} параллельно (asyncio.gather).
+    
+    Args:
+        client: Общий httpx.AsyncClient
+        task_ids: Список ID задач
+    
+    Returns:
+        Словарь task_id -> данные статуса (задачи без ответа пропускаются)
+    """
+    response = await client.post(
+        f"{API_BASE_URL}/rag/tasks/batch",
+        json={'task_ids': task_ids},
+        timeout=10
+    )
+    if response.status_code == 200:
+        return response.json().get('tasks', {})
+    if response.status_code not in (404, 405):
+        response.raise_for_status()
+    
+    responses = await asyncio.gather(*[
+        client.get(f"{API_BASE_URL}/rag/task/{task_id}", timeout=10)
+        for task_id in task_ids
+    ])
+    return {
+        task_id: status_response.json()
+        for task_id, status_response in zip(task_ids, responses)
+        if status_response.status_code == 200
+    }
+
+
+async def wait_task_status(client: httpx.AsyncClient, task_id, max_wait: float = STATUS_WAIT):
+    """
+    Опрос статуса задачи сразу после загрузки ее файла
+    
+    Интервал опроса растет от 0.25с до 4с; опрос заканчивается на итоговом
+    статусе задачи или через max_wait секунд.
+    
+    Args:
+        client: Общий httpx.AsyncClient
+        task_id: ID задачи
+        max_wait: Максимальное время ожидания в секундах
+    
+    Returns:
+        Последние данные статуса или None, если статус не получен
+    """
+    deadline = time.monotonic() + max_wait
+    delay = 0.25
+    status_data = None
+    while True:
+        try:
+            response = await client.get(f"{API_BASE_URL}/rag/task/{task_id}", timeout=10)
+            response.raise_for_status()
+            status_data = response.json()
+            if status_data.get('status') in TERMINAL_STATUSES:
+                return status_data
+        except httpx.HTTPError:
+            pass
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return status_data
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 1.7, 4.0)
+
+
+async def wait_task_statuses(client: httpx.AsyncClient, task_ids, max_wait: float = STATUS_WAIT):
+    """
+    Опрос статусов нескольких задач сразу после загрузки
+    
+    Первый запрос выполняется без задержки, далее интервал растет от 0.25с до 4с;
+    повторно запрашиваются только задачи без итогового статуса. Опрос заканчивается,
+    когда все задачи завершены, или через max_wait секунд.
+    
+    Args:
+        client: Общий httpx.AsyncClient
+        task_ids: ID задач
+        max_wait: Максимальное время ожидания в секундах
+    
+    Returns:
+        Словарь task_id -> последние данные статуса (задачи без ответа пропускаются)
+    """
+    deadline = time.monotonic() + max_wait
+    delay = 0.25
+    statuses = {}
+    pending = list(task_ids)
+    while True:
+        try:
+            statuses.update(await fetch_task_statuses_async(client, pending))
+        except httpx.HTTPError:
+            pass
+        pending = [
+            task_id for task_id in pending
+            if statuses.get(task_id, {}).get('status') not in TERMINAL_STATUSES
+        ]
+        
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            return statuses
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 1.7, 4.0)
+
+
+async def upload_single_file(client: httpx.AsyncClient, file_path: Path, file_index):
+    """
+    Асинхронная загрузка одного файла через общий клиент
+    
+    Args:
+        client: Общий httpx.AsyncClient (один пул соединений на все загрузки)
+        file_path: Путь к файлу (наличие файла проверяет вызывающий код)
+        file_index: Порядковый номер файла
+    """
     try:
         start_time = time.time()
-        with open(file_path_obj, 'rb') as f:
-            files = {'file': (file_path_obj.name, f, 'application/pdf')}
-            response = requests.post(
+        with open(file_path, 'rb') as f:
+            # httpx читает файл кусками при отправке multipart, а не целиком
+            files = {'file': (file_path.name, f, 'application/pdf')}
+            response = await client.post(
                 f"{API_BASE_URL}/rag/add-document",
                 files=files,
                 timeout=30
@@ -59,132 +290,126 @@ def upload_single_file(file_path, file_index):
         
         elapsed = time.time() - start_time
         
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'success': True,
-                'file_index': file_index,
-                'filename': file_path_obj.name,
-                'task_id': data.get('task_id'),
-                'status': data.get('status'),
-                'elapsed': elapsed,
-                'response': data
-            }
-        else:
+        # Тело ответа с ошибкой не декодируется: достаточно статуса и URL из исключения
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
             return {
                 'success': False,
                 'file_index': file_index,
-                'filename': file_path_obj.name,
-                'error': f"HTTP {response.status_code}: {response.text}",
+                'filename': file_path.name,
+                'error': str(e)[:200],
                 'elapsed': elapsed
             }
+        
+        data = response.json()
+        return {
+            'success': True,
+            'file_index': file_index,
+            'filename': file_path.name,
+            'task_id': data.get('task_id'),
+            'status': data.get('status'),
+            'elapsed': elapsed,
+            'response': data
+        }
     except Exception as e:
         return {
             'success': False,
             'file_index': file_index,
-            'filename': file_path_obj.name,
+            'filename': file_path.name,
             'error': str(e)
         }
 
 
-def upload_batch():
-    """Пакетная загрузка всех файлов"""
+async def upload_batch(batches):
+    """
+    Пакетная загрузка всех файлов
+    
+    Каждый пакет отправляется одним потоковым multipart запросом
+    (stream_multipart_files), статусы задач всех пакетов проверяются через тот же
+    httpx.AsyncClient.
+    
+    Args:
+        batches: Пакеты путей к файлам (split_batches)
+    """
     print("\n" + "="*60)
     print("ТЕСТ: Пакетная загрузка трёх PDF файлов")
     print("="*60)
     
     # Проверяем наличие файлов
-    missing_files = []
-    for pdf_file in PDF_FILES:
-        if not Path(pdf_file).exists():
-            missing_files.append(pdf_file)
-    
-    if missing_files:
-        print(f"❌ Файлы не найдены: {', '.join(missing_files)}")
+    if not check_pdf_files():
         return False
     
-    print(f"📁 Файлы для загрузки:")
-    for i, pdf_file in enumerate(PDF_FILES, 1):
-        size = Path(pdf_file).stat().st_size / 1024  # KB
-        print(f"   {i}. {pdf_file} ({size:.1f} KB)")
-    
     start_time = time.time()
     
     try:
-        # Подготавливаем файлы для пакетной загрузки
-        files = []
-        file_handles = []
-        for pdf_file in PDF_FILES:
-            file_path = Path(pdf_file)
-            file_handle = open(file_path, 'rb')
-            file_handles.append(file_handle)
-            files.append(('files', (file_path.name, file_handle, 'application/pdf')))
-        
-        # Отправляем пакетный запрос
-        print(f"\n📤 Отправка пакетного запроса...")
-        response = requests.post(
-            f"{API_BASE_URL}/rag/add-documents-batch",
-            files=files,
-            timeout=60
-        )
-        
-        # Закрываем файлы
-        for handle in file_handles:
-            handle.close()
-        
-        upload_time = time.time() - start_time
-        
-        if response.status_code == 200:
-            data = response.json()
+        async with httpx.AsyncClient(http2=HTTP2_AVAILABLE) as client:
+            # Отправляем пакетные запросы
+            tasks = []
+            for batch_index, batch in enumerate(batches, 1):
+                print(f"\n📤 Отправка пакетного запроса {batch_index}/{len(batches)} ({len(batch)} файлов)...")
+                boundary = os.urandom(16).hex()
+                response = await client.post(
+                    f"{API_BASE_URL}/rag/add-documents-batch",
+                    content=stream_multipart_files('files', batch, boundary),
+                    headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+                    timeout=60
+                )
+                
+                try:
+                    response.raise_for_status()
+                except httpx.HTTPStatusError as e:
+                    print(f"❌ ОШИБКА: {str(e)[:200]}")
+                    return False
+                
+                data = response.json()
+                # Ответ разбирается один раз: поля пакета и пары (имя файла, task_id)
+                batch_status, total, results = data['status'], data['total_documents'], data['results']
+                tasks.extend((result['filename'], result['task_id']) for result in results)
+                print(f"   Статус: {batch_status}")
+                print(f"   Документов в пакете: {total}")
+            
+            upload_time = time.time() - start_time
             print(f"✅ Загрузка завершена за {upload_time:.3f} секунд")
-            print(f"   Статус: {data.get('status')}")
-            print(f"   Всего документов: {data.get('total_documents')}")
             
-            results = data.get('results', [])
-            print(f"\n📋 Результаты:")
-            for i, result in enumerate(results, 1):
-                task_id = result.get('task_id')
-                filename = result.get('filename')
-                print(f"   {i}. {filename}")
-                print(f"      Task ID: {task_id}")
+            # Строки по файлам копятся в буфере и выводятся одной записью
+            out = io.StringIO()
+            print(f"\n📋 Результаты:", file=out)
+            for i, (filename, task_id) in enumerate(tasks, 1):
+                print(f"   {i}. {filename}", file=out)
+                print(f"      Task ID: {task_id}", file=out)
+            sys.stdout.write(out.getvalue())
             
-            # Проверяем статусы задач
-            print(f"\n⏳ Проверка статусов задач (через 3 секунды)...")
-            time.sleep(3)
+            # Проверяем статусы задач сразу, без фиксированной паузы
+            print(f"\n⏳ Проверка статусов задач...")
             
-            for i, result in enumerate(results, 1):
-                task_id = result.get('task_id')
-                filename = result.get('filename')
-                if task_id:
-                    try:
-                        status_response = requests.get(
-                            f"{API_BASE_URL}/rag/task/{task_id}",
-                            timeout=10
-                        )
-                        if status_response.status_code == 200:
-                            status_data = status_response.json()
-                            status = status_data.get('status')
-                            print(f"   {i}. {filename}: {status}")
-                            if status == 'success':
-                                result_info = status_data.get('result', {})
-                                chunks = result_info.get('chunks_count', 0)
-                                print(f"      ✅ Обработано, чанков: {chunks}")
-                            elif status == 'processing':
-                                print(f"      ⏳ Обрабатывается...")
-                            elif status == 'pending':
-                                print(f"      ⏸️  В очереди...")
-                            elif status in ['failure', 'error']:
-                                error = status_data.get('error', 'Unknown error')
-                                print(f"      ❌ Ошибка: {error}")
-                    except Exception as e:
-                        print(f"   {i}. {filename}: Ошибка проверки статуса - {e}")
+            # Статусы всех задач одним запросом на каждой итерации опроса
+            try:
+                statuses = await wait_task_statuses(client, [task_id for _, task_id in tasks])
+            except Exception as e:
+                print(f"   Ошибка проверки статусов - {e}")
+                statuses = {}
             
-            return True
-        else:
-            print(f"❌ ОШИБКА: HTTP {response.status_code}")
-            print(f"   Ответ: {response.text}")
-            return False
+            out = io.StringIO()
+            for i, (filename, task_id) in enumerate(tasks, 1):
+                status_data = statuses.get(task_id)
+                if status_data:
+                    status = status_data['status']
+                    print(f"   {i}. {filename}: {status}", file=out)
+                    if status == 'success':
+                        chunks = (status_data.get('result') or {}).get('chunks_count', 0)
+                        print(f"      ✅ Обработано, чанков: {chunks}", file=out)
+                    elif status == 'processing':
+                        print(f"      ⏳ Обрабатывается...", file=out)
+                    elif status == 'pending':
+                        print(f"      ⏸️  В очереди...", file=out)
+                    elif status in ['failure', 'error']:
+                        error = status_data.get('error', 'Unknown error')
+                        print(f"      ❌ Ошибка: {error}", file=out)
+            sys.stdout.write(out.getvalue())
             
+            return True
+                
     except Exception as e:
         print(f"❌ ОШИБКА: {e}")
         import traceback
@@ -192,88 +417,95 @@ def upload_batch():
         return False
 
 
-def upload_concurrent():
-    """Параллельная загрузка файлов (каждый отдельным запросом)"""
+async def upload_concurrent():
+    """
+    Параллельная загрузка файлов (каждый отдельным запросом)
+    
+    Запросы выполняются корутинами в одном event loop через общий httpx.AsyncClient:
+    без пула потоков и с переиспользованием соединений для загрузок и проверки статусов.
+    Статус каждой задачи опрашивается сразу после загрузки ее файла (wait_task_status).
+    """
     print("\n" + "="*60)
     print("ТЕСТ: Параллельная загрузка трёх PDF файлов")
     print("="*60)
     
     # Проверяем наличие файлов
-    missing_files = []
-    for pdf_file in PDF_FILES:
-        if not Path(pdf_file).exists():
-            missing_files.append(pdf_file)
-    
-    if missing_files:
-        print(f"❌ Файлы не найдены: {', '.join(missing_files)}")
+    if not check_pdf_files():
         return False
     
-    print(f"📁 Файлы для загрузки:")
-    for i, pdf_file in enumerate(PDF_FILES, 1):
-        size = Path(pdf_file).stat().st_size / 1024  # KB
-        print(f"   {i}. {pdf_file} ({size:.1f} KB)")
-    
     start_time = time.time()
     
-    # Загружаем файлы параллельно
-    print(f"\n📤 Отправка параллельных запросов...")
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = {
-            executor.submit(upload_single_file, pdf_file, i): pdf_file
-            for i, pdf_file in enumerate(PDF_FILES, 1)
-        }
-        
-        results = []
-        for future in as_completed(futures):
-            result = future.result()
-            results.append(result)
-    
-    total_time = time.time() - start_time
+    # Число одновременных загрузок ограничивает семафор; вторая половина пула
+    # соединений остается для опроса статусов, который идет параллельно с загрузками.
+    # По HTTP/2 все запросы мультиплексируются в одном соединении с сервером
+    concurrency = min(len(_PDF_META), UPLOAD_CONCURRENCY)
+    upload_slots = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(
+        max_connections=2 * concurrency,
+        max_keepalive_connections=2 * concurrency,
+        keepalive_expiry=60
+    )
     
-    # Сортируем результаты по индексу
-    results.sort(key=lambda x: x['file_index'])
+    async def bounded_upload(client, path, file_index):
+        async with upload_slots:
+            return await upload_single_file(client, path, file_index)
     
-    successful = [r for r in results if r.get('success')]
-    failed = [r for r in results if not r.get('success')]
-    
-    print(f"\n✅ Загружено файлов: {len(successful)}/{len(results)}")
-    print(f"   Общее время: {total_time:.3f} секунд")
-    print(f"   Среднее время на файл: {total_time/len(results):.3f} секунд")
-    
-    print(f"\n📋 Результаты:")
-    for result in results:
-        if result.get('success'):
-            print(f"   ✅ {result['filename']}")
-            print(f"      Task ID: {result['task_id']}")
-            print(f"      Время загрузки: {result['elapsed']:.3f}с")
-        else:
-            print(f"   ❌ {result['filename']}")
-            print(f"      Ошибка: {result.get('error')}")
-    
-    if len(successful) == len(results):
-        # Проверяем статусы задач
-        print(f"\n⏳ Проверка статусов задач (через 3 секунды)...")
-        time.sleep(3)
+    async with httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits) as client:
+        # Загружаем файлы параллельно; опрос статуса задачи начинается, как только
+        # загружен ее файл, не дожидаясь остальных загрузок
+        print(f"\n📤 Отправка параллельных запросов...")
+        upload_tasks = [
+            asyncio.create_task(bounded_upload(client, path, i))
+            for i, (path, _, _) in enumerate(_PDF_META, 1)
+        ]
+        status_tasks = {}
+        for finished in asyncio.as_completed(upload_tasks):
+            result = await finished
+            if result.get('success') and result.get('task_id'):
+                status_tasks[result['task_id']] = asyncio.create_task(
+                    wait_task_status(client, result['task_id'])
+                )
+        
+        total_time = time.time() - start_time
+        
+        # Результаты в порядке файлов
+        results = [task.result() for task in upload_tasks]
+        
+        successful = [r for r in results if r.get('success')]
+        failed = [r for r in results if not r.get('success')]
+        
+        print(f"\n✅ Загружено файлов: {len(successful)}/{len(results)}")
+        print(f"   Общее время: {total_time:.3f} секунд")
+        print(f"   Среднее время на файл: {total_time/len(results):.3f} секунд")
+        
+        out = io.StringIO()
+        print(f"\n📋 Результаты:", file=out)
+        for result in results:
+            if result.get('success'):
+                print(f"   ✅ {result['filename']}", file=out)
+                print(f"      Task ID: {result['task_id']}", file=out)
+                print(f"      Время загрузки: {result['elapsed']:.3f}с", file=out)
+            else:
+                print(f"   ❌ {result['filename']}", file=out)
+                print(f"      Ошибка: {result.get('error')}", file=out)
+        sys.stdout.write(out.getvalue())
         
+        # Проверяем статусы задач (опрос уже идет с момента загрузки каждого файла)
+        print(f"\n⏳ Проверка статусов задач...")
+        statuses = dict(zip(status_tasks, await asyncio.gather(*status_tasks.values())))
+        
+        out = io.StringIO()
         for result in successful:
-            task_id = result.get('task_id')
             filename = result['filename']
-            if task_id:
-                try:
-                    status_response = requests.get(
-                        f"{API_BASE_URL}/rag/task/{task_id}",
-                        timeout=10
-                    )
-                    if status_response.status_code == 200:
-                        status_data = status_response.json()
-                        status = status_data.get('status')
-                        print(f"   {filename}: {status}")
-                        if status == 'success':
-                            result_info = status_data.get('result', {})
-                            chunks = result_info.get('chunks_count', 0)
-                            print(f"      ✅ Обработано, чанков: {chunks}")
-                except Exception as e:
-                    print(f"   {filename}: Ошибка проверки статуса - {e}")
+            status_data = statuses.get(result.get('task_id'))
+            if status_data:
+                status = status_data.get('status')
+                print(f"   {filename}: {status}", file=out)
+                if status == 'success':
+                    result_info = status_data.get('result', {})
+                    chunks = result_info.get('chunks_count', 0)
+                    print(f"      ✅ Обработано, чанков: {chunks}", file=out)
+        sys.stdout.write(out.getvalue())
     
     return len(successful) == len(results)
 
@@ -284,20 +516,33 @@ def main():
     print("ТЕСТИРОВАНИЕ ОДНОВРЕМЕННОЙ ОТПРАВКИ ТРЁХ PDF ФАЙЛОВ")
     print("="*60)
     
+    # Отсутствующие файлы известны с момента импорта - не обращаемся к серверу зря
+    if _MISSING_PDF_FILES:
+        print(f"❌ Файлы не найдены: {', '.join(_MISSING_PDF_FILES)}")
+        sys.exit(1)
+    
     # Проверяем доступность сервера
     if not check_server():
         sys.exit(1)
     
     results = []
     
-    # Тест 1: Пакетная загрузка
-    results.append(("Пакетная загрузка", upload_batch()))
+    # Тест 1: Пакетная загрузка (разбиение на пакеты вычисляется один раз)
+    if TEST_MODE in ("batch", "all"):
+        batches = split_batches(_PDF_META)
+        results.append(("Пакетная загрузка", asyncio.run(upload_batch(batches))))
     
     # Небольшая пауза между тестами
-    time.sleep(2)
+    if TEST_MODE == "all":
+        time.sleep(2)
     
     # Тест 2: Параллельная загрузка
-    results.append(("Параллельная загрузка", upload_concurrent()))
+    if TEST_MODE in ("concurrent", "all"):
+        results.append(("Параллельная загрузка", asyncio.run(upload_concurrent())))
+    
+    if not results:
+        print(f"❌ Неизвестный TEST_MODE: {TEST_MODE} (ожидается batch, concurrent или all)")
+        return 1
     
     # Итоги
     print("\n" + "="*60)
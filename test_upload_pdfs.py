@@ -2,14 +2,122 @@
 """
 Тест загрузки PDF файлов через API (как от клиента)
 """
+import io
+import mmap
+import os
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any
 
 API_BASE_URL = "http://127.0.0.1:8000"
 
+# Максимум одновременных запросов. Больше потоков ускоряет загрузку на каналах с
+# высокой задержкой, но слишком много параллельных потоков перегружает канал,
+# поэтому по умолчанию не больше 8
+UPLOAD_CONCURRENCY = max(1, int(os.environ.get("UPLOAD_CONCURRENCY", "8")))
+
+# Общая сессия: keep-alive соединения переиспользуются для загрузок и опроса
+# статусов, вместо нового TCP соединения на каждый requests.get/post.
+# Размер пула равен числу одновременных запросов, чтобы потоки не ждали соединения
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=UPLOAD_CONCURRENCY))
+
+
+try:
+    # Потоковая отправка multipart: файл читается кусками во время передачи,
+    # а не целиком в память, как при requests.post(files=...)
+    from requests_toolbelt import MultipartEncoder
+    MULTIPART_ENCODER_AVAILABLE = True
+except ImportError:
+    MULTIPART_ENCODER_AVAILABLE = False
+
+
+# Размер куска при чтении файла: маленький буфер (1 КБ) заметно замедляет отправку
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def iter_chunks(path: Path, size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Чтение файла кусками фиксированного размера
+    
+    Память ограничена одним куском независимо от размера PDF; используйте этот
+    генератор для любой новой обработки файла (хэш, докачка) вместо f.read().
+    Файл отображается в память (mmap), а куски - memoryview над страницами
+    кэша без копирования в новые bytes; сокет и hashlib принимают их напрямую.
+    Кусок действителен только до запроса следующего.
+    
+    Args:
+        path: Путь к файлу
+        size: Размер куска в байтах
+    """
+    with open(path, 'rb') as f:
+        # mmap не отображает пустые файлы
+        if not os.fstat(f.fileno()).st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            for offset in range(0, len(view), size):
+                chunk = view[offset:offset + size]
+                try:
+                    yield chunk
+                finally:
+                    # Освобождаем срез, иначе mmap нельзя будет закрыть
+                    chunk.release()
+
+
+def iter_multipart_file(field: str, path: Path, boundary: str):
+    """
+    Тело multipart/form-data с одним файлом, читаемым через iter_chunks
+    
+    Args:
+        field: Имя поля формы
+        path: Путь к файлу
+        boundary: Разделитель частей multipart
+    """
+    yield (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; filename="{path.name}"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'
+    ).encode('utf-8')
+    yield from iter_chunks(path)
+    yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+
+def post_file_multipart(url: str, field: str, path: Path, timeout: float):
+    """
+    POST запрос multipart/form-data с потоковой отправкой файла
+    
+    Endpoint'ы API принимают файлы только как поле формы, поэтому файл не
+    отправляется "сырым" телом запроса. Без requests_toolbelt тело формы
+    собирается генератором iter_multipart_file.
+    
+    Args:
+        url: Адрес запроса
+        field: Имя поля формы
+        path: Путь к файлу
+        timeout: Таймаут запроса в секундах
+    """
+    if MULTIPART_ENCODER_AVAILABLE:
+        with open(path, 'rb') as f:
+            encoder = MultipartEncoder(fields={field: (path.name, f, 'application/pdf')})
+            return SESSION.post(
+                url,
+                data=encoder,
+                headers={'Content-Type': encoder.content_type},
+                timeout=timeout
+            )
+    boundary = os.urandom(16).hex()
+    return SESSION.post(
+        url,
+        data=iter_multipart_file(field, path, boundary),
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+        timeout=timeout
+    )
+
+
 def find_pdf_files() -> List[Path]:
     """Найти все PDF файлы в текущей директории"""
     pdf_files = []
@@ -21,7 +129,7 @@ def find_pdf_files() -> List[Path]:
 def check_server() -> bool:
     """Проверка доступности сервера"""
     try:
-        response = requests.get(f"{API_BASE_URL}/health", timeout=10)
+        response = SESSION.get(f"{API_BASE_URL}/health", timeout=10)
         if response.status_code == 200:
             print("✅ API сервер доступен")
             return True
@@ -37,48 +145,58 @@ def check_server() -> bool:
         return False
 
 
-def upload_single_file(file_path: Path) -> Dict[str, Any]:
-    """Загрузка одного файла через API"""
+def upload_single_file(file_path: Path, out=None) -> Dict[str, Any]:
+    """
+    Загрузка одного файла через API
+    
+    Args:
+        file_path: Путь к файлу
+        out: Куда писать вывод (по умолчанию sys.stdout)
+    """
+    if out is None:
+        out = sys.stdout
     try:
-        print(f"\n📤 Загрузка файла: {file_path.name}...")
+        print(f"\n📤 Загрузка файла: {file_path.name}...", file=out)
         start_time = time.time()
         
-        with open(file_path, 'rb') as f:
-            files = {'file': (file_path.name, f, 'application/pdf')}
-            response = requests.post(
-                f"{API_BASE_URL}/rag/add-document",
-                files=files,
-                timeout=60
-            )
+        response = post_file_multipart(
+            f"{API_BASE_URL}/rag/add-document",
+            'file',
+            file_path,
+            timeout=60
+        )
         
         elapsed = time.time() - start_time
         
-        if response.status_code == 200:
-            data = response.json()
-            print(f"   ✅ Файл принят сервером за {elapsed:.2f}с")
-            print(f"   📋 Task ID: {data.get('task_id')}")
-            print(f"   📊 Статус: {data.get('status')}")
-            return {
-                'success': True,
-                'filename': file_path.name,
-                'task_id': data.get('task_id'),
-                'status': data.get('status'),
-                'elapsed': elapsed,
-                'response': data
-            }
-        else:
-            print(f"   ❌ Ошибка HTTP {response.status_code}")
-            print(f"   Ответ: {response.text[:200]}")
+        # Тело ответа с ошибкой не декодируется: достаточно статуса и URL из исключения
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            error = str(e)[:200]
+            print(f"   ❌ Ошибка {error}", file=out)
             return {
                 'success': False,
                 'filename': file_path.name,
-                'error': f"HTTP {response.status_code}: {response.text[:200]}",
+                'error': error,
                 'elapsed': elapsed
             }
+        
+        data = response.json()
+        print(f"   ✅ Файл принят сервером за {elapsed:.2f}с", file=out)
+        print(f"   📋 Task ID: {data.get('task_id')}", file=out)
+        print(f"   📊 Статус: {data.get('status')}", file=out)
+        return {
+            'success': True,
+            'filename': file_path.name,
+            'task_id': data.get('task_id'),
+            'status': data.get('status'),
+            'elapsed': elapsed,
+            'response': data
+        }
     except Exception as e:
-        print(f"   ❌ Ошибка: {e}")
+        print(f"   ❌ Ошибка: {e}", file=out)
         import traceback
-        traceback.print_exc()
+        traceback.print_exc(file=out)
         return {
             'success': False,
             'filename': file_path.name,
@@ -86,65 +204,68 @@ def upload_single_file(file_path: Path) -> Dict[str, Any]:
         }
 
 
-def check_task_status(task_id: str, filename: str, max_wait: int = 60) -> Dict[str, Any]:
-    """Проверка статуса задачи обработки"""
+def check_task_status(task_id: str, filename: str, max_wait: int = 60, out=None) -> Dict[str, Any]:
+    """
+    Проверка статуса задачи обработки
+    
+    Интервал опроса растет экспоненциально от 0.25с до 4с и сбрасывается при смене
+    статуса: быстрые задачи замечаются почти сразу, а долгие не нагружают сервер
+    частыми запросами. Функция вызывается из нескольких потоков одновременно,
+    поэтому вывод пишется в out (отдельный буфер на задачу, по умолчанию sys.stdout),
+    а каждая строка содержит имя файла.
+    """
+    if out is None:
+        out = sys.stdout
     start_time = time.time()
     last_status = None
-    
-    print(f"\n⏳ Ожидание обработки {filename}...")
+    delay = 0.25
     
     while time.time() - start_time < max_wait:
         try:
-            response = requests.get(
+            response = SESSION.get(
                 f"{API_BASE_URL}/rag/task/{task_id}",
                 timeout=10
             )
             
-            if response.status_code == 200:
-                data = response.json()
-                status = data.get('status')
-                
-                # Показываем только при изменении статуса
-                if status != last_status:
-                    print(f"   📊 Статус: {status}")
-                    last_status = status
-                
-                if status == 'success':
-                    result = data.get('result', {})
-                    chunks = result.get('chunks_count', 0)
-                    print(f"   ✅ Обработка завершена успешно!")
-                    print(f"   📄 Чанков создано: {chunks}")
-                    return {
-                        'success': True,
-                        'status': status,
-                        'chunks_count': chunks,
-                        'result': result
-                    }
-                elif status in ['failure', 'error']:
-                    error = data.get('error', 'Unknown error')
-                    print(f"   ❌ Ошибка обработки: {error}")
-                    return {
-                        'success': False,
-                        'status': status,
-                        'error': error
-                    }
-                elif status == 'processing':
-                    # Продолжаем ожидание
-                    time.sleep(2)
-                elif status == 'pending':
-                    # Продолжаем ожидание
-                    time.sleep(2)
-                else:
-                    # Неизвестный статус
-                    time.sleep(2)
-            else:
-                print(f"   ⚠️  Ошибка проверки статуса: HTTP {response.status_code}")
-                time.sleep(2)
+            # Не-2xx ответ уходит в except ниже без декодирования тела
+            response.raise_for_status()
+            data = response.json()
+            status = data.get('status')
+            
+            # Показываем только при изменении статуса
+            if status != last_status:
+                print(f"   📊 {filename}: {status}", file=out)
+                last_status = status
+                delay = 0.25
+            
+            if status == 'success':
+                result = data.get('result', {})
+                chunks = result.get('chunks_count', 0)
+                print(f"   ✅ {filename}: обработка завершена успешно, чанков создано: {chunks}", file=out)
+                return {
+                    'success': True,
+                    'status': status,
+                    'chunks_count': chunks,
+                    'result': result
+                }
+            elif status in ['failure', 'error']:
+                error = data.get('error', 'Unknown error')
+                print(f"   ❌ {filename}: ошибка обработки: {error}", file=out)
+                return {
+                    'success': False,
+                    'status': status,
+                    'error': error
+                }
+            # processing, pending или неизвестный статус - продолжаем ожидание
+        except requests.HTTPError as e:
+            print(f"   ⚠️  {filename}: ошибка проверки статуса: {str(e)[:200]}", file=out)
         except Exception as e:
-            print(f"   ⚠️  Ошибка проверки статуса: {e}")
-            time.sleep(2)
+            print(f"   ⚠️  {filename}: ошибка проверки статуса: {e}", file=out)
+        
+        time.sleep(delay)
+        delay = min(delay * 1.7, 4.0)
     
-    print(f"   ⏱️  Превышено время ожидания ({max_wait}с)")
+    print(f"   ⏱️  {filename}: превышено время ожидания ({max_wait}с)", file=out)
     return {
         'success': False,
         'status': 'timeout',
@@ -152,6 +273,29 @@ def check_task_status(task_id: str, filename: str, max_wait: int = 60) -> Dict[s
     }
 
 
+def upload_and_wait(pdf_file: Path, index: int, total: int, out) -> Dict[str, Any]:
+    """
+    Загрузка файла и ожидание его обработки (выполняется в отдельном потоке)
+    
+    Args:
+        pdf_file: Путь к файлу
+        index: Порядковый номер файла
+        total: Всего файлов
+        out: Буфер вывода этого файла
+    
+    Returns:
+        Результат загрузки; при успешной загрузке с ключом 'processing'
+    """
+    print(f"\n{'='*70}", file=out)
+    print(f"Файл {index}/{total}: {pdf_file.name}", file=out)
+    print('='*70, file=out)
+    
+    result = upload_single_file(pdf_file, out=out)
+    if result.get('success') and result.get('task_id'):
+        result['processing'] = check_task_status(result['task_id'], result['filename'], out=out)
+    return result
+
+
 def main():
     """Основная функция тестирования"""
     print("\n" + "="*70)
@@ -174,27 +318,21 @@ def main():
         size = pdf_file.stat().st_size / 1024  # KB
         print(f"   {i}. {pdf_file.name} ({size:.1f} KB)")
     
-    # Загружаем каждый файл
-    results = []
-    for i, pdf_file in enumerate(pdf_files, 1):
-        print(f"\n{'='*70}")
-        print(f"Файл {i}/{len(pdf_files)}: {pdf_file.name}")
-        print('='*70)
-        
-        # Загрузка файла
-        upload_result = upload_single_file(pdf_file)
-        results.append(upload_result)
-        
-        if upload_result.get('success'):
-            task_id = upload_result.get('task_id')
-            if task_id:
-                # Проверяем статус обработки
-                status_result = check_task_status(task_id, pdf_file.name)
-                upload_result['processing'] = status_result
-        
-        # Небольшая пауза между файлами
-        if i < len(pdf_files):
-            time.sleep(1)
+    # Каждый файл загружается и ожидает обработки в своем потоке: общее время -
+    # самый долгий файл, а не сумма времени всех файлов. Не больше
+    # UPLOAD_CONCURRENCY файлов одновременно, чтобы не перегружать сервер.
+    # У каждого файла свой буфер вывода: потоки не перемешивают строки и не
+    # конкурируют за stdout, буферы выводятся в порядке файлов
+    print(f"\n⏳ Загрузка и обработка {len(pdf_files)} файлов...")
+    buffers = [io.StringIO() for _ in pdf_files]
+    with ThreadPoolExecutor(max_workers=min(len(pdf_files), UPLOAD_CONCURRENCY)) as executor:
+        futures = [
+            executor.submit(upload_and_wait, pdf_file, i, len(pdf_files), buffer)
+            for i, (pdf_file, buffer) in enumerate(zip(pdf_files, buffers), 1)
+        ]
+        results = [future.result() for future in futures]
+    sys.stdout.write("".join(buffer.getvalue() for buffer in buffers))
+    sys.stdout.flush()
     
     # Итоги
     print("\n" + "="*70)
@@ -3,11 +3,11 @@
 """
 import pytest
 import asyncio
+import functools
 import os
-import tempfile
-import shutil
+from pathlib import Path
 from typing import AsyncGenerator, Generator
-from unittest.mock import Mock, AsyncMock, patch, MagicMock
+from unittest.mock import Mock, AsyncMock, patch, MagicMock, NonCallableMock
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
 
@@ -22,12 +22,18 @@ mock_vector_store_global.search = Mock(return_value=[
     }
 ])
 
-# Мокаем create_vector_store до импорта main
-with patch('core.rag.vector_store.create_vector_store', return_value=mock_vector_store_global):
-    with patch('core.rag.rag_service.create_vector_store', return_value=mock_vector_store_global):
-        # Импорты приложения
-        from main import app
+# Патчи, действующие всю сессию (запускаются фикстурой _install_global_patches):
+# RAGService, созданный через API, работает с моком векторного хранилища.
+# core.rag.vector_store.create_vector_store не патчится - его проверяют тесты
+# инициализации баз данных
+_VS_PATCHERS = [
+    patch('core.rag.rag_service.create_vector_store', return_value=mock_vector_store_global),
+]
+
+# Импорты приложения
+from main import app
 from core.rag.rag_service import RAGService
+from core.rag.document_processor import DocumentProcessor
 from core.rag.vector_store import create_vector_store
 from core.services.cache_service import CacheService
 from core.mcp.law_client import LawMCPClient
@@ -36,44 +42,113 @@ from core.llm.factory import LLMProviderFactory
 from config import settings
 
 
+# Методы session моков (и замоканные методы session объектов), которые тесты могут
+# заменять или настраивать (mock.search_cases = AsyncMock(...), mock.get.return_value = ...);
+# после каждого теста исходные методы и их настройки возвращаются на место
+_SESSION_MOCK_ATTRS = {
+    "mock_redis": ("ping", "get", "setex", "delete", "scan_iter", "exists", "info", "close"),
+    "mock_law_client": ("search_cases", "get_case_details", "close"),
+    "mock_llm_provider": ("generate", "stream_generate", "close"),
+    "mock_celery_app": ("AsyncResult",),
+    "preconfigured_router": ("process_query", "stream_process_query"),
+}
+
+
+# Части ответа, которые возвращает stream_generate мока LLM провайдера
+_LLM_CHUNKS = ("Test ", "response ", "chunks")
+
+# Ключи, которые возвращает scan_iter мока Redis
+_SCAN_KEYS = ("rag:search:query1", "rag:search:query2", "rag:context:query1")
+
+
+@functools.lru_cache(maxsize=None)
+def _scan_keys(match=None):
+    """Ключи _SCAN_KEYS, подходящие под паттерн (простая проверка паттерна)"""
+    pattern = match or "*"
+    if "*" in pattern:
+        prefix = pattern.replace("*", "")
+        return tuple(key for key in _SCAN_KEYS if key.startswith(prefix))
+    return tuple(key for key in _SCAN_KEYS if pattern in key)
+
+
+class _AsyncIter:
+    """Async iterator по готовой последовательности (без async generator)"""
+    
+    def __init__(self, items):
+        self._it = iter(items)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _StubLawClient:
+    """
+    Заглушка LawMCPClient с методами, которые используют тесты
+    
+    Простой класс вместо Mock(spec=LawMCPClient): без разбора спецификации класса.
+    """
+    
+    def __init__(self):
+        self.search_cases = AsyncMock(return_value=[
+            {
+                'title': 'Test Case 1',
+                'description': 'Test case description',
+                'case_number': '123/2024'
+            }
+        ])
+        self.get_case_details = AsyncMock(return_value={
+            'case_number': '123/2024',
+            'title': 'Test Case 1',
+            'details': 'Full case details'
+        })
+        self.close = AsyncMock()
+
+
 @pytest.fixture(scope="session")
 def event_loop():
-    """Создание event loop для всех тестов"""
+    """
+    Создание event loop для всех тестов
+    
+    pytest-asyncio 0.21 (requirements.txt) не поддерживает настройку области
+    event loop, поэтому общий loop для session фикстур (cache_service,
+    async_client) задается этой фикстурой.
+    """
     loop = asyncio.get_event_loop_policy().new_event_loop()
     yield loop
     loop.close()
 
 
+@pytest.fixture(scope="session", autouse=True)
+def _install_global_patches():
+    """Установка глобальных патчей один раз на сессию"""
+    for patcher in _VS_PATCHERS:
+        patcher.start()
+    yield
+    for patcher in reversed(_VS_PATCHERS):
+        patcher.stop()
+
+
 @pytest.fixture(scope="session")
-def test_data_dir():
-    """Создание временной директории для тестовых данных"""
-    temp_dir = tempfile.mkdtemp(prefix="coreml_test_")
-    yield temp_dir
-    shutil.rmtree(temp_dir, ignore_errors=True)
+def test_data_dir(tmp_path_factory) -> Path:
+    """Временная директория для тестовых данных (очисткой управляет pytest)"""
+    return tmp_path_factory.mktemp("coreml_test")
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def mock_redis():
     """Мок Redis для тестов"""
-    async def async_iter_mock(match=None, **kwargs):
-        """Async iterator для scan_iter"""
-        keys = ["rag:search:query1", "rag:search:query2", "rag:context:query1"]
-        pattern = match or "*"
-        for key in keys:
-            # Простая проверка паттерна
-            if "*" in pattern:
-                prefix = pattern.replace("*", "")
-                if prefix == "" or key.startswith(prefix):
-                    yield key
-            elif pattern in key:
-                yield key
-    
     mock_redis_client = AsyncMock()
     mock_redis_client.ping = AsyncMock(return_value=True)
     mock_redis_client.get = AsyncMock(return_value=None)
     mock_redis_client.setex = AsyncMock(return_value=True)
     mock_redis_client.delete = AsyncMock(return_value=1)
-    mock_redis_client.scan_iter = async_iter_mock  # Async generator
+    mock_redis_client.scan_iter = lambda match=None, **kwargs: _AsyncIter(_scan_keys(match))
     mock_redis_client.exists = AsyncMock(return_value=0)
     mock_redis_client.info = AsyncMock(return_value={
         "connected_clients": 1,
@@ -84,9 +159,13 @@ def mock_redis():
     return mock_redis_client
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 async def cache_service(mock_redis) -> CacheService:
-    """Сервис кэширования с моком Redis"""
+    """
+    Сервис кэширования с моком Redis (один на сессию)
+    
+    Состояние мока Redis восстанавливается после каждого теста (_reset_mocks).
+    """
     cache = CacheService(redis_url="redis://localhost:6379/1")
     # Правильный путь для мока redis.asyncio.from_url
     with patch('redis.asyncio.from_url', return_value=mock_redis):
@@ -129,41 +208,39 @@ async def rag_service_with_cache(cache_service, mock_vector_store):
 
 
 @pytest.fixture(scope="function")
+def vision_processor():
+    """
+    DocumentProcessor для тестов конвейера Vision API (без инициализации клиентов)
+    
+    vision_client.extract_text_from_image - AsyncMock, тест задает его
+    return_value / side_effect; кэш OCR и LLM очистка выключены.
+    """
+    processor = DocumentProcessor.__new__(DocumentProcessor)
+    processor.use_vision_api = True
+    processor.use_llm_cleaning = False
+    processor.llm_provider = None
+    processor.ocr_cache = None
+    processor.vision_client = MagicMock()
+    processor.vision_client.extract_text_from_image = AsyncMock()
+    return processor
+
+
+@pytest.fixture(scope="session")
 def mock_law_client():
     """Мок MCP Law клиента"""
-    mock_client = Mock(spec=LawMCPClient)
-    mock_client.search_cases = AsyncMock(return_value=[
-        {
-            'title': 'Test Case 1',
-            'description': 'Test case description',
-            'case_number': '123/2024'
-        }
-    ])
-    mock_client.get_case_details = AsyncMock(return_value={
-        'case_number': '123/2024',
-        'title': 'Test Case 1',
-        'details': 'Full case details'
-    })
-    mock_client.close = AsyncMock()
-    return mock_client
+    return _StubLawClient()
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def mock_llm_provider():
     """Мок LLM провайдера"""
-    async def async_stream_generator(*args, **kwargs):
-        """Async generator для stream_generate с поддержкой параметров"""
-        chunks = ["Test ", "response ", "chunks"]
-        for chunk in chunks:
-            yield chunk
-    
     mock_provider = Mock()
     mock_provider.generate = AsyncMock(return_value=Mock(
         content="Test LLM response",
         model="test-model",
         usage={"tokens": 100}
     ))
-    mock_provider.stream_generate = async_stream_generator
+    mock_provider.stream_generate = lambda *args, **kwargs: _AsyncIter(_LLM_CHUNKS)
     mock_provider.close = AsyncMock()
     return mock_provider
 
@@ -180,28 +257,107 @@ def query_router(rag_service_without_cache, mock_law_client, cache_service, mock
         yield router
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def test_client():
-    """FastAPI test client"""
-    return TestClient(app)
+    """
+    FastAPI test client (один на сессию)
+    
+    Контекстный менеджер выполняет startup/shutdown приложения один раз.
+    """
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def preconfigured_router(_install_global_patches, mock_law_client, cache_service):
+    """
+    QueryRouter для тестов API (один на сессию)
+    
+    process_query и stream_process_query замоканы; тест задает только их
+    return_value / side_effect, которые сбрасываются после теста (_reset_mocks).
+    """
+    router = QueryRouter(
+        rag_service=RAGService(cache_service=None),
+        law_client=mock_law_client,
+        cache_service=cache_service
+    )
+    router.process_query = AsyncMock()
+    router.stream_process_query = Mock()
+    return router
 
 
 @pytest.fixture(scope="function")
+def override_dependency():
+    """
+    Подмена зависимостей FastAPI на время теста
+    
+    Эндпоинты получают сервисы через Depends(get_*), поэтому patch('main.get_*')
+    на них не действует; подмена идет через app.dependency_overrides
+    и снимается после теста.
+    
+    Пример: override_dependency(get_rag_service, rag_service_without_cache)
+    """
+    def override(dependency, value):
+        app.dependency_overrides[dependency] = lambda: value
+    
+    yield override
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="session")
 async def async_client() -> AsyncGenerator[AsyncClient, None]:
-    """Async HTTP client для тестов"""
+    """Async HTTP client для тестов (один на сессию, в общем event loop)"""
     async with AsyncClient(app=app, base_url="http://test") as client:
         yield client
 
 
-@pytest.fixture(scope="function", autouse=True)
+@pytest.fixture(autouse=True)
+def _reset_mocks(request):
+    """
+    Восстановление session моков после теста
+    
+    Моки создаются один раз на сессию; тест получает их в исходном виде:
+    замененные тестом методы восстанавливаются, return_value и side_effect
+    методов возвращаются к значениям из фикстуры, история вызовов очищается.
+    """
+    mocks = []
+    saved = []
+    for name, attrs in _SESSION_MOCK_ATTRS.items():
+        if name in request.fixturenames:
+            mock = request.getfixturevalue(name)
+            mocks.append(mock)
+            for attr in attrs:
+                value = getattr(mock, attr)
+                if isinstance(value, NonCallableMock):
+                    saved.append((mock, attr, value, value.return_value, value.side_effect))
+                else:
+                    saved.append((mock, attr, value, None, None))
+    yield
+    for mock, attr, value, return_value, side_effect in saved:
+        setattr(mock, attr, value)
+        if isinstance(value, NonCallableMock):
+            value.reset_mock()
+            value.return_value = return_value
+            value.side_effect = side_effect
+    for mock in mocks:
+        if isinstance(mock, NonCallableMock):
+            mock.reset_mock()
+
+
+@pytest.fixture(scope="function")
 def reset_llm_factory():
-    """Сброс фабрики LLM перед каждым тестом"""
+    """
+    Сброс фабрики LLM до и после теста
+    
+    Подключается к тестам, работающим с LLMProviderFactory:
+    @pytest.mark.usefixtures("reset_llm_factory")
+    """
     LLMProviderFactory._providers.clear()
     yield
     LLMProviderFactory._providers.clear()
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def sample_document_content():
     """Пример содержимого документа для тестов"""
     return b"""
@@ -211,13 +367,13 @@ def sample_document_content():
     """
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def sample_query():
     """Пример запроса для тестов"""
     return "What is the legal framework for contracts?"
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def mock_celery_app():
     """Мок Celery приложения"""
     mock_app = Mock()
@@ -3,10 +3,19 @@
 """
 import pytest
 import json
-from unittest.mock import AsyncMock, patch
+from unittest.mock import patch
 from core.services.cache_service import CacheService
 
 
+# Тестовые значения и их JSON представление (вычисляется один раз)
+_TEST_VALUE = {"data": "test", "number": 123}
+_TEST_VALUE_JSON = json.dumps(_TEST_VALUE)
+_CACHED_VALUE = {"cached": "data"}
+_CACHED_VALUE_JSON = json.dumps(_CACHED_VALUE)
+_TEST_LIST = [1, 2, 3, "test"]
+_TEST_LIST_JSON = json.dumps(_TEST_LIST)
+
+
 class TestCacheServiceIntegration:
     """Интеграционные тесты сервиса кэширования"""
     
@@ -14,22 +23,21 @@ class TestCacheServiceIntegration:
     async def test_cache_set_and_get(self, cache_service, mock_redis):
         """Тест сохранения и получения из кэша"""
         test_key = "test:key"
-        test_value = {"data": "test", "number": 123}
         
         # Сохранение
-        result = await cache_service.set(test_key, test_value, ttl=60)
+        result = await cache_service.set(test_key, _TEST_VALUE, ttl=60)
         assert result is True
         assert mock_redis.setex.called
         
         # Получение
-        mock_redis.get = AsyncMock(return_value=json.dumps(test_value))
+        mock_redis.get.return_value = _TEST_VALUE_JSON
         cached_value = await cache_service.get(test_key)
-        assert cached_value == test_value
+        assert cached_value == _TEST_VALUE
     
     @pytest.mark.asyncio
     async def test_cache_get_nonexistent_key(self, cache_service, mock_redis):
         """Тест получения несуществующего ключа"""
-        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.get.return_value = None
         value = await cache_service.get("nonexistent:key")
         assert value is None
     
@@ -44,7 +52,7 @@ class TestCacheServiceIntegration:
     async def test_cache_delete_pattern(self, cache_service, mock_redis):
         """Тест удаления по паттерну"""
         # scan_iter уже настроен в фикстуре как async generator
-        mock_redis.delete = AsyncMock(return_value=3)
+        mock_redis.delete.return_value = 3
         
         deleted_count = await cache_service.delete_pattern("rag:*")
         assert deleted_count == 3
@@ -53,21 +61,20 @@ class TestCacheServiceIntegration:
     @pytest.mark.asyncio
     async def test_cache_get_or_set(self, cache_service, mock_redis):
         """Тест get_or_set - получение из кэша"""
-        test_value = {"cached": "data"}
-        mock_redis.get = AsyncMock(return_value=json.dumps(test_value))
+        mock_redis.get.return_value = _CACHED_VALUE_JSON
         
         async def compute_func():
             return {"computed": "data"}
         
         result = await cache_service.get_or_set("test:key", compute_func, ttl=60)
-        assert result == test_value
+        assert result == _CACHED_VALUE
         # compute_func не должна быть вызвана
         assert not hasattr(compute_func, '_called')
     
     @pytest.mark.asyncio
     async def test_cache_get_or_set_compute(self, cache_service, mock_redis):
         """Тест get_or_set - вычисление и сохранение"""
-        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.get.return_value = None
         
         async def compute_func():
             return {"computed": "data"}
@@ -80,11 +87,11 @@ class TestCacheServiceIntegration:
     @pytest.mark.asyncio
     async def test_cache_exists(self, cache_service, mock_redis):
         """Тест проверки существования ключа"""
-        mock_redis.exists = AsyncMock(return_value=1)
+        mock_redis.exists.return_value = 1
         exists = await cache_service.exists("test:key")
         assert exists is True
         
-        mock_redis.exists = AsyncMock(return_value=0)
+        mock_redis.exists.return_value = 0
         exists = await cache_service.exists("nonexistent:key")
         assert exists is False
     
@@ -99,7 +106,7 @@ class TestCacheServiceIntegration:
     @pytest.mark.asyncio
     async def test_cache_health_check_error(self, cache_service, mock_redis):
         """Тест проверки здоровья при ошибке"""
-        mock_redis.info = AsyncMock(side_effect=Exception("Connection error"))
+        mock_redis.info.side_effect = Exception("Connection error")
         
         health = await cache_service.health_check()
         assert health["status"] == "unhealthy"
@@ -134,30 +141,29 @@ class TestCacheServiceIntegration:
         await cache_service.set("test:str", "simple string", ttl=60)
         assert mock_redis.setex.called
         
-        mock_redis.get = AsyncMock(return_value="simple string")
+        mock_redis.get.return_value = "simple string"
         value = await cache_service.get("test:str")
         assert value == "simple string"
     
     @pytest.mark.asyncio
     async def test_cache_list_value(self, cache_service, mock_redis):
         """Тест сохранения списка"""
-        test_list = [1, 2, 3, "test"]
-        await cache_service.set("test:list", test_list, ttl=60)
+        await cache_service.set("test:list", _TEST_LIST, ttl=60)
         
-        mock_redis.get = AsyncMock(return_value=json.dumps(test_list))
+        mock_redis.get.return_value = _TEST_LIST_JSON
         value = await cache_service.get("test:list")
-        assert value == test_list
+        assert value == _TEST_LIST
     
     @pytest.mark.asyncio
     async def test_cache_error_handling(self, cache_service, mock_redis):
         """Тест обработки ошибок кэша"""
         # Мокаем ошибку при получении
-        mock_redis.get = AsyncMock(side_effect=Exception("Redis error"))
+        mock_redis.get.side_effect = Exception("Redis error")
         value = await cache_service.get("test:key")
         assert value is None
         
         # Мокаем ошибку при сохранении
-        mock_redis.setex = AsyncMock(side_effect=Exception("Redis error"))
+        mock_redis.setex.side_effect = Exception("Redis error")
         result = await cache_service.set("test:key", "value", ttl=60)
         assert result is False
 
@@ -53,6 +53,7 @@ def ollama_model():
 
 @pytest.mark.integration
 @pytest.mark.requires_ollama
+@pytest.mark.usefixtures("reset_llm_factory")
 class TestOllamaIntegration:
     """Реальные интеграционные тесты с Ollama API"""
     
@@ -8,6 +8,7 @@ from core.llm.factory import LLMProviderFactory
 from config import LLMProvider
 
 
+@pytest.mark.usefixtures("reset_llm_factory")
 class TestQueryRouterIntegration:
     """Интеграционные тесты QueryRouter"""
     
@@ -73,7 +74,7 @@ class TestQueryRouterIntegration:
         )
         
         # Второй запрос - должен использовать кэш
-        mock_redis.get = AsyncMock(return_value='{"answer": "Cached answer", "sources": ["RAG"], "model": "test", "usage": {}, "metadata": {}}')
+        mock_redis.get.return_value = '{"answer": "Cached answer", "sources": ["RAG"], "model": "test", "usage": {}, "metadata": {}}'
         result2 = await query_router.process_query(
             query=sample_query,
             use_rag=True,
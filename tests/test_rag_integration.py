@@ -2,7 +2,7 @@
 Интеграционные тесты для RAG сервиса
 """
 import pytest
-from unittest.mock import Mock, AsyncMock, patch
+from unittest.mock import Mock, MagicMock, AsyncMock, patch
 from core.rag.rag_service import RAGService
 from core.rag.document_processor import DocumentProcessor
 from core.services.cache_service import CacheService
@@ -31,7 +31,7 @@ class TestRAGServiceIntegration:
         assert mock_redis.setex.called
         
         # Второй запрос - должен получить из кэша
-        mock_redis.get = AsyncMock(return_value='[{"text": "Cached result", "metadata": {}}]')
+        mock_redis.get.return_value = '[{"text": "Cached result", "metadata": {}}]'
         results2 = await rag_service_with_cache.search(sample_query, top_k=5)
         assert mock_redis.get.called
     
@@ -50,7 +50,7 @@ class TestRAGServiceIntegration:
         assert isinstance(context1, str)
         
         # Второй запрос из кэша
-        mock_redis.get = AsyncMock(return_value='"Cached context text"')
+        mock_redis.get.return_value = '"Cached context text"'
         context2 = await rag_service_with_cache.get_context(sample_query, top_k=3)
         assert mock_redis.get.called
     
@@ -70,6 +70,79 @@ class TestRAGServiceIntegration:
         # Проверяем, что метод add_documents был вызван
         assert rag_service_without_cache.vector_store.add_documents.called
     
+    def test_rag_add_document_single_batch(self, rag_service_without_cache, test_data_dir):
+        """Тест: все чанки документа передаются в хранилище одним вызовом (один пакет эмбеддингов)"""
+        import os
+        from config import settings
+        test_file = os.path.join(test_data_dir, "test_doc_long.txt")
+        with open(test_file, "w", encoding="utf-8") as f:
+            f.write("Рішення суду у справі про стягнення заборгованості. " * (settings.rag_chunk_size // 10))
+        
+        metadata = {"test": True}
+        rag_service_without_cache.add_document(test_file, metadata=metadata)
+        
+        add_documents = rag_service_without_cache.vector_store.add_documents
+        add_documents.assert_called_once()
+        chunks, metadatas = add_documents.call_args[0][:2]
+        assert len(chunks) > 1
+        assert len(metadatas) == len(chunks)
+        # Метаданные чанков - одна общая копия, а не словарь вызывающего
+        assert all(chunk_metadata is metadatas[0] for chunk_metadata in metadatas)
+        assert metadatas[0] is not metadata
+        assert metadatas[0]["filename"] == "test_doc_long.txt"
+    
+    def test_rag_search_sync_reuses_event_loop(self, rag_service_without_cache, sample_query):
+        """Тест: search_sync выполняет запросы в одном и том же event loop"""
+        import asyncio
+        loops = []
+        search = rag_service_without_cache.search
+        
+        async def recording_search(query, top_k=None):
+            loops.append(asyncio.get_running_loop())
+            return await search(query, top_k)
+        
+        rag_service_without_cache.vector_store.search = Mock(return_value=[{"text": "doc", "metadata": {}}])
+        rag_service_without_cache.search = recording_search
+        assert rag_service_without_cache.search_sync(sample_query, top_k=1)[0]["text"] == "doc"
+        rag_service_without_cache.search_sync(sample_query, top_k=1)
+        
+        assert len(loops) == 2
+        assert loops[0] is loops[1]
+    
+    def test_rag_sync_event_loop_closed_with_thread(self):
+        """Тест: event loop синхронных вызовов закрывается после завершения потока"""
+        import asyncio
+        import gc
+        import threading
+        from core.rag.rag_service import _run_sync
+        loops = []
+        
+        async def running_loop():
+            return asyncio.get_running_loop()
+        
+        thread = threading.Thread(target=lambda: loops.append(_run_sync(running_loop())))
+        thread.start()
+        thread.join()
+        gc.collect()
+        
+        assert len(loops) == 1
+        assert loops[0].is_closed()
+    
+    def test_rag_search_many_runs_queries_concurrently(self, rag_service_without_cache):
+        """Тест: search_many_sync выполняет поиски одновременно и сохраняет порядок запросов"""
+        import threading
+        # Барьер пропустит потоки, только если все три поиска идут одновременно
+        barrier = threading.Barrier(3, timeout=5)
+        
+        def search(query, top_k):
+            barrier.wait()
+            return [{"text": query, "metadata": {}}]
+        
+        rag_service_without_cache.vector_store.search = Mock(side_effect=search)
+        results = rag_service_without_cache.search_many_sync(["a", "b", "c"], top_k=1)
+        
+        assert [r[0]["text"] for r in results] == ["a", "b", "c"]
+    
     @pytest.mark.asyncio
     async def test_rag_search_empty_results(self, rag_service_without_cache):
         """Тест поиска с пустыми результатами"""
@@ -110,3 +183,479 @@ class TestRAGServiceIntegration:
         with pytest.raises(Exception):
             await rag_service_without_cache.search(sample_query, top_k=5)
 
+
+class TestEmbeddingBatching:
+    """Тесты пакетной генерации эмбеддингов"""
+    
+    def test_embed_batch_splits_and_preserves_order(self, monkeypatch):
+        """Тест разбиения на пакеты с сохранением порядка эмбеддингов"""
+        from config import settings
+        from core.rag.vector_store import DummyVectorStore
+        
+        store = DummyVectorStore.__new__(DummyVectorStore)
+        batches = []
+        
+        def fake_embed_documents(texts):
+            batches.append(list(texts))
+            return [[float(text)] for text in texts]
+        
+        store._embed_documents = fake_embed_documents
+        monkeypatch.setattr(settings, "rag_embedding_batch_size", 2)
+        
+        embeddings = store.embed_batch(["1", "2", "3", "4", "5"])
+        
+        assert embeddings == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert batches == [["1", "2"], ["3", "4"], ["5"]]
+    
+    def test_embed_batch_single_call_for_small_documents(self, monkeypatch):
+        """Тест: все чанки небольшого документа эмбеддятся одним вызовом модели"""
+        from config import settings
+        from core.rag.vector_store import DummyVectorStore
+        
+        store = DummyVectorStore.__new__(DummyVectorStore)
+        store._embed_documents = Mock(return_value=[[0.1], [0.2], [0.3]])
+        monkeypatch.setattr(settings, "rag_embedding_batch_size", 96)
+        
+        embeddings = store.embed_batch(["a", "b", "c"])
+        
+        store._embed_documents.assert_called_once_with(["a", "b", "c"])
+        assert embeddings == [[0.1], [0.2], [0.3]]
+    
+    def test_insert_batches(self, monkeypatch):
+        """Тест разбиения вставки в БД на пакеты"""
+        from config import settings
+        from core.rag.vector_store import VectorStoreBase
+        
+        monkeypatch.setattr(settings, "rag_insert_batch_size", 1000)
+        
+        assert VectorStoreBase._insert_batches(0) == []
+        assert VectorStoreBase._insert_batches(10) == [(0, 10)]
+        assert VectorStoreBase._insert_batches(2500) == [(0, 1000), (1000, 2000), (2000, 2500)]
+    
+    def test_qdrant_upsert_batch_waits_only_for_last_batch(self, monkeypatch):
+        """Тест bulk записи в Qdrant: пакеты по rag_insert_batch_size, ожидание только последнего"""
+        pytest.importorskip("qdrant_client")
+        from config import settings
+        from core.rag.vector_store import QdrantVectorStore
+        
+        store = QdrantVectorStore.__new__(QdrantVectorStore)
+        store.client = Mock()
+        store.collection_name = "test"
+        monkeypatch.setattr(settings, "rag_insert_batch_size", 2)
+        
+        ids = [f"00000000-0000-0000-0000-00000000000{i}" for i in range(5)]
+        store.upsert_batch(ids, [[0.1]] * 5, ["text"] * 5, [{"filename": "a.pdf"}] * 5)
+        
+        calls = store.client.upsert.call_args_list
+        assert [len(c.kwargs["points"]) for c in calls] == [2, 2, 1]
+        assert [c.kwargs["wait"] for c in calls] == [False, False, True]
+    
+    def test_chroma_upsert_batch_overwrites_existing_ids(self, monkeypatch):
+        """Тест bulk записи в ChromaDB: upsert (как в Qdrant), а не add, с уникальными id чанков"""
+        from config import settings
+        from core.rag.vector_store import ChromaVectorStore
+        
+        store = ChromaVectorStore.__new__(ChromaVectorStore)
+        store.collection = Mock()
+        monkeypatch.setattr(settings, "rag_insert_batch_size", 2)
+        
+        ids = [f"doc_{i}" for i in range(3)]
+        store.upsert_batch(ids, [[0.1]] * 3, ["text"] * 3, [{"filename": "a.pdf"}] * 3)
+        
+        calls = store.collection.upsert.call_args_list
+        assert [c.kwargs["ids"] for c in calls] == [["doc_0", "doc_1"], ["doc_2"]]
+        store.collection.add.assert_not_called()
+        
+        # Чанки разных документов с одинаковым началом не получают общий id
+        store.collection = Mock()
+        store._embedder = lambda: Mock(embed_batch=lambda texts: [[0.1]] * len(texts))
+        header = "ПОСТАНОВА ІМЕНЕМ УКРАЇНИ " * 3
+        
+        store.add_documents([header + "справа 1"], [{"filename": "a.pdf"}])
+        store.add_documents([header + "справа 2"], [{"filename": "b.pdf"}])
+        
+        ids = [i for c in store.collection.upsert.call_args_list for i in c.kwargs["ids"]]
+        assert len(ids) == 2
+        assert len(set(ids)) == 2
+
+
+class TestEmbeddingCache:
+    """Тесты LRU кэша эмбеддингов"""
+    
+    def _provider(self, capacity: int = 10000):
+        from core.rag.embedding_cache import CachedEmbeddingProvider
+        
+        inner = Mock()
+        inner.embed = Mock(side_effect=lambda text: [float(len(text))])
+        inner.embed_batch = Mock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+        return CachedEmbeddingProvider(inner, model_name="test-model", capacity=capacity), inner
+    
+    def test_repeated_query_hits_cache(self):
+        """Тест: повторный запрос не вызывает модель"""
+        provider, inner = self._provider()
+        
+        assert provider.embed("суд") == [3.0]
+        assert provider.embed("суд") == [3.0]
+        
+        inner.embed.assert_called_once_with("суд")
+        assert provider.hits == 1
+    
+    def test_embed_batch_forwards_only_misses(self):
+        """Тест: в модель отправляются только отсутствующие в кэше тексты, порядок сохраняется"""
+        provider, inner = self._provider()
+        provider.embed_batch(["a", "bb"])
+        
+        embeddings = provider.embed_batch(["bb", "ccc", "a", "ccc"])
+        
+        assert embeddings == [[2.0], [3.0], [1.0], [3.0]]
+        assert inner.embed_batch.call_args_list[-1].args == (["ccc"],)
+    
+    def test_lru_eviction(self):
+        """Тест вытеснения самых старых записей"""
+        provider, inner = self._provider(capacity=2)
+        provider.embed("a")
+        provider.embed("bb")
+        provider.embed("a")
+        provider.embed("ccc")  # Вытесняет "bb"
+        
+        provider.embed("a")
+        provider.embed("bb")
+        
+        assert [c.args[0] for c in inner.embed.call_args_list] == ["a", "bb", "ccc", "bb"]
+
+
+class TestVisionAPIClient:
+    """Тесты формата запросов к Vision API"""
+    
+    @pytest.mark.asyncio
+    async def test_image_sent_as_raw_multipart(self, monkeypatch):
+        """Тест: изображение уходит сырыми байтами в multipart/form-data, без base64 в JSON"""
+        import asyncio
+        import httpx
+        from config import settings
+        from core.rag.vision_client import VisionAPIClient
+        
+        monkeypatch.setattr(settings, "vision_api_key", "test-key")
+        image_data = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 256
+        requests = []
+        
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(200, json={"success": True, "text": "OCR"})
+        
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(VisionAPIClient, "_shared_client", client)
+        monkeypatch.setattr(VisionAPIClient, "_shared_client_loop", asyncio.get_running_loop())
+        
+        try:
+            text = await VisionAPIClient().extract_text_from_image(image_data, filename="page_1.png")
+        finally:
+            await client.aclose()
+        
+        assert text == "OCR"
+        assert len(requests) == 1
+        body = requests[0].read()
+        assert requests[0].headers["content-type"].startswith("multipart/form-data")
+        assert image_data in body
+        assert len(body) < len(image_data) * 4 // 3
+    
+    @pytest.mark.asyncio
+    async def test_session_reuses_one_http_client(self, monkeypatch):
+        """Тест: запросы внутри сессии идут через один HTTP клиент, он закрывается после последней сессии"""
+        import asyncio
+        import httpx
+        from config import settings
+        from core.rag import vision_client
+        
+        monkeypatch.setattr(settings, "vision_api_key", "test-key")
+        created = []
+        
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"success": True, "text": "OCR"})
+        
+        class RecordingClient(httpx.AsyncClient):
+            def __init__(self, **kwargs):
+                kwargs.pop("http2", None)
+                super().__init__(transport=httpx.MockTransport(handler), **kwargs)
+                created.append(self)
+        
+        monkeypatch.setattr(vision_client.httpx, "AsyncClient", RecordingClient)
+        client = vision_client.VisionAPIClient()
+        
+        async with client.session():
+            async with client.session():
+                texts = await asyncio.gather(
+                    *(client.extract_text_from_image(b"image", filename=f"page_{i}.png") for i in range(5))
+                )
+            assert not created[0].is_closed
+        
+        assert texts == ["OCR"] * 5
+        assert len(created) == 1
+        assert created[0].is_closed
+
+
+class TestOCRResultCache:
+    """Тесты дискового кэша OCR результатов"""
+    
+    def test_get_put_persists_between_instances(self, tmp_path):
+        """Тест: результат сохраняется на диске и доступен новому экземпляру"""
+        from core.rag.ocr_cache import OCRResultCache
+        
+        path = str(tmp_path / "ocr.sqlite3")
+        key = OCRResultCache.key(b"page image", ["uk", "ru"])
+        
+        cache = OCRResultCache(path)
+        assert cache.get(key) is None
+        cache.put(key, "Рішення суду")
+        cache.close()
+        
+        cache = OCRResultCache(path)
+        assert cache.get(key) == "Рішення суду"
+        assert cache.get(OCRResultCache.key(b"page image", ["en"])) is None
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.close()
+    
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Тест вытеснения давно не использованных записей"""
+        from core.rag.ocr_cache import OCRResultCache
+        
+        cache = OCRResultCache(str(tmp_path / "ocr.sqlite3"), capacity=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        assert cache.get("a") == "A"
+        cache.put("c", "C")
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == "A"
+        assert cache.get("c") == "C"
+        cache.close()
+
+
+class TestPDFRendering:
+    """Тесты рендеринга страниц PDF в изображения"""
+    
+    def test_parallel_render_keeps_page_order(self, tmp_path, monkeypatch, vision_processor):
+        """Тест: рендеринг в нескольких потоках дает те же страницы в том же порядке"""
+        fitz = pytest.importorskip("fitz")
+        from config import settings
+        
+        pdf_path = str(tmp_path / "pages.pdf")
+        doc = fitz.open()
+        for i in range(5):
+            doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+        doc.save(pdf_path)
+        doc.close()
+        
+        processor = vision_processor
+        monkeypatch.setattr(settings, "pdf_render_max_workers", 1)
+        serial = processor._pdf_to_images(pdf_path)
+        monkeypatch.setattr(settings, "pdf_render_max_workers", 3)
+        parallel = processor._pdf_to_images(pdf_path)
+        
+        assert len(serial) == 5
+        assert parallel == serial
+        assert processor._pdf_to_images(pdf_path, max_pages=2) == serial[:2]
+    
+    @pytest.mark.asyncio
+    async def test_vision_pipeline_keeps_page_order(self, tmp_path, vision_processor):
+        """Тест: страницы распознаются параллельно с рендерингом, текст собирается по порядку"""
+        import asyncio
+        fitz = pytest.importorskip("fitz")
+        
+        pdf_path = str(tmp_path / "pages.pdf")
+        doc = fitz.open()
+        for i in range(6):
+            doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+        doc.save(pdf_path)
+        doc.close()
+        
+        async def extract_text_from_image(image_data, filename=None, language_hints=None):
+            page = int(filename[len("page_"):-len(".png")])
+            # Первые страницы отвечают дольше последних
+            await asyncio.sleep(0.01 * (6 - page))
+            return f"Текст сторінки {page}"
+        
+        processor = vision_processor
+        processor.vision_client.extract_text_from_image.side_effect = extract_text_from_image
+        
+        text = await processor._extract_text_from_pdf_via_vision_async(pdf_path, max_concurrency=3)
+        
+        assert processor.vision_client.extract_text_from_image.await_count == 6
+        positions = [text.index(f"Текст сторінки {page}") for page in range(1, 7)]
+        assert positions == sorted(positions)
+    
+    @pytest.mark.asyncio
+    async def test_vision_pipeline_survives_ocr_cache_errors(self, tmp_path, vision_processor):
+        """Тест: ошибка кэша OCR (SQLite) не останавливает обработчики, рендеринг не зависает"""
+        import asyncio
+        fitz = pytest.importorskip("fitz")
+        
+        pdf_path = str(tmp_path / "pages.pdf")
+        doc = fitz.open()
+        for i in range(6):
+            doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+        doc.save(pdf_path)
+        doc.close()
+        
+        processor = vision_processor
+        processor.ocr_cache = MagicMock()
+        processor.ocr_cache.get.side_effect = RuntimeError("database is locked")
+        processor.vision_client.extract_text_from_image.return_value = "Текст сторінки"
+        
+        # Очередь на 2 страницы: без устойчивых обработчиков рендеринг завис бы
+        text = await asyncio.wait_for(
+            processor._extract_text_from_pdf_via_vision_async(pdf_path, max_concurrency=1),
+            timeout=10
+        )
+        
+        assert text is None
+        assert processor.ocr_cache.get.call_count == 6
+        processor.vision_client.extract_text_from_image.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_vision_pipeline_skips_pages_with_text_layer(self, tmp_path, monkeypatch, vision_processor):
+        """Тест: страницы с текстовым слоем берутся из PDF, в Vision API уходят только сканы"""
+        fitz = pytest.importorskip("fitz")
+        from config import settings
+        
+        pdf_path = str(tmp_path / "mixed.pdf")
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Court decision on the recovery of outstanding debt")
+        doc.new_page().insert_text((72, 72), "Page 2")
+        doc.save(pdf_path)
+        doc.close()
+        
+        processor = vision_processor
+        processor.vision_client.extract_text_from_image.return_value = "Текст сторінки 2"
+        monkeypatch.setattr(settings, "vision_pdf_native_text_min_chars", 40)
+        
+        text = await processor._extract_text_from_pdf_via_vision_async(pdf_path)
+        
+        assert processor.vision_client.extract_text_from_image.await_count == 1
+        assert processor.vision_client.extract_text_from_image.await_args.kwargs["filename"] == "page_2.png"
+        assert text.index("Court decision") < text.index("Текст сторінки 2")
+    
+    def test_text_layer_without_glyph_mapping_is_not_used(self):
+        """Тест: текстовый слой из точек вместо букв (нет кодировки шрифта) не заменяет OCR"""
+        assert DocumentProcessor._is_usable_text_layer("Court decision on the recovery of outstanding debt", 40)
+        assert not DocumentProcessor._is_usable_text_layer("Page 2", 40)
+        assert not DocumentProcessor._is_usable_text_layer(
+            "········ ········ ··· OCR\n··· ····· ·· ······· ·····.\nThis is text in English for the test.", 20
+        )
+    
+    def test_render_dpi_follows_page_content(self):
+        """Тест: текст - 150 DPI, скан - собственное разрешение, но не выше 300 DPI, логотип не влияет"""
+        fitz = pytest.importorskip("fitz")
+        
+        def page_with_image(width, rect=None):
+            doc = fitz.open()
+            page = doc.new_page(width=595, height=842)
+            pixmap = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, width, 100), False)
+            pixmap.clear_with(200)
+            page.insert_image(rect or page.rect, pixmap=pixmap, keep_proportion=False)
+            return page
+        
+        def dpi(page):
+            return round(DocumentProcessor._page_render_matrix(page).a * 72)
+        
+        assert dpi(fitz.open().new_page()) == 150
+        assert dpi(page_with_image(1653)) == 200
+        assert dpi(page_with_image(4000)) == 300
+        assert dpi(page_with_image(4000, fitz.Rect(0, 0, 100, 50))) == 150
+    
+    def test_auto_format_uses_jpeg_only_for_raster_pages(self, tmp_path):
+        """Тест: в режиме auto скан кодируется в JPEG, страница с векторным текстом - в PNG"""
+        fitz = pytest.importorskip("fitz")
+        
+        pdf_path = str(tmp_path / "mixed.pdf")
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Vector text")
+        scan = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 64, 64), False)
+        scan.clear_with(200)
+        page = doc.new_page()
+        page.insert_image(page.rect, pixmap=scan)
+        doc.save(pdf_path)
+        doc.close()
+        
+        text_page, scan_page = DocumentProcessor._render_pdf_pages(pdf_path, 0, 2, image_format="auto")
+        
+        assert text_page.startswith(b"\x89PNG")
+        assert scan_page.startswith(b"\xff\xd8")
+        assert all(
+            image.startswith(b"\x89PNG")
+            for image in DocumentProcessor._render_pdf_pages(pdf_path, 0, 2)
+        )
+
+
+class TestDocumentProcessorFactory:
+    """Тесты общего экземпляра DocumentProcessor"""
+    
+    def test_get_document_processor_returns_cached_instance(self):
+        """Тест: повторный вызов фабрики возвращает тот же экземпляр"""
+        from core.rag.document_processor import get_document_processor
+        
+        processor = get_document_processor(use_vision_api=False)
+        
+        assert isinstance(processor, DocumentProcessor)
+        assert get_document_processor(use_vision_api=False) is processor
+
+
+class TestOCRTextCleaning:
+    """Тесты базовой фильтрации OCR текста"""
+    
+    def test_removes_technical_lines_and_artifacts(self):
+        """Тест: метаданные PDF, артефакты OCR и лишние пробелы удаляются, содержимое остается"""
+        text = "\n".join([
+            "Creator: Microsoft Word",
+            "PRODUCER: pdfTeX",
+            "Рішення   суду   від 12.03.2020",
+            "Page 3 of 9",
+            "/Type /Page",
+            "12 / 3",
+            "....",
+            "!!!???**",
+            "",
+            "",
+            "",
+            "Позов задоволено частково.",
+        ])
+        
+        cleaned = DocumentProcessor._clean_ocr_text(text)
+        
+        assert cleaned == "Рішення суду від 12.03.2020\nПозов задоволено частково."
+    
+    def test_per_page_cleaning_matches_whole_text(self):
+        """Тест: очистка по страницам с объединением через перенос строки совпадает с очисткой всего текста"""
+        pages = [
+            "Creator: Microsoft Word\nРішення   суду\n\n\nPage 1 of 2",
+            "....\n  Позов задоволено  ",
+            "12 / 3\n/Type /Page",
+            "Vision API test\nКінець документа",
+        ]
+        
+        whole = DocumentProcessor._clean_ocr_text("\n\n".join(pages))
+        per_page = "\n".join(
+            cleaned for cleaned in (DocumentProcessor._clean_ocr_text(page) for page in pages) if cleaned
+        )
+        
+        assert per_page == whole
+
+
+class TestHTMLEncodingDetection:
+    """Тесты определения кодировки HTML по содержимому"""
+    
+    def test_multibyte_char_cut_by_window_is_utf8(self, tmp_path):
+        """Тест: символ UTF-8, обрезанный границей окна 64KB, не мешает определить utf-8"""
+        html_path = tmp_path / "long.html"
+        html_path.write_bytes(b"x" * 65535 + "ж".encode("utf-8") + b"tail")
+        processor = DocumentProcessor.__new__(DocumentProcessor)
+        
+        assert processor._detect_html_encoding(str(html_path)) == "utf-8"
+    
+    def test_invalid_tail_of_short_file_is_not_utf8(self, tmp_path):
+        """Тест: неполная последовательность в конце короткого файла не считается обрезкой окна"""
+        html_path = tmp_path / "short.html"
+        html_path.write_bytes(b"<p>hello world text here</p>" * 10 + "а".encode("cp1251"))
+        processor = DocumentProcessor.__new__(DocumentProcessor)
+        
+        assert processor._detect_html_encoding(str(html_path)) != "utf-8"